@@ -1,5 +1,7 @@
 import sys, os
+import argparse
 import time
+PROCESS_STARTED = time.perf_counter()  # before the heavy imports; used for the time-to-first-paint log
 import threading
 import tkinter as tk
 import customtkinter as ctk
@@ -10,13 +12,29 @@ from logging.handlers import RotatingFileHandler
 from googletrans import Translator
 from pathlib import Path
 from tkinter import filedialog
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
 import sqlite3
 import csv
 import pyperclip  # copy translated user entry to clipboard
 import webbrowser  # for opening links
 import asyncio
+import concurrent.futures
+import ctypes
+import ctypes.util
+import select
+import signal
+import queue
+import functools
+import inspect
+import unicodedata
+import math
+import random
+import bisect
+import gzip
+import hashlib
+import itertools
+from collections import Counter, OrderedDict, deque, namedtuple
 
 # --- Libraries for HTTP fetch ---
 from urllib.request import urlopen, Request
@@ -101,14 +119,55 @@ DEFAULT_SETTINGS = {
     "allow_remote_dictionary": False,
     "remote_dictionary_url": DEFAULT_REMOTE_DICTIONARY_URL,
     "last_notified_version": APP_VERSION,
-    "last_remote_fetch": 0,
     "remote_fetch_interval": 3600,  # 1 hour in seconds
     "show_extended_welcome": False,  # Flag to show extended message after version update
     # Extended welcome message fields (populated from remote)
     "remote_welcome_message": "",
     "remote_whats_new": None,
     "remote_download_url": "",
-    "remote_notes": ""
+    "remote_notes": "",
+    # Translation cache (in-memory LRU + SQLite file next to chat_history.db)
+    "translation_cache_memory_entries": 2000,
+    "translation_cache_max_entries": 50000,
+    "translation_cache_ttl": 604800,  # 7 days in seconds
+    "translation_workers": 4,  # concurrent translation requests for chat lines
+    # Lines already in the target language (local language guess) are shown untranslated
+    "skip_target_language": True,
+    "language_skip_threshold": 0.5,  # minimum guess confidence (0..1) for skipping
+    # Pass the channel's / sender's language as src instead of letting the translator detect it
+    "source_language_hints": True,
+    # Chat lines waiting for translation together are sent as one request (one line per message)
+    "translation_batching": True,
+    "translation_batch_window_ms": 100,  # longest a line waits for others while requests are in flight
+    "translation_batch_max_messages": 20,
+    "translation_batch_max_chars": 4000,
+    # Reposted ads (same sender, nearly the same text) reuse the earlier translation and are
+    # shown as a "×N" counter on the first copy in the Chat tab
+    "collapse_repeats": True,
+    "repeat_window_seconds": 600,
+    "repeat_similarity": 0.8,  # shingle overlap (Jaccard, 0..1) that counts as the same message
+    "store_exact_repeats": True,  # false: exact reposts within the window are not saved to the history
+    # Translation backend protection: token bucket (halved on throttling, recovers gradually) and a
+    # circuit breaker that pauses requests after repeated failures; paused lines are shown untranslated
+    "translation_rate_limit": 10.0,  # requests per second, 0 = unlimited
+    "translation_rate_burst": 20,
+    "translation_rate_wait": 5.0,  # longest a request waits for the rate limiter
+    "circuit_failure_threshold": 5,  # consecutive failures that pause translation
+    "circuit_reset_seconds": 5,  # first retry after a pause; doubled after every failed retry
+    "circuit_max_reset_seconds": 300,
+    # "google", or "fake" / "fake-async" for offline load testing (options in "fake_translator")
+    "translation_backend": "google",
+    # Chat history writes are group-committed by a background writer
+    "db_batch_size": 100,
+    "db_flush_interval": 0.5,  # seconds
+    # Chat tab refresh: pending lines are inserted every interval, within the frame budget
+    "ui_refresh_interval_ms": 50,
+    "ui_frame_budget_ms": 12,
+    # Live Chat tab size limit (0 = unlimited); oldest messages are removed in batches
+    "chat_max_lines": 5000,
+    "chat_trim_batch": 500,
+    "history_page_size": 500,  # History tab rows fetched per page
+    "metrics_log_interval": 300  # seconds between pipeline stats in the App Log (0 = only on exit)
 }
 
 MANUAL_TRANSLATE_LANG = "ru"  # Temporary, example: Spanish
@@ -209,20 +268,2829 @@ DEFAULT_WELCOME_TEXT = (
     "Feel free to share your feedback about this program with me.\n"
     )
 
-def run_async_translation(coro):
-    """Helper to run async translation coroutines, handling event loop issues."""
+class TranslationService:
+    """
+    Runs every translation on one long-lived asyncio event loop in a daemon thread.
+    A single Translator instance is shared by all callers, so its HTTP client keeps
+    its connections alive instead of doing a new TCP+TLS handshake per message.
+    """
+
+    def __init__(self, translator_factory=None, request_timeout=10.0, max_concurrency=8):
+        self._translator_factory = translator_factory
+        self._translator = None
+        self.request_timeout = request_timeout
+        # Synchronous translators run here; the loop's default executor is sized by CPU count
+        # and would cap concurrent requests below the number of translation workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, int(max_concurrency)), thread_name_prefix="translation-call"
+        )
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="translation-loop", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the service loop from any thread; returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _get_translator(self):
+        if self._translator is None:
+            factory = self._translator_factory or Translator
+            self._translator = factory()
+        return self._translator
+
+    async def _translate(self, text, dest, src="auto"):
+        translate = self._get_translator().translate
+        kwargs = {"dest": dest} if src == "auto" else {"dest": dest, "src": src}
+        if asyncio.iscoroutinefunction(translate):
+            result = await translate(text, **kwargs)
+        else:
+            # Synchronous googletrans releases (< 4.0.2): keep the loop free for other requests
+            result = await self._loop.run_in_executor(self._executor, functools.partial(translate, text, **kwargs))
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def translate(self, text, dest, timeout=None, src="auto"):
+        """
+        Blocking translate usable from any thread. Returns the googletrans result object.
+        A known `src` language spares the backend its detection step.
+        """
+        future = self.submit(self._translate(text, dest, src))
+        try:
+            return future.result(timeout or self.request_timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def _close_translator(self):
+        client = getattr(self._translator, "client", None)
+        aclose = getattr(client, "aclose", None)
+        if aclose and asyncio.iscoroutinefunction(aclose):
+            await aclose()
+
+    def close(self, timeout=2.0):
+        """Close the shared HTTP client and stop the loop thread."""
+        if self._loop.is_closed():
+            return
+        try:
+            self.submit(self._close_translator()).result(timeout)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._loop.close()
+        self._executor.shutdown(wait=False)
+
+
+# ---------------- Fake translation backend (offline load testing) ----------------
+
+FakeTranslation = namedtuple("FakeTranslation", "text src dest")
+
+
+class FakeTranslatorError(Exception):
+    """Simulated translation failure."""
+
+
+class FakeTranslatorThrottled(FakeTranslatorError):
+    """Simulated HTTP 429 from the translation backend."""
+
+
+class FakeTranslator:
+    """
+    Offline stand-in for googletrans.Translator with the same translate(text, dest, src) call.
+    Latency follows a configurable distribution, a share of requests fails or is throttled,
+    and the output is a deterministic function of the input, so concurrency, retry, cache
+    and backpressure behavior can be load-tested without network access.
+
+    latency_dist: "fixed", "uniform" (0..2x mean), "exponential" or "lognormal".
+    rate_limit: requests per second before FakeTranslatorThrottled is raised (0 = unlimited).
+    """
+
+    LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+    def __init__(self, latency_ms=80.0, latency_dist="lognormal", error_rate=0.0, throttle_rate=0.0,
+                 rate_limit=0.0, seed=0):
+        if latency_dist not in self.LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_dist}")
+        self.latency = max(0.0, latency_ms) / 1000.0
+        self.latency_dist = latency_dist
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._random = random.Random(seed)
+        self._recent = deque()  # request times within the last second
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, options):
+        """Build from the `fake_translator` settings dict; unknown keys are ignored."""
+        names = ("latency_ms", "latency_dist", "error_rate", "throttle_rate", "rate_limit", "seed")
+        return cls(**{name: options[name] for name in names if name in options})
+
+    def _sample_latency(self):
+        mean = self.latency
+        if not mean or self.latency_dist == "fixed":
+            return mean
+        if self.latency_dist == "uniform":
+            return self._random.uniform(0, 2 * mean)
+        if self.latency_dist == "exponential":
+            return self._random.expovariate(1 / mean)
+        sigma = 0.5  # lognormal with the requested mean and a long right tail
+        return self._random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+
+    def _begin(self):
+        """Account for one request; returns (latency, outcome) with outcome None, "error" or "throttled"."""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            self._recent.append(now)
+            roll = self._random.random()
+            if (self.rate_limit and len(self._recent) > self.rate_limit) or roll < self.throttle_rate:
+                self.throttled += 1
+                return 0.0, "throttled"
+            outcome = "error" if roll < self.throttle_rate + self.error_rate else None
+            if outcome:
+                self.errors += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self._sample_latency(), outcome
+
+    def _finish(self, text, dest, src, outcome):
+        with self._lock:
+            self.in_flight -= 1
+        if outcome == "error":
+            raise FakeTranslatorError("simulated translation failure")
+        # Line by line, like Google Translate keeps the line breaks of multi-line text
+        return FakeTranslation("\n".join(f"[{dest}] {line}" for line in text.split("\n")), src, dest)
+
+    def translate(self, text, dest="en", src="auto"):
+        latency, outcome = self._begin()
+        if outcome == "throttled":
+            raise FakeTranslatorThrottled("429 Too Many Requests (simulated)")
+        time.sleep(latency)
+        return self._finish(text, dest, src, outcome)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests, "errors": self.errors, "throttled": self.throttled,
+                "max_in_flight": self.max_in_flight,
+            }
+
+
+class AsyncFakeTranslator(FakeTranslator):
+    """FakeTranslator with a coroutine translate(), like googletrans >= 4.0.2."""
+
+    async def translate(self, text, dest="en", src="auto"):
+        latency, outcome = self._begin()
+        if outcome == "throttled":
+            raise FakeTranslatorThrottled("429 Too Many Requests (simulated)")
+        await asyncio.sleep(latency)
+        return self._finish(text, dest, src, outcome)
+
+
+def translator_factory_from_settings(settings):
+    """
+    Translator factory for TranslationService: None (googletrans) unless the
+    `translation_backend` setting is "fake" or "fake-async".
+    """
+    backend = settings.get("translation_backend", "google")
+    if backend == "google":
+        return None
+    options = settings.get("fake_translator", {})
+    if backend == "fake":
+        return lambda: FakeTranslator.from_settings(options)
+    if backend == "fake-async":
+        return lambda: AsyncFakeTranslator.from_settings(options)
+    raise ValueError(f"Unknown translation_backend: {backend}")
+
+
+class _TranslationBatch:
+    """Messages waiting to be sent together: same batch key, each with the Future its caller waits on."""
+
+    __slots__ = ("key", "items", "chars", "deadline")
+
+    def __init__(self, key, deadline):
+        self.key = key
+        self.items = []  # (text, Future)
+        self.chars = 0
+        self.deadline = deadline
+
+
+BATCH_WAIT_WORKERS = 16  # worker pool threads added for lines waiting on a forming batch
+
+
+class TranslationBatcher:
+    """
+    Micro-batching in front of the translation backend. Concurrent translate() calls with the
+    same key (target language, source language, ...) are joined one message per line into a
+    single request and the result is split back by line; if the line count does not match,
+    the batch is re-sent one message at a time.
+
+    A batch is sent when it is full (`max_messages` / `max_chars`), when its `window` has
+    elapsed, or right away if nothing is in flight, so quiet chat gets no extra latency and
+    bursts are coalesced while earlier requests are still on the wire. At most `max_in_flight`
+    requests run at once.
+
+    translate_fn(text, dest, src) returns the translated text; count(name, n), if given,
+    receives the "translation_requests", "batched" and "batch_fallbacks" counters.
+    """
+
+    def __init__(self, translate_fn, window=0.1, max_messages=20, max_chars=4000, max_in_flight=4, count=None):
+        self.translate_fn = translate_fn
+        self.window = window
+        self.max_messages = max(1, int(max_messages))
+        self.max_chars = max_chars
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.count = count or (lambda name, n=1: None)
+        self._open = {}  # key -> _TranslationBatch still collecting
+        self._ready = deque()  # full or due batches waiting for a free request slot
+        self._in_flight = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_in_flight, thread_name_prefix="translation-batch"
+        )
+        self._thread = threading.Thread(target=self._dispatch_loop, name="translation-batcher", daemon=True)
+        self._thread.start()
+
+    def translate(self, text, dest, src="auto", key=None):
+        """Blocking translate; `key` further separates batches (e.g. by a local language guess)."""
+        if not text or "\n" in text or len(text) >= self.max_chars:
+            # Cannot share a line-delimited request
+            self.count("translation_requests")
+            return self.translate_fn(text, dest, src)
+        future = concurrent.futures.Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("translation batcher is closed")
+            batch_key = (dest, src, key)
+            batch = self._open.get(batch_key)
+            if batch is not None and (
+                len(batch.items) >= self.max_messages or batch.chars + len(text) + 1 > self.max_chars
+            ):
+                self._ready.append(self._open.pop(batch_key))
+                batch = None
+            if batch is None:
+                batch = self._open[batch_key] = _TranslationBatch(batch_key, time.monotonic() + self.window)
+            batch.items.append((text, future))
+            batch.chars += len(text) + 1
+            self._cond.notify()
+        return future.result()
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                idle = self._in_flight == 0 and not self._ready
+                for batch_key, batch in list(self._open.items()):
+                    if self._closed or idle or now >= batch.deadline or len(batch.items) >= self.max_messages:
+                        self._ready.append(self._open.pop(batch_key))
+                        idle = False
+                while self._ready and self._in_flight < self.max_in_flight:
+                    self._in_flight += 1
+                    self._executor.submit(self._send, self._ready.popleft())
+                if self._closed and not self._open and not self._ready:
+                    return
+                if self._open and self._in_flight < self.max_in_flight:
+                    self._cond.wait(max(0.0, min(batch.deadline for batch in self._open.values()) - now))
+                else:
+                    self._cond.wait()  # woken by translate() or a finished request
+
+    def _send(self, batch):
+        try:
+            self._translate_batch(batch)
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify()
+
+    def _translate_batch(self, batch):
+        dest, src, _ = batch.key
+        texts = [text for text, _ in batch.items]
+        futures = [future for _, future in batch.items]
+        self.count("translation_requests")
+        try:
+            translated = self.translate_fn("\n".join(texts), dest, src)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        if len(texts) == 1:
+            futures[0].set_result(translated)
+            return
+        parts = translated.split("\n")
+        if len(parts) == len(texts):
+            self.count("batched", len(texts))
+            for future, part in zip(futures, parts):
+                future.set_result(part.strip())
+            return
+        # The backend merged or split lines: nothing can be matched up safely
+        self.count("batch_fallbacks")
+        for text, future in batch.items:
+            self.count("translation_requests")
+            try:
+                future.set_result(self.translate_fn(text, dest, src))
+            except Exception as e:
+                future.set_exception(e)
+
+    def close(self, timeout=5.0):
+        """Send what is still collecting, wait for it, then stop."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+
+
+# ---------------- Translation backend protection ----------------
+
+THROTTLE_ERROR_RE = re.compile(r"\b429\b|too many requests|rate limit", re.IGNORECASE)
+
+
+class TranslationUnavailable(Exception):
+    """The translation backend was not called: circuit open or no request budget left."""
+
+
+def is_throttling_error(error):
+    """True for 429-like failures: the backend asks us to slow down rather than being broken."""
+    return isinstance(error, FakeTranslatorThrottled) or bool(THROTTLE_ERROR_RE.search(str(error)))
+
+
+class TokenBucket:
+    """
+    Adaptive token bucket: `rate` requests per second with bursts of up to `burst`. Each
+    throttled() halves the rate (not below `min_rate`); while calls succeed the rate grows back
+    by `recovery` requests/s per second until the configured rate is reached again. The burst
+    shrinks with the rate, so a pause does not end in a full burst. rate=0 disables limiting.
+    """
+
+    def __init__(self, rate=10.0, burst=20, min_rate=0.2, recovery=0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, float(burst))
+        self.min_rate = min(min_rate, rate) if rate else 0.0
+        self.recovery = recovery
+        self._tokens = self.burst
+        self._updated = self._rate_changed = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        burst = max(1.0, self.burst * self.rate / self.max_rate)
+        self._tokens = min(burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=0.0):
+        """Take one token, waiting up to `timeout` seconds for it. Returns False if none came."""
+        if not self.max_rate:
+            return True
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def throttled(self):
+        with self._lock:
+            if self.max_rate:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = min(self._tokens, 0.0)  # no burst right after a 429
+                self._rate_changed = time.monotonic()
+
+    def success(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + (now - self._rate_changed) * self.recovery)
+            self._rate_changed = now
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing backend. Opens after `failure_threshold` consecutive failures, or at
+    once on a throttling response; while open, calls are refused. After `reset_timeout` seconds
+    one probe call is let through (half-open): success closes the circuit, failure reopens it
+    with the timeout doubled, up to `max_reset_timeout`.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=5.0, max_reset_timeout=300.0, clock=time.monotonic):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0  # times the circuit has opened
+        self.reset_timeout = reset_timeout
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go out now; the first call after the timeout becomes the probe."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() >= self.retry_at:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def is_open(self):
+        """True while calls are refused without a probe being due (cheap pre-check)."""
+        with self._lock:
+            return self.state == self.HALF_OPEN or (self.state == self.OPEN and self.clock() < self.retry_at)
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self, throttled=False):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            elif self.state == self.OPEN or not (throttled or self.failures >= self.failure_threshold):
+                return
+            self.state = self.OPEN
+            self.opened += 1
+            self.retry_at = self.clock() + self.reset_timeout
+
+    def retry_in(self):
+        """Seconds until the next probe while open, else 0."""
+        with self._lock:
+            return max(0.0, self.retry_at - self.clock()) if self.state == self.OPEN else 0.0
+
+
+class TranslationBackendGuard:
+    """
+    Token bucket + circuit breaker around translation backend calls. call() raises
+    TranslationUnavailable instead of calling the backend while the circuit is open or when
+    no token arrives within `max_wait` seconds; outcomes feed both the breaker and the bucket.
+    count(name, n), if given, receives the "throttled" and "unavailable" counters; pauses and
+    resumptions are logged.
+    """
+
+    def __init__(self, bucket=None, breaker=None, max_wait=5.0, count=None, logger=None):
+        self.bucket = bucket or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_wait = max_wait
+        self.count = count or (lambda name, n=1: None)
+        self._logger = logger or logging.getLogger("ScTranslationApp")
+
+    @classmethod
+    def from_settings(cls, settings, count=None, logger=None):
+        return cls(
+            TokenBucket(rate=settings.get("translation_rate_limit", 10.0),
+                        burst=settings.get("translation_rate_burst", 20)),
+            CircuitBreaker(failure_threshold=settings.get("circuit_failure_threshold", 5),
+                           reset_timeout=settings.get("circuit_reset_seconds", 5),
+                           max_reset_timeout=settings.get("circuit_max_reset_seconds", 300)),
+            max_wait=settings.get("translation_rate_wait", 5.0),
+            count=count,
+            logger=logger,
+        )
+
+    def call(self, fn):
+        if self.breaker.is_open():
+            self.count("unavailable")
+            raise TranslationUnavailable(f"translation paused, retrying in {self.breaker.retry_in():.0f} s")
+        if not self.bucket.acquire(self.max_wait):
+            self.count("unavailable")
+            raise TranslationUnavailable("translation rate limit reached")
+        if not self.breaker.allow():
+            self.count("unavailable")
+            raise TranslationUnavailable("translation paused")
+        try:
+            result = fn()
+        except Exception as e:
+            throttled = is_throttling_error(e)
+            if throttled:
+                self.count("throttled")
+                self.bucket.throttled()
+            opened = self.breaker.opened
+            self.breaker.record_failure(throttled)
+            if self.breaker.opened != opened:
+                self._logger.warning(
+                    f"Translation paused for {self.breaker.reset_timeout:.0f} s after "
+                    f"{'throttling' if throttled else 'repeated failures'}: {e}"
+                )
+            raise
+        if self.breaker.state != CircuitBreaker.CLOSED:
+            self._logger.info("Translation backend recovered, translation resumed")
+        self.breaker.record_success()
+        self.bucket.success()
+        return result
+
+    def status(self):
+        breaker, bucket = self.breaker, self.bucket
+        return {
+            "state": breaker.state,
+            "retry_in": breaker.retry_in(),
+            "rate": bucket.rate,
+            "max_rate": bucket.max_rate,
+            "opened": breaker.opened,
+        }
+
+
+def format_backend_status(status):
+    """Status bar text for TranslationBackendGuard.status(); empty while everything is normal."""
+    if status["state"] == CircuitBreaker.OPEN:
+        return f"Translator paused (errors/throttling), retrying in {status['retry_in']:.0f} s"
+    if status["state"] == CircuitBreaker.HALF_OPEN:
+        return "Translator paused, checking whether it is back..."
+    if status["max_rate"] and status["rate"] < status["max_rate"]:
+        return f"Translator throttled: {status['rate']:.1f} requests/s"
+    return ""
+
+
+class TranslationCache:
+    """
+    Two-tier cache of translated strings keyed by normalized source text, target language and
+    the requested source language ("auto" when detected by the backend), so a translation made
+    with a wrong source-language hint never answers an auto-detected lookup.
+    Tier 1 is an in-memory LRU, tier 2 a SQLite file that survives restarts.
+    Entries older than `ttl` seconds are treated as misses and pruned.
+    """
+
+    PRUNE_EVERY = 500  # disk puts between size/TTL pruning passes
+
+    def __init__(self, db_path, memory_entries=2000, max_entries=50000, ttl=604800):
+        self.db_path = db_path
+        self.memory_entries = max(0, int(memory_entries))
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()   # (text, dest, src) -> (translated, created)
+        self._puts_since_prune = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_table()
+        self._prune()
+
+    def _create_table(self):
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(translation_cache)")]
+        if columns and "src" not in columns:
+            # Cache files from before source-language hints: their entries were auto-detected
+            self._conn.execute("ALTER TABLE translation_cache RENAME TO translation_cache_old")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS translation_cache (
+                source TEXT NOT NULL,
+                dest TEXT NOT NULL,
+                src TEXT NOT NULL DEFAULT 'auto',
+                translated TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (source, dest, src)
+            )
+        """)
+        if columns and "src" not in columns:
+            self._conn.execute("""
+                INSERT INTO translation_cache (source, dest, translated, created, last_used)
+                SELECT source, dest, translated, created, last_used FROM translation_cache_old
+            """)
+            self._conn.execute("DROP TABLE translation_cache_old")
+        self._conn.commit()
+
+    @staticmethod
+    def normalize(text):
+        """Collapse whitespace and apply NFC so trivially different repeats share one entry."""
+        return unicodedata.normalize("NFC", " ".join(text.split()))
+
+    def _expired(self, created, now):
+        return bool(self.ttl) and now - created > self.ttl
+
+    def get(self, text, dest, src="auto"):
+        """Return the cached translation or None."""
+        key = (self.normalize(text), dest, src)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT translated, created FROM translation_cache WHERE source=? AND dest=? AND src=?", key
+            ).fetchone()
+            if row and not self._expired(row[1], now):
+                self._conn.execute(
+                    "UPDATE translation_cache SET last_used=? WHERE source=? AND dest=? AND src=?", (now, *key)
+                )
+                self._conn.commit()
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, text, dest, translated, src="auto"):
+        """Store a successful translation in both tiers."""
+        key = (self.normalize(text), dest, src)
+        now = time.time()
+        with self._lock:
+            self._remember(key, translated, now)
+            if not self.max_entries:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translation_cache (source, dest, src, translated, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, translated, now, now)
+            )
+            self._conn.commit()
+            self._puts_since_prune += 1
+            if self._puts_since_prune >= self.PRUNE_EVERY:
+                self._prune()
+
+    def _remember(self, key, translated, created):
+        if not self.memory_entries:
+            return
+        self._memory[key] = (translated, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _prune(self):
+        """Drop expired rows, then the least recently used rows above max_entries."""
+        self._puts_since_prune = 0
+        if self.ttl:
+            self._conn.execute("DELETE FROM translation_cache WHERE created < ?", (time.time() - self.ttl,))
+        self._conn.execute("""
+            DELETE FROM translation_cache WHERE rowid IN (
+                SELECT rowid FROM translation_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+        self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM translation_cache").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OrderedWorkerPool:
+    """
+    Bounded thread pool whose results are handed to `deliver` strictly in submission order.
+    A slow job only delays the jobs queued behind it, while later jobs keep running in parallel.
+    submit() blocks once `max_pending` jobs are in flight, which throttles the producer.
+    """
+
+    def __init__(self, deliver, workers=4, max_pending=None, logger=None, name="translation"):
+        workers = max(1, int(workers))
+        self._deliver = deliver
+        self._logger = logger or logging.getLogger("ScTranslationApp")
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=f"{name}-worker"
+        )
+        self._pending = queue.Queue(maxsize=max_pending or workers * 8)
+        self._closed = False
+        self._thread = threading.Thread(target=self._delivery_loop, name=f"{name}-delivery", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        if self._closed:
+            return
+        self._pending.put(self._executor.submit(fn, *args))
+
+    def _delivery_loop(self):
+        while True:
+            future = self._pending.get()
+            if future is None:
+                break
+            try:
+                self._deliver(future.result())
+            except Exception as e:
+                self._logger.error(f"Worker pool job failed: {e}")
+
+    def close(self, timeout=5.0):
+        """Deliver everything already submitted, then stop the pool."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pending.put(None)
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=False)
+
+
+class GameDictionaryMatcher:
+    """
+    Replaces every game dictionary key in one case-insensitive pass over the text.
+    The keys are compiled into a single trie-shaped regex, so the per-line cost depends
+    on the text length rather than on the number of entries, and the longest key wins
+    when several keys start at the same position.
+    """
+
+    def __init__(self, dictionary):
+        self._replacements = {}
+        for key, value in dictionary.items():
+            if key:
+                # First spelling wins, as with the old one-key-at-a-time substitution
+                self._replacements.setdefault(key.lower(), value)
+        self._pattern = self._compile(self._replacements) if self._replacements else None
+
+    def __len__(self):
+        return len(self._replacements)
+
+    @classmethod
+    def _compile(cls, keys):
+        return re.compile(cls.trie_pattern(keys), re.IGNORECASE)
+
+    @classmethod
+    def trie_pattern(cls, keys):
+        """Regex source matching any of `keys`, longest first, with shared prefixes factored out."""
+        trie = {}
+        for key in keys:
+            node = trie
+            for char in key:
+                node = node.setdefault(char, {})
+            node[""] = {}  # end-of-key marker
+        return cls._trie_to_regex(trie)
+
+    @classmethod
+    def _trie_to_regex(cls, node):
+        branches = [re.escape(char) + cls._trie_to_regex(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # A key ends here but longer keys continue: greedy optional prefers the longest
+            body = "(?:" + body + ")?"
+        return body
+
+    def _replace(self, match):
+        text = match.group(0)
+        return self._replacements.get(text.lower(), text)
+
+    def apply(self, text):
+        if self._pattern is None:
+            return text
+        return self._pattern.sub(self._replace, text)
+
+
+class ChatLineClassifier:
+    """
+    Precompiled, single-scan replacement for the per-line category/skip checks.
+    Every CHAT_CATEGORIES key and SKIP_PATTERNS entry is compiled into one trie-shaped
+    regex that runs over the lowercased line once; classify() returns
+    (category, skip, username, message) for a raw chat.log line.
+    Categories keep the dict-order priority of CHAT_CATEGORIES: if several keys occur in
+    a line, the one listed first wins, wherever it appears.
+    """
+
+    USERNAME_RE = re.compile(r"\[(.*?)\]")
+
+    def __init__(self, categories=None, skip_patterns=None):
+        categories = CHAT_CATEGORIES if categories is None else categories
+        skip_patterns = SKIP_PATTERNS if skip_patterns is None else skip_patterns
+        keys = [key.lower() for key in categories]
+        names = list(categories.values())
+
+        # The scan reports the longest token at each position. A key that occurs in a line
+        # implies every key contained in it occurs too, so each key maps to the
+        # highest-priority category among its own substrings.
+        self._category_for = {}
+        for key in keys:
+            rank = min(i for i, other in enumerate(keys) if other in key)
+            self._category_for.setdefault(key, (rank, names[rank]))
+        self._skip = {pattern.lower() for pattern in skip_patterns}
+        tokens = set(self._category_for) | self._skip
+        self._pattern = re.compile(GameDictionaryMatcher.trie_pattern(tokens))
+
+    def split_message(self, line):
+        """Return (username, message): the first [...] and the text after the first ']'."""
+        username_match = self.USERNAME_RE.search(line)
+        username = username_match.group(1).strip() if username_match else "NotThePlayer"
+        bracket = line.find("]")
+        message = line[bracket + 1:].strip() if bracket != -1 else line.strip()
+        return username, message
+
+    def classify(self, line):
+        """
+        Return (category, skip, username, message). username/message are only extracted
+        for lines that are kept (category found and not skipped), otherwise they are None.
+        """
+        best = None
+        skip = False
+        for token in self._pattern.findall(line.lower()):
+            found = self._category_for.get(token)
+            if found is not None:
+                if best is None or found[0] < best[0]:
+                    best = found
+            else:
+                skip = True
+        if best is None or skip:
+            return (best[1] if best else None), skip, None, None
+        return (best[1], False) + self.split_message(line)
+
+
+# ---------------- Local language identification ----------------
+
+# Frequent character trigrams ("_" = word boundary) of the Latin-script
+# chat languages, plus letters that only some of them use. Enough to recognize a chat line;
+# anything ambiguous scores a low confidence and is translated as before.
+LATIN_TRIGRAMS = {
+    "en": "_th the he_ _an and nd_ _to to_ _in in_ _of of_ _is is_ _it it_ _yo you ou_ _fo for or_ "
+          "_wa was as_ _be _we _ha hav ave ve_ tha hat at_ thi his ing ng_ ion on_ er_ ed_ es_ re_ "
+          "are _ar all ll_ _wh wha _no not ot_ _ca can an_ _ju jus ust st_ _bu but ut_ _so so_ _me "
+          "_my my_ _ho how ow_ _an any ny_ _ge get et_ _go _ok ok_",
+    "de": "_de der er_ _di die ie_ _da das as_ _un und nd_ _ei ein in_ _ic ich ch_ _is ist st_ "
+          "_ni nic cht ht_ _mi mit it_ _au auf uf_ _zu zu_ _si sie sch en_ gen ten te_ den ber ung "
+          "ng_ _ha hab abe be_ _wi wir ir_ _ke kei ine ne_ es_ _ge auc uch ach _ja ja_ _wa was nn_ "
+          "ann dan sin ind _na nac _al all",
+    "fr": "_de de_ _le le_ _la la_ les es_ _et et_ _un une ne_ _qu que ue_ _pa pas as_ _po pou our "
+          "ur_ est st_ _je je_ _tu tu_ _ce ce_ _vo vou ous us_ _no non on_ ais oi_ moi _mo ent nt_ "
+          "_da dan ans ns_ _av ave vec ec_ qui ui_ tre re_ eur ez_ _fa fai ait it_ _sa sai _ça ça_ "
+          "_bo bon jou our",
+    "es": "_de de_ _la la_ _el el_ _lo los os_ _qu que ue_ _en en_ _es es_ _un una na_ _po por or_ "
+          "_pa par ara ra_ _co con on_ est sta ta_ _no no_ _si si_ _pe per ero ro_ ado do_ as_ _ha "
+          "hay ay_ _ho hol ola la_ _to tod odo mos ien ier _ya ya_ _mu muy uy_ _al al_ _me me_ _te te_",
+    "it": "_di di_ _ch che he_ _la la_ _il il_ _lo lo_ _de del el_ _pe per er_ _co con on_ _no non "
+          "on_ _un una na_ to_ ta_ te_ ne_ sta ato _ho ho_ _ci ci_ _se sei ei_ _mi mi_ _ma ma_ gli "
+          "li_ _so son ono no_ zio io_ anc nch are re_ _co cos osa sa_ _qu qua ual _gr gra azi zie "
+          "_ci cia iao ao_ _tu tut utt tti ti_ com ome me_ que ues _mo mol olt lto _vu vuo uol ole _gi "
+          "gio ioc oca _fa far _ra rag azz zzi zi_ lle ell lla",
+    "pt": "_de de_ _do do_ _da da_ _qu que ue_ _co com om_ _na nao não ão_ _pa par ara ra_ _um um_ "
+          "uma ma_ os_ as_ _em em_ _es est sta ta_ _vo voc ocê cê_ _te tem _el ele le_ _eu eu_ _ma mas "
+          "_mu mui uit ito to_ _ob obr bri rig ado ção _se se_ _já já_ _vc vc_",
+    "pl": "_ni nie ie_ _je jes est st_ _to to_ _na na_ _si się ię_ _po _pr prz rze ze_ _ja jak ak_ "
+          "_co co_ _al ale le_ _ta tak _cz czy zy_ _ty ty_ _mi mi_ _wi wie dzi ki_ ski ch_ ego go_ "
+          "ow_ em_ ać_ _mo moż oże że_ _do dob obr bry ry_ _ma mas asz sz_ ać_",
+    "tr": "_bi bir ir_ _ve ve_ _bu bu_ _ne ne_ _da da_ _de de_ _am ama ma_ _be ben en_ _se sen _va "
+          "var ar_ lar ler er_ yor or_ in_ ın_ an_ ım_ im_ _mi mi_ _ço çok ok_ _ge gel _ya _iy iyi "
+          "yi_ ned ede cak ece _na nas ası sıl",
+}
+LATIN_MARKERS = {
+    "de": "äöüß", "fr": "éèêàçùœëî", "es": "ñ¿¡áíóú", "it": "àèìòù", "pt": "ãõçêôáâ",
+    "pl": "ąęłśżźćńó", "tr": "ığşçöüİ",
+}
+# Unicode ranges of scripts that (for this app) identify the language on their own
+SCRIPT_LANGUAGES = (
+    ((0x0400, 0x04FF), "ru"), ((0x3040, 0x30FF), "ja"), ((0x4E00, 0x9FFF), "zh"),
+    ((0xAC00, 0xD7AF), "ko"), ((0x0600, 0x06FF), "ar"), ((0x0900, 0x097F), "hi"),
+    ((0x0370, 0x03FF), "el"), ((0x0590, 0x05FF), "he"), ((0x0E00, 0x0E7F), "th"),
+)
+WORD_RE = re.compile(r"[^\W\d_]+")
+ITEM_LINK_RE = re.compile(r"\[link [^\]]*\]")  # "[link 2 d:Ship_Race3_M_T5_CraftUniq]" item links
+
+
+class LanguageIdentifier:
+    """
+    Offline language guess for a chat message: script detection first (Cyrillic, CJK, Arabic, ...),
+    then character trigram scoring between the Latin-script languages. identify() returns
+    (language code or None, confidence 0..1); short or mixed lines get low confidence.
+    """
+
+    MIN_TRIGRAMS = 6  # below this many scored trigrams confidence is scaled down
+
+    MARKER_WEIGHT = 2  # a language-specific letter counts as much as two trigrams
+
+    def __init__(self, profiles=LATIN_TRIGRAMS, markers=LATIN_MARKERS):
+        self.languages = tuple(profiles)
+        # One lookup per trigram / letter: gram -> languages whose profile contains it
+        self._grams = {}
+        for lang, text in profiles.items():
+            for gram in text.split():
+                # "_" marks a word boundary, as in the space-padded words identify() scans
+                self._grams.setdefault(gram.replace("_", " "), []).append(lang)
+        self._markers = {}
+        for lang, chars in markers.items():
+            for char in chars:
+                self._markers.setdefault(char, []).append(lang)
+
+    @staticmethod
+    def _script(char):
+        code = ord(char)
+        for (low, high), lang in SCRIPT_LANGUAGES:
+            if low <= code <= high:
+                return lang
+        return None
+
+    def identify(self, text):
+        words = WORD_RE.findall(ITEM_LINK_RE.sub(" ", text).lower())
+        if not words:
+            return None, 0.0
+        scripts = {}
+        letters = 0
+        for word in words:
+            for char in word:
+                letters += 1
+                if char > "ͯ":  # beyond Latin + combining marks
+                    lang = self._script(char)
+                    if lang is not None:
+                        scripts[lang] = scripts.get(lang, 0) + 1
+        if scripts:
+            if "ja" in scripts:  # kana marks Japanese even when mixed with kanji
+                scripts["ja"] += scripts.pop("zh", 0)
+            lang, count = max(scripts.items(), key=lambda item: item[1])
+            if count * 2 > letters:
+                return lang, count / letters
+            # otherwise mostly Latin: fall through and score it
+
+        scores = dict.fromkeys(self.languages, 0)
+        grams, markers = self._grams, self._markers
+        for word in words:
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                for lang in grams.get(padded[i:i + 3], ()):
+                    scores[lang] += 1
+            if not word.isascii():
+                for char in word:
+                    for lang in markers.get(char, ()):
+                        scores[lang] += self.MARKER_WEIGHT
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        (lang, best), (_, runner_up) = ranked[0], ranked[1]
+        if not best:
+            return None, 0.0
+        margin = (best - runner_up) / best
+        coverage = min(1.0, best / self.MIN_TRIGRAMS)
+        return lang, margin * coverage
+
+
+def same_language(detected, target):
+    """True if detected and target name the same base language ("zh" vs "zh-cn")."""
+    return bool(detected) and detected.split("-")[0].lower() == target.split("-")[0].lower()
+
+
+# Language the players of each CHAT_CATEGORIES channel write in: the default source language
+# of translate calls for that channel (googletrans codes)
+CHANNEL_LANGUAGES = {
+    "English": "en", "Russian": "ru", "Chinese": "zh-cn", "German": "de", "Italian": "it", "French": "fr",
+    "Spanish": "es", "Japanese": "ja", "Portuguese": "pt", "Turkish": "tr", "Polish": "pl",
+    "Hungarian": "hu", "Czech": "cs", "Ukrainian": "uk",
+}
+# Every code LanguageIdentifier can return; user profiles are built from these only
+IDENTIFIABLE_LANGUAGES = frozenset(LATIN_TRIGRAMS) | {lang for _, lang in SCRIPT_LANGUAGES}
+GOOGLE_LANGUAGE_CODES = {"zh": "zh-cn"}  # LanguageIdentifier code -> googletrans code
+
+
+class SourceLanguageHints:
+    """
+    Source language for a translate call, so the backend can skip auto-detection. The sender's
+    profile (the language most of their recent messages were identified as) wins over the
+    channel default from CHANNEL_LANGUAGES. Profiles are read from the src_lang column of
+    chat_history.db the first time a sender is seen, then kept up to date by learn().
+
+    hint() returns (src, source) with source "user", "channel" or None (src is then "auto").
+    """
+
+    PROFILE_MESSAGES = 50  # most recent identified messages a profile is built from
+    PROFILE_QUERY = "SELECT message, src_lang FROM messages WHERE username=? ORDER BY id DESC LIMIT ?"
+
+    def __init__(self, db_path=None, identifier=None, min_messages=3, min_share=0.7, min_confidence=0.5,
+                 max_users=5000):
+        self.db_path = db_path
+        self.identifier = identifier or LanguageIdentifier()
+        self.min_confidence = min_confidence  # for identifying rows stored without src_lang
+        self.min_messages = min_messages
+        self.min_share = min_share
+        self.max_users = max(1, int(max_users))
+        self._profiles = OrderedDict()  # username -> deque of identified languages, newest last (LRU order)
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path is not None:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+
+    def _load(self, username):
+        """Identified languages of the sender's stored messages, oldest first."""
+        if self._conn is None or not username:
+            return []
+        rows = self._conn.execute(self.PROFILE_QUERY, (username, self.PROFILE_MESSAGES)).fetchall()
+        languages = []
+        for message, src_lang in reversed(rows):
+            if src_lang is None and message:
+                # Stored before the src_lang column existed: identify it now (cost is bounded
+                # by PROFILE_MESSAGES per sender, once)
+                lang, confidence = self.identifier.identify(message)
+                src_lang = lang if confidence >= self.min_confidence else None
+            if src_lang:
+                languages.append(src_lang)
+        return languages
+
+    def _history(self, username):
+        # Called with the lock held
+        history = self._profiles.get(username)
+        if history is None:
+            history = deque(self._load(username), maxlen=self.PROFILE_MESSAGES)
+            self._profiles[username] = history
+            if len(self._profiles) > self.max_users:
+                self._profiles.popitem(last=False)
+        else:
+            self._profiles.move_to_end(username)
+        return history
+
+    def learn(self, username, lang):
+        """Add one identified message language to the sender's profile."""
+        if not username or not lang:
+            return
+        with self._lock:
+            self._history(username).append(lang)
+
+    def profile(self, username):
+        """The sender's language, or None while their history is too short or too mixed."""
+        if not username:
+            return None
+        with self._lock:
+            history = self._history(username)
+            if len(history) < self.min_messages:
+                return None
+            lang, count = Counter(history).most_common(1)[0]
+        return lang if count / len(history) >= self.min_share else None
+
+    def hint(self, category, username, target, detected=None):
+        """
+        Pick the source language for one message. No hint is given when it names the target
+        language (that would just echo the line back) or contradicts `detected`, a confident
+        local identification of the line itself.
+        """
+        channel = CHANNEL_LANGUAGES.get(category)
+        user = self.profile(username)
+        if user is not None and (channel is None or channel.split("-")[0] in IDENTIFIABLE_LANGUAGES):
+            src, source = GOOGLE_LANGUAGE_CODES.get(user, user), "user"
+        elif channel is not None:
+            src, source = channel, "channel"
+        else:
+            return "auto", None
+        if same_language(src, target):
+            return "auto", None
+        if detected and src.split("-")[0] in IDENTIFIABLE_LANGUAGES and not same_language(detected, src):
+            return "auto", None
+        return src, source
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# ---------------- Repeated message detection ----------------
+
+# Channels whose reposted ads are collapsed: trading and the public language channels
+REPEAT_CATEGORIES = frozenset(("Trading", *CHANNEL_LANGUAGES))
+NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+class _RepeatEntry:
+    """One recent message of a sender and how often it has been (nearly) repeated."""
+
+    __slots__ = (
+        "id", "normalized", "shingles", "last_seen", "count", "translated", "translated_for", "translated_dest",
+        "src_lang",
+    )
+
+    def __init__(self, entry_id, normalized, shingles, now):
+        self.id = entry_id
+        self.normalized = normalized
+        self.shingles = shingles
+        self.last_seen = now
+        self.count = 1
+        self.translated = None  # latest known translation of this message...
+        self.translated_for = None  # ...the normalized wording it was made for...
+        self.translated_dest = None  # ...the target language it was made into...
+        self.src_lang = None  # ...and the confident local language guess of that wording
+
+    def remember(self, translated, wording, dest, src_lang):
+        self.translated, self.translated_for, self.translated_dest, self.src_lang = translated, wording, dest, src_lang
+
+    def translation_for(self, wording, dest):
+        """The remembered translation if it was made for this wording and target language, else None."""
+        if self.translated_for == wording and self.translated_dest == dest:
+            return self.translated
+        return None
+
+
+class RepeatDetector:
+    """
+    Rolling per-sender near-duplicate detection for reposted ads. Messages are normalized
+    (case, punctuation and spacing ignored) and cut into character shingles; a message whose
+    shingle set overlaps one of the same sender's messages from the last `window` seconds by at
+    least `similarity` (Jaccard) is a repeat of it. The entry then follows the newest wording,
+    so an ad that drifts a little at each repost keeps matching.
+    """
+
+    SHINGLE = 4
+
+    def __init__(self, window=600, similarity=0.8, per_user=8, max_users=2000):
+        self.window = window
+        self.similarity = similarity
+        self.per_user = per_user
+        self.max_users = max(1, int(max_users))
+        self._users = OrderedDict()  # username -> list of _RepeatEntry (LRU order)
+        self._ids = itertools.count(1)
+
+    @staticmethod
+    def normalize(text):
+        return NON_WORD_RE.sub(" ", text.casefold()).strip()
+
+    def _shingles(self, normalized):
+        size = self.SHINGLE
+        if len(normalized) <= size:
+            return frozenset((normalized,))
+        return frozenset(normalized[i:i + size] for i in range(len(normalized) - size + 1))
+
+    def check(self, username, text, now=None):
+        """
+        Register one message. Returns (entry, exact): entry.count > 1 means it repeats an earlier
+        message of the sender (exact: same normalized text); otherwise entry is a new one.
+        """
+        now = time.monotonic() if now is None else now
+        normalized = self.normalize(text)
+        entries = self._users.get(username)
+        if entries is None:
+            entries = self._users[username] = []
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(username)
+            entries[:] = [entry for entry in entries if now - entry.last_seen <= self.window]
+
+        best, best_score, shingles = None, 0.0, None
+        for entry in entries:
+            if entry.normalized == normalized:
+                best, best_score = entry, 1.0
+                break
+            if shingles is None:
+                shingles = self._shingles(normalized)
+            small, large = sorted((len(shingles), len(entry.shingles)))
+            if small < self.similarity * large:  # Jaccard can not reach the threshold
+                continue
+            score = len(shingles & entry.shingles) / len(shingles | entry.shingles)
+            if score > best_score:
+                best, best_score = entry, score
+        if best is not None and best_score >= self.similarity:
+            exact = best.normalized == normalized
+            best.count += 1
+            best.last_seen = now
+            if not exact:
+                best.normalized, best.shingles = normalized, shingles
+            return best, exact
+
+        entry = _RepeatEntry(next(self._ids), normalized, shingles or self._shingles(normalized), now)
+        entries.append(entry)
+        if len(entries) > self.per_user:
+            entries.pop(0)
+        return entry, False
+
+
+# ---------------- chat.log following ----------------
+
+class _Inotify:
+    """Minimal ctypes inotify(7) wrapper: wakes up when a watched path changes."""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    FILE_EVENTS = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_DELETE_SELF | IN_MOVE_SELF
+    DIR_EVENTS = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+
+    def __init__(self, path, mask=FILE_EVENTS):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, "O_CLOEXEC", 0))
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {path}")
+
+    def wait(self, timeout):
+        """Block until at least one event arrives (True) or timeout elapses (False)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 4096):  # drain; we only care that something changed
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileFollower:
+    """
+    Follows a growing text file (tail -f). On Linux the reader sleeps on inotify until the
+    file changes; elsewhere it polls the file size with an adaptive interval that backs off
+    while the file is idle. Incomplete trailing lines are held back until their newline arrives.
+    """
+
+    def __init__(self, path, from_end=True, poll_interval=0.05, max_poll_interval=0.25, use_inotify=True):
+        self.path = str(path)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._interval = poll_interval
+        self._partial = b""
+        self._file = open(self.path, "rb")
+        if from_end:
+            self._file.seek(0, os.SEEK_END)
+        self._inotify = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify(self.path)
+            except (OSError, AttributeError):
+                self._inotify = None  # fall back to polling
+
+    @property
+    def uses_inotify(self):
+        return self._inotify is not None
+
+    def _size_changed(self):
+        size = os.fstat(self._file.fileno()).st_size
+        position = self._file.tell()
+        if size < position:  # truncated or replaced: start over
+            self._file.seek(0)
+            self._partial = b""
+            return True
+        return size > position
+
+    def read_available(self):
+        """Return every complete line appended since the last call."""
+        self._size_changed()
+        lines = []
+        while True:
+            chunk = self._file.readline()
+            if not chunk:
+                break
+            if not chunk.endswith(b"\n"):
+                self._partial += chunk
+                break
+            data, self._partial = self._partial + chunk, b""
+            lines.append(data.decode("utf-8", errors="replace"))
+        return lines
+
+    def wait(self, timeout):
+        """Block until the file may have new data (True) or timeout elapses (False)."""
+        if self._inotify is not None:
+            return self._inotify.wait(timeout)
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._size_changed():
+                self._interval = self.poll_interval
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self._interval, remaining))
+            self._interval = min(self._interval * 2, self.max_poll_interval)
+
+    def read_lines(self, timeout):
+        """Return new complete lines, waiting up to timeout seconds for some to appear."""
+        lines = self.read_available()
+        if not lines and self.wait(timeout):
+            lines = self.read_available()
+        return lines
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._file.close()
+
+
+class SessionFolderIndex:
+    """
+    Tracks the newest session folder under the StarConflict logs directory.
+    The folder list is scanned once; afterwards it is only rescanned when the logs
+    directory changes (inotify event on Linux, or a new directory mtime seen at most every
+    `refresh_interval` seconds), and only folders not seen before are stat()ed.
+    """
+
+    def __init__(self, logs_dir, refresh_interval=2.0, use_inotify=True):
+        self.logs_dir = Path(logs_dir)
+        self.refresh_interval = refresh_interval
+        self.scans = 0
+        self._ctimes = {}  # folder name -> st_ctime
+        self._latest = None
+        self._dir_mtime = None
+        self._checked_at = None
+        self._logfile = None
+        self._inotify = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify(self.logs_dir, mask=_Inotify.DIR_EVENTS)
+            except (OSError, AttributeError):
+                self._inotify = None
+
+    def latest_logfile(self):
+        """Return chat.log of the newest session folder, or None."""
+        now = time.monotonic()
+        changed = self._inotify is not None and self._inotify.wait(0)
+        if changed or self._checked_at is None or now - self._checked_at >= self.refresh_interval:
+            self._checked_at = now
+            self._refresh()
+        return self._logfile
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.logs_dir).st_mtime_ns
+        except OSError:
+            self._ctimes.clear()
+            self._latest = None
+            self._dir_mtime = None
+            self._logfile = None
+            return
+        if mtime != self._dir_mtime:
+            self._dir_mtime = mtime
+            self._rescan()
+        if self._latest is None:
+            self._logfile = None
+            return
+        log_file = self.logs_dir / self._latest / "chat.log"
+        self._logfile = log_file if log_file.exists() else None
+
+    def _rescan(self):
+        self.scans += 1
+        seen = set()
+        with os.scandir(self.logs_dir) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_dir():
+                        continue
+                    seen.add(entry.name)
+                    if entry.name not in self._ctimes:
+                        self._ctimes[entry.name] = entry.stat().st_ctime
+                except OSError:
+                    continue
+        for name in set(self._ctimes) - seen:
+            del self._ctimes[name]
+        self._latest = max(self._ctimes, key=self._ctimes.get) if self._ctimes else None
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+# ---------------- Chat history schema ----------------
+# Forward-only migrations for chat_history.db. SCHEMA_MIGRATIONS[n] upgrades version n to n + 1;
+# the current version is stored in the schema_version table.
+
+def _schema_v1_messages(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            category TEXT,
+            username TEXT,
+            message TEXT,
+            translated TEXT,
+            lang TEXT,
+            session_id TEXT
+        )
+    """)
+
+
+def _schema_v2_history_indexes(conn):
+    # History tab: date range scans and "last session" lookups, both ordered by timestamp
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, timestamp)")
+
+
+def fts5_available(conn):
+    """True if this sqlite3 build has the FTS5 module (some Python builds ship without it)."""
     try:
-        return asyncio.run(coro)
-    except RuntimeError as e:
-        if "Event loop is closed" in str(e) or "There is no current event loop" in str(e):
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("DROP TABLE temp.fts5_probe")
+    return True
+
+
+def has_fulltext_index(conn):
+    """True if History search can use the messages_fts index (see HISTORY_SEARCH_QUERY)."""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='messages_fts'").fetchone()
+    return row is not None and fts5_available(conn)
+
+
+def _schema_v3_fulltext_search(conn):
+    # History search: external-content FTS5 index (no second copy of the text), kept in sync
+    # by triggers so every writer is covered, then backfilled from the existing rows.
+    # Without FTS5 the index is skipped and search falls back to LIKE (like_search_query);
+    # migrate_database() builds it later if the sqlite3 build gains FTS5
+    if not fts5_available(conn):
+        return
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            message, translated, username,
+            content='messages', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, message, translated, username)
+            VALUES (new.id, new.message, new.translated, new.username);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, message, translated, username)
+            VALUES ('delete', old.id, old.message, old.translated, old.username);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, message, translated, username)
+            VALUES ('delete', old.id, old.message, old.translated, old.username);
+            INSERT INTO messages_fts(rowid, message, translated, username)
+            VALUES (new.id, new.message, new.translated, new.username);
+        END
+    """)
+    conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+
+def _schema_v4_source_language(conn):
+    # Source-language hints: the language each message was identified as ('' if unsure, NULL
+    # if stored earlier), and the per-sender lookup that profiles are built from
+    conn.execute("ALTER TABLE messages ADD COLUMN src_lang TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_username ON messages(username, id)")
+
+
+SCHEMA_MIGRATIONS = [
+    _schema_v1_messages,
+    _schema_v2_history_indexes,
+    _schema_v3_fulltext_search,
+    _schema_v4_source_language,
+]
+
+# History queries are keyset-paginated on (timestamp, id): each page continues after the last
+# row of the previous one, so page N costs the same as page 1.
+# Timestamps are stored as 'YYYY-MM-DD HH:MM:SS', so a day is the half-open range [day, next day)
+HISTORY_DATE_QUERY = (
+    "SELECT id, timestamp, category, username, message, translated FROM messages "
+    "WHERE timestamp >= ? AND timestamp < ? AND (timestamp, id) > (?, ?) "
+    "ORDER BY timestamp, id LIMIT ?"
+)
+HISTORY_SESSION_QUERY = (
+    "SELECT id, timestamp, category, username, message, translated FROM messages "
+    "WHERE session_id=? AND (timestamp, id) > (?, ?) "
+    "ORDER BY timestamp, id LIMIT ?"
+)
+# Search hits are ranked by bm25 (lower is better) and paginated on their rank. bm25 scores move
+# as new rows change the corpus statistics, so a float keyset could skip or repeat hits; the
+# listing is pinned to the rows that existed when it started (id <= snapshot, params
+# (match, snapshot)) and continues after the rank of the last row shown
+HISTORY_SEARCH_QUERY = (
+    "SELECT id, timestamp, category, username, message, translated, rank FROM ("
+    "SELECT m.id, m.timestamp, m.category, m.username, m.message, m.translated, "
+    "row_number() OVER (ORDER BY bm25(messages_fts), m.id) AS rank "
+    "FROM messages_fts f JOIN messages m ON m.id = f.rowid WHERE messages_fts MATCH ? AND m.id <= ?"
+    ") WHERE rank > ? ORDER BY rank LIMIT ?"
+)
+LATEST_ID_QUERY = "SELECT COALESCE(MAX(id), 0) FROM messages"
+LAST_SESSION_QUERY = "SELECT session_id FROM messages ORDER BY id DESC LIMIT 1"
+HISTORY_START = ("", 0)  # keyset cursor that sorts before every row
+SEARCH_START = (0,)
+HISTORY_SNAPSHOT = object()  # params placeholder: HistoryPager substitutes the latest message id
+
+
+def history_cursor(row):
+    return row[1], row[0]
+
+
+def search_cursor(row):
+    return (row[6],)
+
+
+def fts_query(text):
+    """
+    Turn search box input into an FTS5 query: every word must match (quoted, so FTS
+    operators and punctuation are taken literally); a trailing * keeps prefix matching.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*") and len(word) > 1
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def like_search_query(text):
+    """
+    History search without the FTS index: every word must appear in the message, translation
+    or username (case-insensitive for ASCII). Returns (query, params) for fetch_history_page,
+    paginated on history_cursor in time order, or (None, ()) for empty input.
+    """
+    words = [word.rstrip("*") for word in text.split()]
+    words = [word for word in words if word]
+    if not words:
+        return None, ()
+    condition = "(message LIKE ? ESCAPE '\\' OR translated LIKE ? ESCAPE '\\' OR username LIKE ? ESCAPE '\\')"
+    params = []
+    for word in words:
+        pattern = "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        params.extend((pattern,) * 3)
+    query = (
+        "SELECT id, timestamp, category, username, message, translated FROM messages "
+        f"WHERE {' AND '.join([condition] * len(words))} AND (timestamp, id) > (?, ?) "
+        "ORDER BY timestamp, id LIMIT ?"
+    )
+    return query, tuple(params)
+
+
+def get_schema_version(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = conn.execute("SELECT version FROM schema_version").fetchone()
+    return row[0] if row else 0
+
+
+def migrate_database(conn):
+    """Apply every pending schema migration, one transaction each. Returns the new version."""
+    version = get_schema_version(conn)
+    for target, migration in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        conn.execute("BEGIN")
+        try:
+            migration(conn)
+            conn.execute("DELETE FROM schema_version")
+            conn.execute("INSERT INTO schema_version (version) VALUES (?)", (target,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+    if version >= 3 and not has_fulltext_index(conn) and fts5_available(conn):
+        # Migrated to v3 on a build without FTS5: build the search index now that it is there
+        conn.execute("BEGIN")
+        try:
+            _schema_v3_fulltext_search(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return version
+
+
+def day_range(date_str):
+    """Return the [start, end) timestamp bounds of a 'YYYY-MM-DD' day."""
+    day = datetime.strptime(date_str, "%Y-%m-%d")
+    return day.strftime("%Y-%m-%d"), (day + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def fetch_history_page(conn, query, params, after=HISTORY_START, limit=500, cursor_of=history_cursor):
+    """
+    Run one page of a History query. Returns (rows, next_cursor); next_cursor is the keyset
+    of the last row (see history_cursor / search_cursor), or None when there are no further rows.
+    """
+    rows = conn.execute(query, (*params, *after, limit + 1)).fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, cursor_of(rows[-1])
+
+
+HISTORY_NOT_TRANSLATED = "(not translated)"  # shown for rows stored with translated = NULL
+
+
+def format_history_rows(rows):
+    """Render History rows as one string, so a page is a single Text insert."""
+    return "".join(
+        f"[{ts}] [{cat}] [{user}]: {msg}\n→ {HISTORY_NOT_TRANSLATED if trans is None else trans}\n\n"
+        for _id, ts, cat, user, msg, trans, *_ in rows
+    )
+
+
+class HistoryPager:
+    """
+    Pages through one History listing at a time. Queries run on a single background thread
+    with its own connection; results come back as futures the Tk loop polls. Starting a new
+    listing bumps `generation`, so pages of an older listing still in flight are dropped.
+    """
+
+    def __init__(self, db_path, page_size=500):
+        self.db_path = db_path
+        self.page_size = page_size
+        self.generation = 0
+        self._query = None
+        self._params = ()
+        self._cursor_of = history_cursor
+        self._cursor = None  # None: exhausted, or a page is in flight
+        self._conn = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+
+    @property
+    def has_more(self):
+        return self._cursor is not None
+
+    def start(self, query, params=None, after=HISTORY_START, cursor_of=history_cursor):
+        """
+        Begin a new listing and return a future for its first page. params=None means the last
+        session; a HISTORY_SNAPSHOT param is replaced by the latest message id when the listing starts.
+        """
+        self.generation += 1
+        self._query, self._params, self._cursor_of = query, params, cursor_of
+        self._cursor = after
+        return self.next_page()
+
+    def next_page(self):
+        """Return a future for the next page, or None if the listing is exhausted or a page is in flight."""
+        if self._cursor is None:
+            return None
+        after, self._cursor = self._cursor, None
+        return self._executor.submit(self._fetch, self.generation, self._query, self._params, after, self._cursor_of)
+
+    def accept(self, result):
+        """Apply a finished page on the UI thread. Returns its rows, or None if the listing was replaced."""
+        generation, params, rows, next_cursor = result
+        if generation != self.generation:
+            return None
+        self._params = params
+        self._cursor = next_cursor
+        return rows
+
+    def _fetch(self, generation, query, params, after, cursor_of):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path)
+        if params is None:
+            row = self._conn.execute(LAST_SESSION_QUERY).fetchone()
+            if row is None:
+                return generation, params, [], None
+            params = (row[0],)
+        elif any(param is HISTORY_SNAPSHOT for param in params):
+            latest = self._conn.execute(LATEST_ID_QUERY).fetchone()[0]
+            params = tuple(latest if param is HISTORY_SNAPSHOT else param for param in params)
+        rows, next_cursor = fetch_history_page(self._conn, query, params, after, self.page_size, cursor_of)
+        return generation, params, rows, next_cursor
+
+    def _close_connection(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def close(self):
+        self._executor.submit(self._close_connection)
+        self._executor.shutdown(wait=True)
+
+
+CSV_EXPORT_COLUMNS = ["timestamp", "category", "username", "message", "translated", "lang", "session_id"]
+
+
+def build_export_query(start=None, end=None, category=None, session_id=None):
+    """Return (select_sql, count_sql, params) for a filtered export; `end` is exclusive."""
+    clauses, params = [], []
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        clauses.append("timestamp < ?")
+        params.append(end)
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+    if session_id:
+        clauses.append("session_id = ?")
+        params.append(session_id)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    select_sql = f"SELECT {', '.join(CSV_EXPORT_COLUMNS)} FROM messages{where} ORDER BY timestamp, id"
+    count_sql = f"SELECT COUNT(*) FROM messages{where}"
+    return select_sql, count_sql, tuple(params)
+
+
+class HistoryCsvExport:
+    """
+    Streams a filtered slice of the messages table to a CSV file on a background thread.
+    Rows are read with fetchmany() in chunks, so memory stays flat regardless of table size.
+    The file is written next to the target and renamed into place only when complete;
+    cancel() stops after the current chunk and removes the partial file.
+    """
+
+    def __init__(self, db_path, export_path, start=None, end=None, category=None, session_id=None, chunk_size=1000):
+        self.db_path = db_path
+        self.export_path = export_path
+        self.filters = {"start": start, "end": end, "category": category, "session_id": session_id}
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self.total_rows = None
+        self.error = None
+        self.cancelled = False
+        self._cancel = threading.Event()
+        self.done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="csv-export", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        tmp_path = self.export_path + ".part"
+        select_sql, count_sql, params = build_export_query(**self.filters)
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            self.total_rows = conn.execute(count_sql, params).fetchone()[0]
+            cursor = conn.execute(select_sql, params)
+            with open(tmp_path, "w", newline="", encoding="utf-8") as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(CSV_EXPORT_COLUMNS)
+                while not self._cancel.is_set():
+                    rows = cursor.fetchmany(self.chunk_size)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    self.rows_written += len(rows)
+            if self._cancel.is_set():
+                self.cancelled = True
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, self.export_path)
+        except Exception as e:
+            self.error = e
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            if conn is not None:
+                conn.close()
+            self.done.set()
+
+
+class ChatHistoryWriter:
+    """
+    Background writer for the messages table. Owns one long-lived SQLite connection in WAL
+    mode and group-commits queued rows every `batch_size` rows or `flush_interval` seconds,
+    so the watcher never waits on an fsync. A failed batch is retried row by row, so one bad
+    row does not cost the others; a connection failure is raised from the constructor.
+    """
+
+    INSERT_SQL = """
+        INSERT INTO messages (timestamp, category, username, message, translated, lang, session_id, src_lang)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    def __init__(self, db_path, batch_size=100, flush_interval=0.5, logger=None, observer=None):
+        self.db_path = db_path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.commits = 0
+        self.observer = observer  # observer("db_commit", seconds) per batch
+        self._logger = logger or logging.getLogger("ScTranslationApp")
+        self._queue = queue.Queue()
+        self._connected = threading.Event()
+        self._connect_error = None
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        self._connected.wait()
+        if self._connect_error is not None:
+            raise self._connect_error
+
+    def insert(self, row):
+        """Queue one (timestamp, category, username, message, translated, lang, session_id, src_lang) row."""
+        self._queue.put(row)
+
+    def flush(self, timeout=5.0):
+        """Block until every row queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Commit pending rows and close the connection."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: no fsync per commit, still crash-safe
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _commit(self, conn, batch):
+        if not batch:
+            return
+        try:
+            start = time.perf_counter()
+            conn.executemany(self.INSERT_SQL, batch)
+            conn.commit()
+            self.rows_written += len(batch)
+            self.commits += 1
+            if self.observer is not None:
+                self.observer("db_commit", time.perf_counter() - start)
+        except Exception as e:
+            conn.rollback()
+            dropped = self._commit_rows(conn, batch)
+            self._logger.error(f"DB insert error ({dropped} of {len(batch)} rows dropped): {e}")
+
+    def _commit_rows(self, conn, batch):
+        """Insert a failed batch one row at a time; returns the number of rows that still failed."""
+        dropped = 0
+        for row in batch:
+            try:
+                conn.execute(self.INSERT_SQL, row)
+                self.rows_written += 1
+            except Exception:
+                dropped += 1
+        try:
+            conn.commit()
+            self.commits += 1
+        except Exception:
+            conn.rollback()
+            self.rows_written -= len(batch) - dropped
+            dropped = len(batch)
+        return dropped
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self._connect_error = e
+            return
+        finally:
+            self._connected.set()
+        batch = []
+        waiters = []
+        deadline = None
+        running = True
+        while running:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # flush window elapsed
+
+            if item is None:
+                running = False
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not False:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if (not running or waiters or len(batch) >= self.batch_size
+                    or (deadline is not None and time.monotonic() >= deadline)):
+                self._commit(conn, batch)
+                batch = []
+                deadline = None
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+        conn.close()
+
+
+# ---------------- Live chat buffer ----------------
+
+CHAT_TRIM_NOTICE = "> Older messages were removed from this view; they are kept in the History tab.\n"
+CHAT_REPEAT_MARKS = 500  # first copies of reposted messages whose "×N" counter can still be updated
+# Chat tab queue entry for a collapsible message: the first copy is shown in full, later exact
+# copies only update its "×N" counter; an edited copy is shown in full and becomes the one
+# counted on (entry_id: RepeatDetector entry, lines: (text, tag) pairs)
+ChatRepeat = namedtuple("ChatRepeat", "entry_id header tag count lines exact", defaults=(True,))
+
+
+def chat_lines_to_trim(line_count, max_lines, batch):
+    """
+    Number of lines to delete from the top of the Chat tab. Once max_lines is exceeded the
+    view is cut back to max_lines - batch, so trimming happens once per `batch` new lines.
+    """
+    if not max_lines or line_count <= max_lines:
+        return 0
+    keep = max(max_lines - batch, 0)
+    return line_count - keep
+
+
+def trim_chat_buffer(text_widget, max_lines, batch):
+    """
+    Delete whole message blocks from the top of a (CTk)Text widget that holds more than
+    max_lines lines. The cut is extended to the next blank line so no block is split.
+    Returns the number of lines removed. The widget must be in state "normal".
+    """
+    if not max_lines:
+        return 0
+    line_count = int(text_widget.index("end-1c").split(".")[0])
+    cut = chat_lines_to_trim(line_count, max_lines, batch)
+    if not cut:
+        return 0
+    blank = text_widget.search(r"^$", f"{cut}.0", stopindex="end-1c", regexp=True)
+    if blank:
+        cut = int(blank.split(".")[0])
+    text_widget.delete("1.0", f"{cut + 1}.0")
+    text_widget.insert("1.0", CHAT_TRIM_NOTICE, "trim_notice")
+    return cut
+
+
+# ---------------- Remote JSON cache ----------------
+
+class RemoteJsonCache:
+    """
+    On-disk cache for the remote welcome / dictionary JSON documents. Each URL is stored as
+    one file with its payload, ETag, Last-Modified and fetch time. Refreshes are conditional
+    (If-None-Match / If-Modified-Since, so an unchanged document costs a 304) and accept gzip.
+    A copy younger than `max_age` is served without a request; an older one is served at once
+    while a background thread revalidates it; on network errors the last copy is kept.
+    """
+
+    def __init__(self, cache_dir, logger=None, user_agent=f"SC-Translator/{APP_VERSION}"):
+        self.cache_dir = cache_dir
+        self.logger = logger
+        self.user_agent = user_agent
+        self.requests = 0
+        self.not_modified = 0
+        self.errors = 0
+        self._entries = {}  # url -> entry dict, loaded lazily from disk
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _load(self, url):
+        with self._lock:
+            if url in self._entries:
+                return self._entries[url]
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        with self._lock:
+            return self._entries.setdefault(url, entry)
+
+    def _store(self, url, entry):
+        with self._lock:
+            self._entries[url] = entry
+        path = self._path(url)
+        try:
+            with open(path + ".part", "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(path + ".part", path)
+        except OSError as e:
+            if self.logger:
+                self.logger.warning(f"Remote cache write failed for {url}: {e}")
+
+    def get(self, url, max_age=3600, timeout=3.0, background=True):
+        """
+        Return the JSON document for url, or None if it was never fetched successfully.
+        max_age=0 with background=False forces a (conditional) request now.
+        """
+        if not url:
+            return None
+        entry = self._load(url)
+        if entry is None:
+            return self.refresh(url, timeout)
+        if time.time() - entry["fetched_at"] < max_age:
+            return entry["data"]
+        if not background:
+            return self.refresh(url, timeout)
+        with self._lock:
+            start = url not in self._refreshing
+            self._refreshing.add(url)
+        if start:
+            threading.Thread(target=self._background_refresh, args=(url, timeout),
+                             name="remote-refresh", daemon=True).start()
+        return entry["data"]
+
+    def _background_refresh(self, url, timeout):
+        try:
+            self.refresh(url, timeout)
+        finally:
+            with self._lock:
+                self._refreshing.discard(url)
+
+    def refresh(self, url, timeout=3.0):
+        """Revalidate url now; returns the new or unchanged document, or the cached one on error."""
+        entry = self._load(url)
+        headers = {"User-Agent": self.user_agent, "Accept-Encoding": "gzip"}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        self.requests += 1
+        try:
+            with urlopen(Request(url, headers=headers), timeout=timeout) as resp:
+                if resp.status != 200:
+                    raise ValueError(f"HTTP {resp.status}")
+                body = resp.read()
+                if resp.headers.get("Content-Encoding", "").lower() == "gzip":
+                    body = gzip.decompress(body)
+                data = json.loads(body.decode("utf-8", errors="replace"))
+                self._store(url, {
+                    "url": url,
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                    "fetched_at": time.time(),
+                    "data": data,
+                })
+                return data
+        except HTTPError as e:
+            if e.code == 304 and entry is not None:
+                self.not_modified += 1
+                self._store(url, dict(entry, fetched_at=time.time()))
+                return entry["data"]
+            error = e
+        except (URLError, TimeoutError, OSError, ValueError) as e:
+            error = e
+        self.errors += 1
+        if self.logger:
+            state = "serving cached copy" if entry is not None else "no cached copy"
+            self.logger.warning(f"Remote fetch failed for {url} ({state}): {error}")
+        return entry["data"] if entry is not None else None
+
+    def stats(self):
+        return {"requests": self.requests, "not_modified": self.not_modified, "errors": self.errors}
+
+
+# ---------------- Chat pipeline (GUI-free core) ----------------
+
+class AppStorage:
+    """
+    Settings, dictionary, database paths and logger under ~/AppData/Local/ScTranslationApp.
+    Shared by the window and the headless runner; nothing here touches Tk.
+    """
+
+    # ---------------- Paths / Files ----------------
+    def _get_settings_path(self):
+        user_home = os.path.expanduser("~")
+        app_folder = os.path.join(user_home, "AppData", "Local", "ScTranslationApp")
+        os.makedirs(app_folder, exist_ok=True)
+        return os.path.join(app_folder, "settings.json")
+
+    def _get_dictionary_path(self):
+        user_home = os.path.expanduser("~")
+        app_folder = os.path.join(user_home, "AppData", "Local", "ScTranslationApp")
+        return os.path.join(app_folder, "game_dictionary.json")
+
+    def _get_default_logs_path(self):
+        user_home = os.path.expanduser("~")
+        return os.path.join(user_home, "Documents", "My Games", "StarConflict", "logs")
+
+    def _get_db_path(self):
+        user_home = os.path.expanduser("~")
+        db_dir = os.path.join(user_home, "AppData", "Local", "ScTranslationApp", "database")
+        os.makedirs(db_dir, exist_ok=True)
+        return os.path.join(db_dir, "chat_history.db")
+
+    def _get_translation_cache_path(self):
+        return os.path.join(os.path.dirname(self._get_db_path()), "translation_cache.db")
+
+    def _get_remote_cache_dir(self):
+        return os.path.join(os.path.dirname(self._get_db_path()), "remote_cache")
+
+    def _fetch_remote_dictionary(self):
+        """Download remote dictionary JSON if enabled."""
+        if not self.settings.get("allow_remote_dictionary", False):
+            return {}
+
+        url = self.settings.get("remote_dictionary_url", "")
+        data = self._fetch_remote_json(url)
+        if not data:
+            self.logger.warning("Remote dictionary fetch failed or empty.")
+            return {}
+        if not isinstance(data, dict):
+            self.logger.warning("Remote dictionary is not a dict.")
+            return {}
+        return data
+
+    def _merge_dictionaries(self, base: dict, remote: dict):
+        """Merge remote dictionary into base without overwriting (case-insensitive)."""
+        merged = dict(base)  # copy base
+        base_keys_lower = {k.lower() for k in base.keys()}
+
+        for key, val in remote.items():
+            if key.lower() not in base_keys_lower:
+                merged[key] = val
+        return merged
+    
+    def _load_settings(self):
+        """Load settings.json or create with defaults if not found."""
+        if not os.path.exists(self.settings_path):
+            # First run → set logs path dynamically
+            DEFAULT_SETTINGS["game_logs_path"] = self._get_default_logs_path()
+            with open(self.settings_path, "w", encoding="utf-8") as f:
+                json.dump(DEFAULT_SETTINGS, f, indent=4)
+            return DEFAULT_SETTINGS.copy()
+        else:
+            try:
+                with open(self.settings_path, "r", encoding="utf-8") as f:
+                    settings = json.load(f)
+
+                # Ensure backwards compatibility
+                for key, value in DEFAULT_SETTINGS.items():
+                    if key not in settings:
+                        settings[key] = value
+
+                # Special handling for manual_languages - ensure it exists
+                if "manual_languages" not in settings:
+                    settings["manual_languages"] = DEFAULT_SETTINGS["manual_languages"]
+
+                # Ensure last_notified_version exists for backward compatibility
+                if "last_notified_version" not in settings:
+                    settings["last_notified_version"] = APP_VERSION
+
+                # Ensure remote fetch settings exist for performance optimization; fetch times
+                # are recorded by the remote cache, so the old last_remote_fetch is dropped
+                settings.pop("last_remote_fetch", None)
+                if "remote_fetch_interval" not in settings:
+                    settings["remote_fetch_interval"] = 3600
+
+                # Handle migration from old welcome_message_override to new structure
+                if "welcome_message_override" in settings:
+                    # Migrate old content to remote_welcome_message if it's not already set
+                    old_content = settings.get("welcome_message_override", "").strip()
+                    if old_content and not settings.get("remote_welcome_message"):
+                        settings["remote_welcome_message"] = old_content
+                    # Remove the old field to clean up
+                    del settings["welcome_message_override"]
+
+                return settings
+            except Exception as e:
+                print(f"[ERROR] Failed to load settings, using defaults: {e}")
+                return DEFAULT_SETTINGS.copy()
+
+    def _save_settings(self):
+        """Save current settings to file, ensuring new defaults are included."""
+        try:
+            for key, value in DEFAULT_SETTINGS.items():
+                if key not in self.settings:
+                    self.settings[key] = value
+
+            with open(self.settings_path, "w", encoding="utf-8") as f:
+                json.dump(self.settings, f, indent=4)
+        except Exception as e:
+            print(f"[ERROR] Failed to save settings: {e}")
+
+    # ---- fetch/check helper ----
+    def _fetch_remote_json(self, url: str, timeout: float = 3.0, max_age=None, background=True):
+        """
+        Return the JSON document at URL through the remote cache, or None if it was never fetched.
+        Copies younger than `remote_fetch_interval` are served without a request; older ones are
+        served at once and revalidated in the background unless background=False.
+        """
+        if max_age is None:
+            max_age = self.settings.get("remote_fetch_interval", 3600)
+        return self.remote_cache.get(url, max_age=max_age, timeout=timeout, background=background)
+
+    def _load_dictionary(self, include_remote=True):
+        # Load local dictionary first
+        if not os.path.exists(self.dictionary_path):
+            default_dict = DEFAULT_DICTIONARY.copy()
+            with open(self.dictionary_path, "w", encoding="utf-8") as f:
+                json.dump(default_dict, f, indent=4)
+            base_dict = default_dict
+        else:
+            with open(self.dictionary_path, "r", encoding="utf-8") as f:
+                base_dict = json.load(f)
+
+        if not include_remote:
+            return base_dict
+
+        # Optionally merge remote
+        remote_dict = self._fetch_remote_dictionary()
+        merged = self._merge_dictionaries(base_dict, remote_dict)
+        return merged
+
+    # ---------------- Logger ----------------
+    def _init_logger(self):
+        user_home = os.path.expanduser("~")
+        log_folder = os.path.join(user_home, "AppData", "Local", "ScTranslationApp", "logs")
+        os.makedirs(log_folder, exist_ok=True)
+        log_path = os.path.join(log_folder, "app.log")
+
+        logger = logging.getLogger("ScTranslationApp")
+        logger.setLevel(logging.INFO)
+
+        handler = RotatingFileHandler(log_path, maxBytes=1_000_000, backupCount=5, encoding="utf-8")
+        formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+        handler.setFormatter(formatter)
+
+        if not logger.handlers:
+            logger.addHandler(handler)
+        return logger, log_path
+
+
+def format_parsed_line(category, username, message_text):
+    # Current app timestamp (not game timestamp)
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    # Build separate lines
+    header_line = f"[{timestamp}] [{category}] [{username}]:"
+    message_line = message_text
+
+    return timestamp, username, message_text, header_line, message_line
+
+
+# Stages reported to ChatPipeline's observer, in pipeline order:
+#   read        one read of newly appended chat.log lines (per batch, waiting excluded)
+#   parse       classify + split one chat.log line
+#   queue       waiting for a free translation worker
+#   dictionary  game dictionary substitution
+#   langid      local language guess (skips the translator for target-language lines)
+#   translate   cached translation (cache lookup + service call on a miss)
+#   deliver     waiting for earlier lines so delivery stays in log order
+#   db_commit   one batched commit of the history writer
+#   end_to_end  line read -> message delivered
+PIPELINE_STAGES = (
+    "read", "parse", "queue", "dictionary", "langid", "translate", "deliver", "db_commit", "end_to_end",
+)
+# Recorded by the window, not the pipeline: one Chat tab insert cycle on the Tk main loop
+UI_STAGES = ("ui_insert",)
+# Counters kept by PipelineMetrics
+PIPELINE_COUNTERS = (
+    "lines", "skipped", "messages", "language_skipped", "cache_hits", "translated", "translation_errors",
+    "hint_user", "hint_channel", "hint_none", "translation_requests", "batched", "batch_fallbacks",
+    "repeats", "repeat_translations_reused", "repeats_not_stored", "throttled", "unavailable", "untranslated",
+)
+
+
+class LatencyHistogram:
+    """
+    Log-scale duration histogram: fixed buckets from 10 µs to ~3 min, each sqrt(2) wider
+    than the last. Recording is one bisect over the bucket bounds; percentiles are the
+    upper bound of the bucket they fall in (within 41%) and never exceed the maximum seen.
+    """
+
+    BOUNDS = tuple(10e-6 * 2 ** (i / 2) for i in range(48))  # seconds; last bucket is overflow
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Upper bound (seconds) of the q-th percentile, or None when empty."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                bound = self.BOUNDS[index] if index < len(self.BOUNDS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        ms = 1000.0
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * ms,
+            "p50_ms": self.percentile(50) * ms,
+            "p95_ms": self.percentile(95) * ms,
+            "p99_ms": self.percentile(99) * ms,
+            "max_ms": self.max * ms,
+        }
+
+
+class PipelineMetrics:
+    """
+    Thread-safe per-stage latency histograms and line counters for the chat pipeline.
+    Samples go into the current window; roll() closes the window (for the periodic App Log
+    summary) and folds it into the running totals that snapshot() reports.
+    """
+
+    def __init__(self, stages=PIPELINE_STAGES + UI_STAGES):
+        self.stages = stages
+        self.started = self._window_started = time.monotonic()
+        self._lock = threading.Lock()
+        self._window = {}
+        self._window_counters = dict.fromkeys(PIPELINE_COUNTERS, 0)
+        self._totals = {}
+        self._counters = dict.fromkeys(PIPELINE_COUNTERS, 0)
+
+    def observe(self, stage, seconds):
+        """Record one duration; usable as a ChatPipeline/ChatHistoryWriter observer."""
+        with self._lock:
+            histogram = self._window.get(stage)
+            if histogram is None:
+                histogram = self._window[stage] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._window_counters[name] = self._window_counters.get(name, 0) + n
+
+    def _report(self, histograms, counters, seconds):
+        stages = list(self.stages) + [stage for stage in histograms if stage not in self.stages]
+        return {
+            "seconds": seconds,
+            "counters": dict(counters),
+            "stages": {
+                stage: histograms[stage].summary() if stage in histograms else {"count": 0}
+                for stage in stages
+            },
+        }
+
+    def roll(self):
+        """Close the current window: fold it into the totals and return its report."""
+        now = time.monotonic()
+        with self._lock:
+            window, self._window = self._window, {}
+            counters, self._window_counters = self._window_counters, dict.fromkeys(PIPELINE_COUNTERS, 0)
+            seconds, self._window_started = now - self._window_started, now
+            for stage, histogram in window.items():
+                self._totals.setdefault(stage, LatencyHistogram()).merge(histogram)
+            for name, value in counters.items():
+                self._counters[name] = self._counters.get(name, 0) + value
+        return self._report(window, counters, seconds)
+
+    def snapshot(self):
+        """Report since start (totals plus the open window), without closing the window."""
+        with self._lock:
+            histograms = {}
+            for source in (self._totals, self._window):
+                for stage, histogram in source.items():
+                    histograms.setdefault(stage, LatencyHistogram()).merge(histogram)
+            counters = dict(self._counters)
+            for name, value in self._window_counters.items():
+                counters[name] = counters.get(name, 0) + value
+        return self._report(histograms, counters, time.monotonic() - self.started)
+
+
+def format_metrics_report(report, label):
+    """One App Log line: counters, then p50/p95/max per stage that saw samples."""
+    c = report["counters"]
+    parts = [
+        f"lines {c.get('lines', 0)} (skipped {c.get('skipped', 0)})",
+        f"messages {c.get('messages', 0)}",
+        f"already in target language {c.get('language_skipped', 0)} "
+        f"({c.get('language_skipped', 0) / max(c.get('messages', 0), 1):.0%})",
+        f"translated {c.get('translated', 0)}",
+        f"cache hits {c.get('cache_hits', 0)}",
+        f"errors {c.get('translation_errors', 0)}",
+    ]
+    if c.get("batched", 0):
+        parts.append(
+            f"requests {c.get('translation_requests', 0)} (batched messages {c.get('batched', 0)}, "
+            f"split fallbacks {c.get('batch_fallbacks', 0)})"
+        )
+    if c.get("throttled", 0) or c.get("untranslated", 0):
+        parts.append(f"throttled {c.get('throttled', 0)}, shown untranslated {c.get('untranslated', 0)}")
+    if c.get("repeats", 0):
+        parts.append(
+            f"repeats {c.get('repeats', 0)} (translation reused {c.get('repeat_translations_reused', 0)}, "
+            f"not stored {c.get('repeats_not_stored', 0)})"
+        )
+    hinted = c.get("hint_user", 0) + c.get("hint_channel", 0)
+    if hinted or c.get("hint_none", 0):
+        parts.append(
+            f"source hints {hinted / (hinted + c.get('hint_none', 0)):.0%} "
+            f"(user {c.get('hint_user', 0)}, channel {c.get('hint_channel', 0)})"
+        )
+    for stage, row in report["stages"].items():
+        if row["count"]:
+            parts.append(f"{stage} p50 {row['p50_ms']:.1f}/p95 {row['p95_ms']:.1f}/max {row['max_ms']:.1f} ms")
+    return f"Pipeline stats ({label}, {report['seconds']:.0f} s): " + ", ".join(parts)
+
+
+class ChatPipeline:
+    """
+    The chat core without any GUI: follows the newest chat.log, classifies each line,
+    applies the game dictionary, translates (cache + worker pool) and, in log order,
+    queues the message for chat_history.db and hands it to `on_message`.
+
+    on_message runs on the pool's delivery thread and must not block for long.
+    Every stage in PIPELINE_STAGES is timed into `metrics` (summarized in the App Log every
+    `metrics_log_interval` seconds); `observer(stage, seconds)`, if given, is called from
+    the pipeline threads with the same durations.
+    """
+
+    def __init__(self, settings, db_path, cache_path, dictionary, logger, on_message=None, translation_service=None,
+                 observer=None):
+        self.settings = settings
+        self.logger = logger
+        self.on_message = on_message
+        self.observer = observer
+        self.metrics = PipelineMetrics()
+        self.metrics_log_interval = settings.get("metrics_log_interval", 300)
+        self._metrics_logged_at = time.monotonic()
+        self.db_path = db_path
+        self._init_database()
+        self.db_writer = ChatHistoryWriter(
+            db_path,
+            batch_size=settings.get("db_batch_size", 100),
+            flush_interval=settings.get("db_flush_interval", 0.5),
+            logger=logger,
+            observer=self._observe,
+        )
+
+        # --- Translation service (one event loop + HTTP client) and cache ---
+        self.translation_service = translation_service or TranslationService(
+            translator_factory=translator_factory_from_settings(settings),
+            max_concurrency=settings.get("translation_workers", 4) + 1,  # +1 for manual translations
+        )
+        self.translation_cache = TranslationCache(
+            cache_path,
+            memory_entries=settings.get("translation_cache_memory_entries", 2000),
+            max_entries=settings.get("translation_cache_max_entries", 50000),
+            ttl=settings.get("translation_cache_ttl", 604800),
+        )
+        # --- Rate limiter + circuit breaker in front of every backend call ---
+        self.backend_guard = TranslationBackendGuard.from_settings(settings, count=self.metrics.count, logger=logger)
+        # --- Micro-batching of concurrent chat translations (one request per burst) ---
+        workers = settings.get("translation_workers", 4)
+        # Lines sent on their own share the translation_workers backend slots, whatever the pool size
+        self._direct_slots = threading.BoundedSemaphore(workers)
+        self.translation_batcher = None
+        if settings.get("translation_batching", True):
+            self.translation_batcher = TranslationBatcher(
+                self._backend_translate,
+                window=settings.get("translation_batch_window_ms", 100) / 1000.0,
+                max_messages=settings.get("translation_batch_max_messages", 20),
+                max_chars=settings.get("translation_batch_max_chars", 4000),
+                max_in_flight=workers,
+                count=self.metrics.count,
+            )
+            # Workers mostly wait on their batch: a fixed number of extra threads lets batches form
+            workers += BATCH_WAIT_WORKERS
+        # --- Translation worker pool (results delivered in chat.log order) ---
+        self.translation_pool = OrderedWorkerPool(
+            self._deliver_chat_message,
+            workers=workers,
+            logger=logger,
+        )
+
+        self.game_dictionary = dictionary
+        self.line_classifier = ChatLineClassifier()
+        self.language_identifier = LanguageIdentifier()
+        self.skip_target_language = settings.get("skip_target_language", True)
+        self.language_skip_threshold = settings.get("language_skip_threshold", 0.5)
+        self.source_language_hints = settings.get("source_language_hints", True)
+        self.language_hints = SourceLanguageHints(
+            db_path, identifier=self.language_identifier, min_confidence=self.language_skip_threshold
+        )
+        self.repeat_detector = None
+        if settings.get("collapse_repeats", True):
+            self.repeat_detector = RepeatDetector(
+                window=settings.get("repeat_window_seconds", 600),
+                similarity=settings.get("repeat_similarity", 0.8),
+            )
+        self.store_exact_repeats = settings.get("store_exact_repeats", True)
+        self.parent_folder = Path(settings["game_logs_path"])
+        self.target_lang = settings["languages"][settings["last_language"]]
+        self.stop_flag = False
+        self.current_logfile = None
+        self.session_index = None
+        self.session_id = None
+        self._thread = None
+
+    # ---------------- Database ----------------
+    def _init_database(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            previous = get_schema_version(conn)
+            version = migrate_database(conn)
+            if version != previous:
+                self.logger.info(f"Chat history schema migrated: v{previous} -> v{version}")
+            self.fulltext_search = has_fulltext_index(conn)
+            if not self.fulltext_search:
+                self.logger.warning("SQLite has no FTS5 support: History search uses slower substring matching")
+        finally:
+            conn.close()
+
+    def _db_insert_message(self, ts, category, username, message, translated, lang, session_id, src_lang=None):
+        # Queued; committed in batches by the background writer
+        self.db_writer.insert((ts, category, username, message, translated, lang, session_id, src_lang))
+
+    # ---------------- Metrics ----------------
+    def _observe(self, stage, seconds):
+        self.metrics.observe(stage, seconds)
+        if self.observer is not None:
+            self.observer(stage, seconds)
+
+    def log_metrics(self, since_start=False):
+        """Write pipeline stats to the App Log: the interval since the last summary, or all totals."""
+        if since_start:
+            report = self.metrics.snapshot()
+        else:
+            self._metrics_logged_at = time.monotonic()
+            report = self.metrics.roll()
+        self.logger.info(format_metrics_report(report, "since start" if since_start else "last interval"))
+        return report
+
+    def _maybe_log_metrics(self):
+        interval = self.metrics_log_interval
+        if interval and time.monotonic() - self._metrics_logged_at >= interval:
+            self.log_metrics()
+
+    # ---------------- Translation ----------------
+    def _backend_translate(self, text, dest, src="auto"):
+        return self.backend_guard.call(lambda: self.translation_service.translate(text, dest, src=src).text)
+
+    def translate(self, text, dest, src="auto", batch_key=None):
+        """
+        Translate through the translation cache. Raises on translation failure, and
+        TranslationUnavailable while the backend is paused or rate limited (cache hits still work).
+        With a `batch_key` (chat lines) the request may share a round trip with other lines;
+        every request that does not is counted in "translation_requests" here. Results are
+        cached per source language, so hinted repeats hit the cache while a wrong hint cannot
+        answer auto-detected lookups.
+        """
+        cached = self.translation_cache.get(text, dest, src)
+        if cached is not None:
+            self.metrics.count("cache_hits")
+            return cached
+        if batch_key is not None and self.translation_batcher is not None:
+            translated = self.translation_batcher.translate(text, dest, src=src, key=batch_key)
+        else:
+            self.metrics.count("translation_requests")
+            translated = self._backend_translate(text, dest, src)
+        self.translation_cache.put(text, dest, translated, src)
+        return translated
+
+    # ---------------- Dictionary substitution ----------------
+    @property
+    def game_dictionary(self):
+        return self._game_dictionary
+
+    @game_dictionary.setter
+    def game_dictionary(self, dictionary):
+        # Recompile the matcher only when the dictionary is (re)loaded
+        self._game_dictionary = dictionary
+        self._dictionary_matcher = GameDictionaryMatcher(dictionary)
+
+    def apply_game_dictionary(self, text):
+        # Replace ignoring case, longest key first, in a single pass
+        return self._dictionary_matcher.apply(text)
+
+    # ---------------- Chat log watching ----------------
+    def start(self):
+        self._thread = threading.Thread(target=self.watch_latest_chat, name="chat-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_latest_logfile(self):
+        # The index is rebuilt only when the logs path setting changes
+        if self.session_index is None or self.session_index.logs_dir != self.parent_folder:
+            if self.session_index is not None:
+                self.session_index.close()
+            self.session_index = SessionFolderIndex(self.parent_folder)
+        return self.session_index.latest_logfile()
+
+    def watch_latest_chat(self):
+        follower = None
+        while not self.stop_flag:
+            logfile = self.get_latest_logfile()
+            if logfile and logfile != self.current_logfile:
+                self.current_logfile = logfile
+                if follower:
+                    follower.close()
+                    follower = None
+                try:
+                    follower = FileFollower(self.current_logfile)
+                    self.session_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.path.basename(os.path.dirname(self.current_logfile))}"
+                    mode = "inotify" if follower.uses_inotify else "polling"
+                    self.logger.info(f"Switched to logfile {self.current_logfile} ({mode})")
+                except Exception as e:
+                    self.logger.error(f"Error opening logfile {logfile}: {e}")
+                    self.current_logfile = None  # retry on the next pass
+                    time.sleep(1)
+                    continue
+
+            if follower:
+                # Wakes as soon as lines are written; the timeout only bounds how often
+                # we look for a newer session folder and check the stop flag
+                started = time.perf_counter()
+                lines = follower.read_available()
+                if not lines and follower.wait(timeout=1.0):
+                    started = time.perf_counter()
+                    lines = follower.read_available()
+                if lines:
+                    self._observe("read", time.perf_counter() - started)
+                for line in lines:
+                    self.process_chat_line(line)
+            else:
+                time.sleep(2)
+            self._maybe_log_metrics()
+
+        if follower:
+            follower.close()
+        if self.session_index is not None:
+            self.session_index.close()
+
+    def process_chat_line(self, line):
+        received = time.perf_counter()
+        self.metrics.count("lines")
+        # One scan gives category, skip decision, username and message
+        category, skip, username, message_text = self.line_classifier.classify(line)
+        if not category or skip:  # not a chat line we keep / filtered system line
+            self.metrics.count("skipped")
+            return
+
+        ts, username, message_text, header_line, message_line = format_parsed_line(
+            category, username, message_text
+        )
+        chat_message = {
+            "timestamp": ts,
+            "category": category,
+            "username": username,
+            "message": message_text,
+            "header_line": header_line,
+            "message_line": message_line,
+            "lang": self.target_lang,
+            "session_id": self.session_id,
+            "received": received,  # perf_counter() when the line was read
+        }
+        if self.repeat_detector is not None and category in REPEAT_CATEGORIES:
+            # Checked here, in log order, so counts and "first copy" are those of the log
+            entry, exact = self.repeat_detector.check(username, message_text)
+            chat_message.update(repeat_id=entry.id, repeat_count=entry.count, repeat_exact=exact)
+            chat_message["repeat_entry"] = entry
+            chat_message["repeat_text"] = entry.normalized  # this copy's wording, before later edits
+        submitted = time.perf_counter()
+        self._observe("parse", submitted - received)
+        # Translation runs on the worker pool; display/DB happen in log order
+        self.translation_pool.submit(self._translate_chat_message, chat_message, submitted)
+
+    def _translate_chat_message(self, chat_message, submitted=None):
+        """Worker-pool job: dictionary substitution, language check and translation of one parsed chat line."""
+        started = time.perf_counter()
+        entry = chat_message.get("repeat_entry")
+        wording = chat_message.get("repeat_text")
+        reused = entry.translation_for(wording, chat_message["lang"]) if entry is not None else None
+        if reused is not None:
+            # A repost of the same wording into the same language: its earlier translation stands
+            # for it. Edited reposts ("900000" -> "500000 credits") and reposts after a target
+            # language switch are translated again (often a cache hit)
+            chat_message["translated"] = reused
+            chat_message["src_lang"] = entry.src_lang
+            chat_message["translated_at"] = time.perf_counter()
+            self.metrics.count("repeat_translations_reused")
+            if submitted is not None:
+                self._observe("queue", started - submitted)
+            return chat_message
+        processed_message = self.apply_game_dictionary(chat_message["message"])
+        substituted = identified = time.perf_counter()
+        skip = False
+        identify = self.skip_target_language or self.source_language_hints
+        confident = None
+        if identify:
+            lang, confidence = self.language_identifier.identify(processed_message)
+            chat_message["detected_lang"] = lang
+            identified = time.perf_counter()
+            if confidence >= self.language_skip_threshold:
+                confident = lang
+            chat_message["src_lang"] = confident or ""
+            skip = self.skip_target_language and same_language(confident, chat_message["lang"])
+        if skip:
+            # Already in the target language: no round trip to get the same text back
+            chat_message["translated"] = processed_message
+            self.metrics.count("language_skipped")
+            if entry is not None:
+                entry.remember(processed_message, wording, chat_message["lang"], chat_message["src_lang"])
+        else:
+            src = "auto"
+            if self.source_language_hints:
+                src, source = self.language_hints.hint(
+                    chat_message["category"], chat_message["username"], chat_message["lang"], confident
+                )
+                self.metrics.count(f"hint_{source or 'none'}")
+            chat_message["src"] = src
+            # Unhinted lines are batched by confident local guess, so one auto-detected request
+            # carries one language; without a confident guess the line goes out on its own
+            batch_key = "" if src != "auto" else confident
             try:
-                return loop.run_until_complete(coro)
-            finally:
-                loop.close()
+                if batch_key is None:
+                    with self._direct_slots:
+                        chat_message["translated"] = self.translate(processed_message, chat_message["lang"], src=src)
+                else:
+                    chat_message["translated"] = self.translate(
+                        processed_message, chat_message["lang"], src=src, batch_key=batch_key,
+                    )
+                self.metrics.count("translated")
+                if entry is not None:
+                    entry.remember(
+                        chat_message["translated"], wording, chat_message["lang"], chat_message.get("src_lang")
+                    )
+            except TranslationUnavailable:
+                # Backend paused: show the original now instead of an error, nothing is cached
+                chat_message["translated"] = processed_message
+                chat_message["untranslated"] = True
+                self.metrics.count("untranslated")
+            except Exception as e:
+                chat_message["translated"] = f"[Translation error: {e}]"
+                self.logger.error(f"Translation error: {e}")
+                self.metrics.count("translation_errors")
+        chat_message["translated_at"] = finished = time.perf_counter()
+        if submitted is not None:
+            self._observe("queue", started - submitted)
+        self._observe("dictionary", substituted - started)
+        if self.source_language_hints and confident:
+            # After hint(): the profile used for this line was built from earlier lines only
+            self.language_hints.learn(chat_message["username"], confident)
+        if identify:
+            self._observe("langid", identified - substituted)
+        if not skip:
+            self._observe("translate", finished - identified)
+        return chat_message
+
+    def _deliver_chat_message(self, chat_message):
+        """Called in log order once a chat line has been translated."""
+        delivered = time.perf_counter()
+        repeat = chat_message.get("repeat_count", 1) > 1
+        if repeat:
+            self.metrics.count("repeats")
+        if repeat and chat_message["repeat_exact"] and not self.store_exact_repeats:
+            self.metrics.count("repeats_not_stored")
         else:
-            raise
+            # Lines shown untranslated while the backend was paused are stored with translated = NULL
+            self._db_insert_message(
+                chat_message["timestamp"], chat_message["category"], chat_message["username"],
+                chat_message["message"], None if chat_message.get("untranslated") else chat_message["translated"],
+                chat_message["lang"], chat_message["session_id"], chat_message.get("src_lang")
+            )
+        if self.on_message is not None:
+            self.on_message(chat_message)
+        self.metrics.count("messages")
+        self._observe("deliver", delivered - chat_message["translated_at"])
+        self._observe("end_to_end", time.perf_counter() - chat_message["received"])
+
+    def close(self):
+        """Stop watching, deliver what is in flight, then flush the DB and close the cache."""
+        self.stop_flag = True  # the watcher thread exits on its next pass; later lines are dropped
+        self.translation_pool.close()
+        if self.translation_batcher is not None:
+            self.translation_batcher.close()
+        self.db_writer.close()
+        self.log_metrics(since_start=True)
+        self.language_hints.close()
+        try:
+            self.logger.info(f"Translation cache stats: {self.translation_cache.stats()}")
+            self.translation_cache.close()
+        except Exception as e:
+            self.logger.error(f"Failed to close translation cache: {e}")
+        self.translation_service.close()
 
 
 def compare_versions(remote_ver: str, local_ver: str) -> int:
@@ -279,18 +3147,21 @@ class ToolTip:
         self.tip_window = None
 
 
-class TranslatedFileWatcher(ctk.CTk):
+class TranslatedFileWatcher(AppStorage, ctk.CTk):
     def __init__(self):
+        self._init_started = time.perf_counter()
         super().__init__()
 
-        # Load and save settings to guarantee consistency
-        self.settings_path = self._get_settings_path()   #
-        self.settings = self._load_settings()            # load settings (creates file on first run)
-        self._save_settings()                            # ensure settings file has all defaults
+        # --- Settings & Dictionary paths; settings are loaded once (defaults filled in) ---
+        self.settings_path = self._get_settings_path()
+        self.dictionary_path = self._get_dictionary_path()
+        self.settings = self._load_settings()            # creates the file on first run
+        self.settings.setdefault("welcome_counter", 0)
 
         # --- Logger (initialize early to avoid issues with remote fetches) ---
         self.logger, self.app_log_path = self._init_logger()
         self.logger.info("Application started")
+        self.remote_cache = RemoteJsonCache(self._get_remote_cache_dir(), logger=self.logger)
 
         # GUI configuration
         self.title("SC Chat Translator "+APP_VERSION)
@@ -308,28 +3179,26 @@ class TranslatedFileWatcher(ctk.CTk):
         )
         self.iconbitmap(resource_path("assets/logo.ico"))
 
-        # --- Settings & Dictionary load/create ---
-        self.settings_path = self._get_settings_path()
-        self.dictionary_path = self._get_dictionary_path()
-        self.settings = self._load_settings()
-        self.game_dictionary = self._load_dictionary()
-
-        self.settings.setdefault("welcome_counter", 0)
-
-        # --- DB init ---
+        # --- Chat pipeline: DB, translation service/cache, worker pool, log watcher ---
+        # Starts with the local dictionary; the remote one is merged in when it arrives
         self.db_path = self._get_db_path()
-        self._init_database()
+        self.pipeline = ChatPipeline(
+            self.settings,
+            self.db_path,
+            self._get_translation_cache_path(),
+            self._load_dictionary(include_remote=False),
+            self.logger,
+            on_message=self._show_chat_message,
+        )
+        self.metrics = self.pipeline.metrics  # the Chat tab records its insert cycles here too
+        self.history_pager = HistoryPager(self.db_path, page_size=self.settings.get("history_page_size", 500))
+        self.history_rows_shown = 0
 
-        # --- Paths / translator / state ---
-        self.parent_folder = Path(self.settings["game_logs_path"])
-        self.translator = Translator()
+        # --- GUI state ---
         self.stop_flag = False
-        self.current_logfile = None
-        self.session_id = None
 
         self.languages = self.settings["languages"]
         self.manual_languages = self.settings["manual_languages"]
-        self.target_lang = self.languages[self.settings["last_language"]]
         self.manual_translate_lang = self.settings["manual_translate_lang"]
 
         # --- Status Bar with Help Button ---
@@ -355,6 +3224,10 @@ class TranslatedFileWatcher(ctk.CTk):
         )
         self.help_button.pack(side="right", padx=(5, 0))
 
+        # Translation backend state (throttled / paused); empty while translation works normally
+        self.backend_status_label = ctk.CTkLabel(self.status_frame, text="", text_color="orange", anchor="e")
+        self.backend_status_label.pack(side="right", padx=(5, 5))
+
         # --- Main Content Container ---
         self.main_content_frame = ctk.CTkFrame(self, fg_color='transparent')
         self.main_content_frame.pack(fill="both", expand=True, padx=0, pady=10)
@@ -379,42 +3252,18 @@ class TranslatedFileWatcher(ctk.CTk):
         # --- Chat Text areas ---
         self.text_area_tab1 = ctk.CTkTextbox(self.tab1, wrap=tk.WORD)
         self.text_area_tab1.pack(expand=True, fill="both", padx=10, pady=10)
+        self.chat_queue = queue.SimpleQueue()  # (text, tag) pairs and ChatRepeat entries from any thread
+        self._repeat_marks = OrderedDict()  # Text mark -> header line of a repost's first copy
 
         # # --- User translation output area ---
         # self.text_area_tab1.tag_config("manual_header", foreground="gold")  # or any color
         # self.text_area_tab1.tag_config("version_update", foreground="gold")
 
-        # --- Welcome message shown at startup ---
-        self._insert_hardcoded_message()
-
-        # --- Check remote welcome first ---
-        self._check_remote_welcome()  # may reset welcome_counter and set override text
-
-        if self.settings["welcome_counter"] < 11:
-            # Check if we should show extended message (new version detected)
-            show_extended = self.settings.get("show_extended_welcome", False)
-
-            if show_extended:
-                # Show extended message with all fields (whats_new, changes, notes, download_url)
-                self._insert_extended_welcome_message()
-                self.logger.info(f"Showing extended welcome message (counter: {self.settings['welcome_counter'] + 1}/10)")
-            else:
-                # Show normal welcome message (only welcome_message)
-                self._insert_welcome_message()
-                self.logger.info(f"Showing normal welcome message (counter: {self.settings['welcome_counter'] + 1}/10)")
-
-            self.settings["welcome_counter"] += 1
-            self._save_settings()
-
-        self._insert_hardcoded_message(
-            msg="> Brgds.,   Hystrix.\n>\n",
-            tag="hardcoded_tip",
-        )
-        
-        self._insert_hardcoded_message(
-            msg="",
-            tag="hardcoded_tip",
-        )
+        # Welcome messages need the network (remote welcome + translation): they are built on
+        # the startup thread and inserted at the top of the Chat tab when ready
+        self.startup_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="startup")
+        self._first_paint_logged = False
+        self.bind("<Map>", self._on_first_map, add="+")
 
         # --- User translation output area ---
         self.text_area_tab1.tag_config("manual_header", foreground="gold")  # or any color
@@ -422,6 +3271,8 @@ class TranslatedFileWatcher(ctk.CTk):
         # Tags
         self.text_area_tab1.tag_config("original", foreground="lightgrey")
         self.text_area_tab1.tag_config("info", foreground="blue")
+        self.text_area_tab1.tag_config("trim_notice", foreground="grey")
+        self.text_area_tab1.tag_config("repeat_count", foreground="orange")
 
         # Category color tags
         for cat, color in COLOR_CATEGORIES.items():
@@ -440,9 +3291,8 @@ class TranslatedFileWatcher(ctk.CTk):
         bottom_frame = ctk.CTkFrame(self.tab1)
         bottom_frame.pack(fill="x", padx=10, pady=(0, 10))
 
-        # Dynamic placeholder translation
-        placeholder_hint = self._safe_translate(MANUAL_TRANSLATE_PROMPT, self.target_lang)
-        self.manual_entry = ctk.CTkEntry(bottom_frame, placeholder_text=placeholder_hint, width=500)
+        # Placeholder is translated with the welcome messages on the startup thread
+        self.manual_entry = ctk.CTkEntry(bottom_frame, placeholder_text=MANUAL_TRANSLATE_PROMPT, width=500)
         self.manual_entry.pack(side="left", padx=(5, 10), pady=5, expand=True, fill="x")
 
         # Button showing short language code
@@ -473,9 +3323,61 @@ class TranslatedFileWatcher(ctk.CTk):
         self.btn_load_last_session = ctk.CTkButton(top_hist, text="Load Last Session", command=self._load_history_last_session)
         self.btn_load_last_session.pack(side="left", padx=5, pady=10)
 
+        # Search and paging get their own row: the window is fixed at 640px
+        search_hist = ctk.CTkFrame(self.tab_history)
+        search_hist.pack(fill="x", padx=10, pady=(5, 0))
+
+        self.history_search_var = tk.StringVar(value="")
+        self.history_search_entry = ctk.CTkEntry(search_hist, textvariable=self.history_search_var, width=200)
+        self.history_search_entry.pack(side="left", padx=(10, 5), pady=10)
+        self.history_search_entry.bind("<Return>", lambda e: self._search_history())
+
+        self.btn_history_search = ctk.CTkButton(search_hist, text="Search", width=80, command=self._search_history)
+        self.btn_history_search.pack(side="left", padx=5, pady=10)
+
+        self.btn_history_more = ctk.CTkButton(
+            search_hist, text="Load More", width=100, command=self._load_more_history, state="disabled"
+        )
+        self.btn_history_more.pack(side="left", padx=5, pady=10)
+
+        self.history_status_label = ctk.CTkLabel(search_hist, text="")
+        self.history_status_label.pack(side="left", padx=10, pady=10)
+
+        # Export filters: blank fields export everything
+        export_row = ctk.CTkFrame(self.tab_history)
+        export_row.pack(fill="x", padx=10, pady=(5, 0))
+
+        ctk.CTkLabel(export_row, text="Export from:").pack(side="left", padx=(10, 5), pady=10)
+        self.export_from_var = tk.StringVar(value="")
+        ctk.CTkEntry(export_row, textvariable=self.export_from_var, width=110).pack(side="left", pady=10)
+        ctk.CTkLabel(export_row, text="to:").pack(side="left", padx=5, pady=10)
+        self.export_to_var = tk.StringVar(value="")
+        ctk.CTkEntry(export_row, textvariable=self.export_to_var, width=110).pack(side="left", pady=10)
+
+        self.export_category_var = tk.StringVar(value="All")
+        ctk.CTkOptionMenu(
+            export_row, variable=self.export_category_var, width=120,
+            values=["All"] + list(dict.fromkeys(CHAT_CATEGORIES.values())),
+        ).pack(side="left", padx=10, pady=10)
+
+        # Second row so the Export CSV / Cancel button stays inside the fixed-width window
+        export_row2 = ctk.CTkFrame(self.tab_history)
+        export_row2.pack(fill="x", padx=10, pady=(5, 0))
+
+        ctk.CTkLabel(export_row2, text="Session:").pack(side="left", padx=(10, 5), pady=10)
+        self.export_session_var = tk.StringVar(value="")
+        ctk.CTkEntry(export_row2, textvariable=self.export_session_var, width=170).pack(side="left", pady=10)
+
+        self.btn_export_csv = ctk.CTkButton(export_row2, text="Export CSV", command=self._export_history_to_csv)
+        self.btn_export_csv.pack(side="left", padx=10, pady=10)
+        self.csv_export = None
+
         self.history_text = ctk.CTkTextbox(self.tab_history, wrap=tk.WORD)
         self.history_text.pack(expand=True, fill="both", padx=10, pady=10)
         self.history_text.configure(state="disabled")
+        # Scrolling near the bottom fetches the next page
+        for sequence in ("<MouseWheel>", "<Button-5>", "<Next>", "<Control-End>"):
+            self.history_text.bind(sequence, self._on_history_scroll, add="+")
 
 
         # --- App Log tab ---
@@ -485,6 +3387,12 @@ class TranslatedFileWatcher(ctk.CTk):
         self.btn_open_log = ctk.CTkButton(top_log, text="Open Log File", command=self._open_app_log_file)
         self.btn_open_log.pack(side="left", padx=10, pady=10)
 
+        self.btn_pipeline_stats = ctk.CTkButton(
+            top_log, text="Pipeline Stats", command=lambda: self.pipeline.log_metrics(since_start=True)
+        )
+        self.btn_pipeline_stats.pack(side="left", padx=10, pady=10)
+        ToolTip(self.btn_pipeline_stats, "Write per-stage latency (read, parse, translate, DB, UI) and line counters to this log")
+
         self.app_log_text = ctk.CTkTextbox(self.tab_log, wrap=tk.WORD)
         self.app_log_text.pack(expand=True, fill="both", padx=10, pady=10)
         self.app_log_text.configure(state="disabled")
@@ -693,168 +3601,194 @@ class TranslatedFileWatcher(ctk.CTk):
                     "the app will merge entries from the remote dictionary into your local one.")
 
 
+        # --- Chat view updates are applied on the Tk main loop ---
+        self.after(self.settings.get("ui_refresh_interval_ms", 50), self._drain_chat_queue)
+        self.after(1000, self._update_backend_status)
+
         # --- Threads for watchers ---
-        threading.Thread(target=self._watch_latest_chat, daemon=True).start()
+        self.pipeline.start()
         threading.Thread(target=self._tail_app_log, daemon=True).start()
 
+        # --- Remote welcome + remote dictionary, off the Tk thread ---
+        self._poll_startup(self.startup_executor.submit(self._fetch_startup_data), self._apply_startup_data)
+
         self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.logger.info(f"Window built in {(time.perf_counter() - self._init_started) * 1000:.0f} ms")
+
+    # ---------------- Startup (network work off the Tk thread) ----------------
+    def _on_first_map(self, event):
+        if self._first_paint_logged or event.widget is not self:
+            return
+        self._first_paint_logged = True
+        # after_idle runs once Tk has drawn the mapped window
+        self.after_idle(lambda: self.logger.info(
+            f"Time to first paint: {(time.perf_counter() - PROCESS_STARTED) * 1000:.0f} ms after launch "
+            f"({(time.perf_counter() - self._init_started) * 1000:.0f} ms in the window)"
+        ))
+
+    def _poll_startup(self, future, on_done):
+        """Run on_done(result) on the Tk loop once a startup-thread job finishes."""
+        if self.stop_flag:
+            return
+        if not future.done():
+            self.after(50, self._poll_startup, future, on_done)
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            self.logger.error(f"Startup task failed: {e}")
+            return
+        on_done(result)
+
+    def _fetch_startup_data(self):
+        """Startup thread: remote welcome JSON and remote dictionary (either may be None/{})."""
+        return {
+            "welcome": self._fetch_remote_json(DEFAULT_REMOTE_WELCOME_URL),
+            "dictionary": self._fetch_remote_dictionary(),
+        }
+
+    def _apply_startup_data(self, data):
+        """Tk loop: merge the remote dictionary, update welcome settings (one save), then build messages."""
+        if data["dictionary"]:
+            self.game_dictionary = self._merge_dictionaries(self.game_dictionary, data["dictionary"])
+            self.logger.info(f"Remote dictionary merged ({len(data['dictionary'])} entries)")
+
+        self._check_remote_welcome(data["welcome"])  # may reset welcome_counter and set override text
 
-    # ---------------- Welcome message ----------------    
+        show = None
+        if self.settings["welcome_counter"] < 11:
+            # Extended message with all fields when a new version was detected
+            show = "extended" if self.settings.get("show_extended_welcome", False) else "normal"
+            self.logger.info(f"Showing {show} welcome message (counter: {self.settings['welcome_counter'] + 1}/10)")
+            self.settings["welcome_counter"] += 1
+        self._save_settings()
+        self.logger.info(f"Remote startup data applied {(time.perf_counter() - PROCESS_STARTED) * 1000:.0f} ms after launch")
+
+        self._poll_startup(
+            self.startup_executor.submit(self._build_startup_messages, show, self.target_lang),
+            self._show_startup_messages,
+        )
+
+    def _build_startup_messages(self, show, lang):
+        """Startup thread: translated (text, tag) lines for the top of the Chat tab, and the entry hint."""
+        lines = self._hardcoded_message_lines(lang)
+        if show == "extended":
+            lines += self._extended_welcome_message_lines(lang)
+        elif show == "normal":
+            lines += self._welcome_message_lines(lang)
+        lines += self._hardcoded_message_lines(lang, msg="> Brgds.,   Hystrix.\n>\n", tag="hardcoded_tip")
+        lines += self._hardcoded_message_lines(lang, msg="", tag="hardcoded_tip")
+        return lines, self._safe_translate(MANUAL_TRANSLATE_PROMPT, lang)
+
+    def _show_startup_messages(self, result):
+        """Tk loop: insert the welcome block above any chat already shown."""
+        lines, placeholder_hint = result
+        self.text_area_tab1.configure(state="normal")
+        for text, tag in reversed(lines):
+            self.text_area_tab1.insert("1.0", text, tag)
+        self.text_area_tab1.configure(state="disabled")
 
-    def _insert_hardcoded_message(self, msg=None, tag="hardcoded_welcome", color=DEFAULT_WELCOME_COLOR):
-        """Insert a hardcoded or custom message with translation and styling."""
+        # Configure default or custom colors
+        self.text_area_tab1.tag_config("hardcoded_welcome", foreground=DEFAULT_WELCOME_COLOR)
+        self.text_area_tab1.tag_config("hardcoded_tip", foreground=DEFAULT_WELCOME_COLOR)
+        self.text_area_tab1.tag_config(
+            "welcome_tag", foreground=self.settings.get("welcome_message_color", DEFAULT_WELCOME_COLOR)
+        )
+        self.manual_entry.configure(placeholder_text=placeholder_hint)
+
+    # ---------------- Welcome message ----------------
+    # Builders return (text, tag) lines; they translate, so they run on the startup thread.
+
+    def _hardcoded_message_lines(self, lang, msg=None, tag="hardcoded_welcome"):
+        """A hardcoded or custom message, translated."""
         if msg is None:
             msg = f"> Welcome to StarConflict Chat Translator ver. {APP_VERSION}"
 
         try:
-            translated = self._safe_translate(msg, self.target_lang) + "\n"
+            translated = self._safe_translate(msg, lang) + "\n"
         except Exception as e:
             translated = msg
             self.logger.error(f"Hardcoded message translation failed: {e}")
+        return [(translated, tag)]
 
-        self.text_area_tab1.configure(state="normal")
-        self.text_area_tab1.insert("end", translated, tag)
-        self.text_area_tab1.configure(state="disabled")
-
-        # Configure default or custom color
-        self.text_area_tab1.tag_config(tag, foreground=color)
-
-    def _insert_welcome_message(self):
-        """Insert welcome message - shows ONLY welcome_message for 10 times, no extended content"""
-        welcome_color = self.settings.get("welcome_message_color", DEFAULT_WELCOME_COLOR)
-
+    def _welcome_message_lines(self, lang):
+        """Welcome message - shows ONLY welcome_message for 10 times, no extended content"""
         # Check if we have remote welcome message stored
         remote_welcome_msg = self.settings.get("remote_welcome_message", "").strip()
 
         if remote_welcome_msg:
             # Show ONLY the welcome_message (no extended content like whats_new, notes, download_url)
             try:
-                translated_text = self._safe_translate(remote_welcome_msg, self.target_lang)
+                translated_text = self._safe_translate(remote_welcome_msg, lang)
             except Exception as e:
                 translated_text = remote_welcome_msg  # fallback if translation fails
                 self.logger.error(f"Welcome message translation failed: {e}")
-
-            # Insert into chat area
-            self.text_area_tab1.configure(state="normal")
-            self.text_area_tab1.insert("end", "> " + translated_text + "\n", "welcome_tag")
-            self.text_area_tab1.configure(state="disabled")
-
-            # Style
-            self.text_area_tab1.tag_config("welcome_tag", foreground=welcome_color)
         else:
             # Fallback to default welcome text
             default_text = DEFAULT_WELCOME_TEXT
             try:
-                translated_text = self._safe_translate(default_text, self.target_lang)
+                translated_text = self._safe_translate(default_text, lang)
             except Exception as e:
                 translated_text = default_text  # fallback if translation fails
                 self.logger.error(f"Default welcome text translation failed: {e}")
 
-            # Insert into chat area
-            self.text_area_tab1.configure(state="normal")
-            self.text_area_tab1.insert("end", "> " + translated_text + "\n", "welcome_tag")
-            self.text_area_tab1.configure(state="disabled")
-
-            # Style
-            self.text_area_tab1.tag_config("welcome_tag", foreground=welcome_color)
-
-    def _insert_extended_welcome_message(self):
-        """Insert extended welcome message with all fields (whats_new, changes, notes, download_url)"""
-        welcome_color = self.settings.get("welcome_message_color", DEFAULT_WELCOME_COLOR)
+        return [("> " + translated_text + "\n", "welcome_tag")]
 
+    def _extended_welcome_message_lines(self, lang):
+        """Extended welcome message with all fields (whats_new, changes, notes, download_url)"""
         # Get all stored remote fields
         remote_welcome_msg = self.settings.get("remote_welcome_message", "").strip()
         remote_whats_new = self.settings.get("remote_whats_new")
         remote_download_url = self.settings.get("remote_download_url", "").strip()
         remote_notes = self.settings.get("remote_notes", "").strip()
 
-        self.text_area_tab1.configure(state="normal")
+        lines = []
 
         # Display elements in specified order: welcome_message, whats_new -> changes, download_link, notes
 
         # 1. Welcome message (main content - always present in extended mode)
         if remote_welcome_msg:
             try:
-                translated = self._safe_translate(remote_welcome_msg, self.target_lang)
-                self.text_area_tab1.insert("end", "> " + translated + "\n", "welcome_tag")
+                translated = self._safe_translate(remote_welcome_msg, lang)
+                lines.append(("> " + translated + "\n", "welcome_tag"))
             except Exception as e:
                 self.logger.error(f"Welcome message translation failed: {e}")
-                self.text_area_tab1.insert("end", "> " + remote_welcome_msg + "\n", "welcome_tag")
+                lines.append(("> " + remote_welcome_msg + "\n", "welcome_tag"))
 
         # 2. What's new -> changes (if present and not empty)
         if remote_whats_new and remote_whats_new.get('changes'):
             changes = remote_whats_new['changes']
             if changes:
-                self.text_area_tab1.insert("end", "> What's new:\n", "welcome_tag")
+                lines.append(("> What's new:\n", "welcome_tag"))
                 for change in changes:
                     if change and change.strip():  # Only process non-empty changes
                         try:
-                            translated = self._safe_translate(change.strip(), self.target_lang)
-                            self.text_area_tab1.insert("end", f"> {translated}\n", "welcome_tag")
+                            translated = self._safe_translate(change.strip(), lang)
+                            lines.append((f"> {translated}\n", "welcome_tag"))
                         except Exception as e:
                             self.logger.error(f"Change translation failed: {e}")
-                            self.text_area_tab1.insert("end", f"> {change.strip()}\n", "welcome_tag")
-                            # self.text_area_tab1.insert("end", f"> • {change.strip()}\n", "welcome_tag")
+                            lines.append((f"> {change.strip()}\n", "welcome_tag"))
 
         # 3. Download link (if present and not empty)
         if remote_download_url:
             try:
-                translated_label = self._safe_translate("Download:", self.target_lang)
-                self.text_area_tab1.insert("end", f"> {translated_label} {remote_download_url}\n", "welcome_tag")
+                translated_label = self._safe_translate("Download:", lang)
+                lines.append((f"> {translated_label} {remote_download_url}\n", "welcome_tag"))
             except Exception as e:
                 self.logger.error(f"Download label translation failed: {e}")
-                self.text_area_tab1.insert("end", f"> Download: {remote_download_url}\n", "welcome_tag")
+                lines.append((f"> Download: {remote_download_url}\n", "welcome_tag"))
 
         # 4. Notes (if present and not empty)
         if remote_notes:
             try:
-                translated_label = self._safe_translate("Notes:", self.target_lang)
-                translated_notes = self._safe_translate(remote_notes, self.target_lang)
-                self.text_area_tab1.insert("end", f"> {translated_label} {translated_notes}\n", "welcome_tag")
+                translated_label = self._safe_translate("Notes:", lang)
+                translated_notes = self._safe_translate(remote_notes, lang)
+                lines.append((f"> {translated_label} {translated_notes}\n", "welcome_tag"))
             except Exception as e:
                 self.logger.error(f"Notes translation failed: {e}")
-                self.text_area_tab1.insert("end", f"> Notes: {remote_notes}\n", "welcome_tag")
-
-        self.text_area_tab1.configure(state="disabled")
-
-        # Style with remote color
-        self.text_area_tab1.tag_config("welcome_tag", foreground=welcome_color)
-
-    def _insert_version_update_message(self, data):
-        """Insert version update notification with proper translation and styling"""
-        version = data.get('version', 'unknown')
-        msg = f"A new version {version} is available!\n"
-
-        whats_new = data.get('whats_new', {})
-        if whats_new and whats_new.get('changes'):
-            msg += "What's new:\n"
-            for change in whats_new['changes']:
-                if change and change.strip():
-                    msg += f"- {change}\n"
-
-        download_url = data.get('download_url', '').strip()
-        if download_url:
-            msg += f"Download: {download_url}\n"
-
-        notes = data.get('notes', '').strip()
-        if notes:
-            msg += f"Notes: {notes}\n"
+                lines.append((f"> Notes: {remote_notes}\n", "welcome_tag"))
 
-        # Translate the entire message
-        try:
-            translated_msg = self._safe_translate(msg, self.target_lang)
-        except Exception as e:
-            self.logger.error(f"Version update message translation failed: {e}")
-            translated_msg = msg
-
-        # redundant chat message message
-        # Insert into chat with proper styling
-        # self.text_area_tab1.configure(state="normal")
-        # self.text_area_tab1.insert("end", translated_msg, "version_update")
-        # self.text_area_tab1.configure(state="disabled")
-        # self.text_area_tab1.see("end")
-        # Ensure tag is configured
-        # self.text_area_tab1.tag_config("version_update", foreground="gold") #???
+        return lines
 
     def _toggle_help_content(self):
         """Switch between normal content and help content"""
@@ -973,254 +3907,102 @@ copies or substantial portions of the Software."""
             cursor=LINK_CURSOR
         )
         self.check_updates_link.pack(pady=(0, 10), padx=HELP_CONTENT_PADDING, anchor="w")
-        self.check_updates_link.bind("<Button-1>", lambda e: self._check_version_in_help())
-
-        # Status Label
-        self.version_status_label = ctk.CTkLabel(
-            version_frame,
-            text="Ready to check...",
-            font=ctk.CTkFont(size=12)
-        )
-        self.version_status_label.pack(pady=(0, 10), padx=HELP_CONTENT_PADDING, anchor="w")
-
-        # Update Information Labels (initially empty)
-        self.update_info_frame = ctk.CTkFrame(version_frame, fg_color='transparent')
-        self.update_info_frame.pack(fill="x", padx=HELP_CONTENT_PADDING, pady=(0, 8))
-
-        self.update_title_label = ctk.CTkLabel(
-            self.update_info_frame,
-            text="",
-            font=ctk.CTkFont(size=12, weight="bold")
-        )
-        self.update_title_label.pack(anchor="w")
-
-        self.update_changes_label = ctk.CTkLabel(
-            self.update_info_frame,
-            text="",
-            font=ctk.CTkFont(size=11),
-            justify="left"
-        )
-        self.update_changes_label.pack(anchor="w", pady=(2, 0))
-
-        self.update_download_label = ctk.CTkLabel(
-            self.update_info_frame,
-            text="",
-            font=ctk.CTkFont(size=11),
-            text_color=LINK_COLOR,
-            cursor=LINK_CURSOR
-        )
-        self.update_download_label.pack(anchor="w", pady=(2, 0))
-
-        self.update_notes_label = ctk.CTkLabel(
-            self.update_info_frame,
-            text="",
-            font=ctk.CTkFont(size=11),
-            justify="left"
-        )
-        self.update_notes_label.pack(anchor="w", pady=(2, 0))
-
-    # Safer wrapper around translator.translate [hardcoded messages only]
-    def _safe_translate(self, text, dest):
-        try:
-            if not text:
-                return text
-            translator = Translator()
-            result = run_async_translation(translator.translate(text, dest=dest))
-            if result and hasattr(result, "text"):
-                return result.text
-        except Exception as e:
-            self.logger.warning(f"Translation failed: {e}")
-        return text
-
-
-    def _manual_translate(self):
-        text = self.manual_entry.get().strip()
-        if not text:
-            return
-
-        try:
-            translator = Translator()
-            result = run_async_translation(translator.translate(text, dest=self.manual_translate_lang))
-            translated = result.text
-        except Exception as e:
-            translated = f"[Translation error: {e}]"
-            self.logger.error(f"Manual translation error: {e}")
-
-        # Copy to clipboard
-        try:
-            pyperclip.copy(translated)
-        except Exception as e:
-            self.logger.warning(f"Clipboard copy failed: {e}")
-
-        # Insert into chat area (but NOT DB)
-        header_line = f"[Manual Translation → {self.manual_translate_lang.upper()}]"
-        self._insert_message_tab1(header_line, "manual_header")
-        self._insert_message_tab1(">   '" + text + "'", "original")
-        self._insert_message_tab1("→ " + translated, f"translated_{self.manual_translate_lang}")
-        self._insert_message_tab1("")
-
-        # Clear entry
-        self.manual_entry.delete(0, "end")
-
-
-    # ---------------- Paths / Files ----------------
-    def _get_settings_path(self):
-        user_home = os.path.expanduser("~")
-        app_folder = os.path.join(user_home, "AppData", "Local", "ScTranslationApp")
-        os.makedirs(app_folder, exist_ok=True)
-        return os.path.join(app_folder, "settings.json")
-
-    def _get_dictionary_path(self):
-        user_home = os.path.expanduser("~")
-        app_folder = os.path.join(user_home, "AppData", "Local", "ScTranslationApp")
-        return os.path.join(app_folder, "game_dictionary.json")
-
-    def _get_default_logs_path(self):
-        user_home = os.path.expanduser("~")
-        return os.path.join(user_home, "Documents", "My Games", "StarConflict", "logs")
-
-    def _get_db_path(self):
-        user_home = os.path.expanduser("~")
-        db_dir = os.path.join(user_home, "AppData", "Local", "ScTranslationApp", "database")
-        os.makedirs(db_dir, exist_ok=True)
-        return os.path.join(db_dir, "chat_history.db")
-
-    def _fetch_remote_dictionary(self):
-        """Download remote dictionary JSON if enabled."""
-        if not self.settings.get("allow_remote_dictionary", False):
-            return {}
-
-        url = self.settings.get("remote_dictionary_url", "")
-        data = self._fetch_remote_json(url)
-        if not data:
-            self.logger.warning("Remote dictionary fetch failed or empty.")
-            return {}
-        if not isinstance(data, dict):
-            self.logger.warning("Remote dictionary is not a dict.")
-            return {}
-        return data
-
-    def _merge_dictionaries(self, base: dict, remote: dict):
-        """Merge remote dictionary into base without overwriting (case-insensitive)."""
-        merged = dict(base)  # copy base
-        base_keys_lower = {k.lower() for k in base.keys()}
-
-        for key, val in remote.items():
-            if key.lower() not in base_keys_lower:
-                merged[key] = val
-        return merged
-    
-    def _load_settings(self):
-        """Load settings.json or create with defaults if not found."""
-        if not os.path.exists(self.settings_path):
-            # First run → set logs path dynamically
-            DEFAULT_SETTINGS["game_logs_path"] = self._get_default_logs_path()
-            with open(self.settings_path, "w", encoding="utf-8") as f:
-                json.dump(DEFAULT_SETTINGS, f, indent=4)
-            return DEFAULT_SETTINGS.copy()
-        else:
-            try:
-                with open(self.settings_path, "r", encoding="utf-8") as f:
-                    settings = json.load(f)
+        self.check_updates_link.bind("<Button-1>", lambda e: self._check_version_in_help())
 
-                # Ensure backwards compatibility
-                for key, value in DEFAULT_SETTINGS.items():
-                    if key not in settings:
-                        settings[key] = value
+        # Status Label
+        self.version_status_label = ctk.CTkLabel(
+            version_frame,
+            text="Ready to check...",
+            font=ctk.CTkFont(size=12)
+        )
+        self.version_status_label.pack(pady=(0, 10), padx=HELP_CONTENT_PADDING, anchor="w")
 
-                # Special handling for manual_languages - ensure it exists
-                if "manual_languages" not in settings:
-                    settings["manual_languages"] = DEFAULT_SETTINGS["manual_languages"]
+        # Update Information Labels (initially empty)
+        self.update_info_frame = ctk.CTkFrame(version_frame, fg_color='transparent')
+        self.update_info_frame.pack(fill="x", padx=HELP_CONTENT_PADDING, pady=(0, 8))
 
-                # Ensure last_notified_version exists for backward compatibility
-                if "last_notified_version" not in settings:
-                    settings["last_notified_version"] = APP_VERSION
+        self.update_title_label = ctk.CTkLabel(
+            self.update_info_frame,
+            text="",
+            font=ctk.CTkFont(size=12, weight="bold")
+        )
+        self.update_title_label.pack(anchor="w")
 
-                # Ensure remote fetch settings exist for performance optimization
-                if "last_remote_fetch" not in settings:
-                    settings["last_remote_fetch"] = 0
-                if "remote_fetch_interval" not in settings:
-                    settings["remote_fetch_interval"] = 3600
+        self.update_changes_label = ctk.CTkLabel(
+            self.update_info_frame,
+            text="",
+            font=ctk.CTkFont(size=11),
+            justify="left"
+        )
+        self.update_changes_label.pack(anchor="w", pady=(2, 0))
 
-                # Handle migration from old welcome_message_override to new structure
-                if "welcome_message_override" in settings:
-                    # Migrate old content to remote_welcome_message if it's not already set
-                    old_content = settings.get("welcome_message_override", "").strip()
-                    if old_content and not settings.get("remote_welcome_message"):
-                        settings["remote_welcome_message"] = old_content
-                    # Remove the old field to clean up
-                    del settings["welcome_message_override"]
+        self.update_download_label = ctk.CTkLabel(
+            self.update_info_frame,
+            text="",
+            font=ctk.CTkFont(size=11),
+            text_color=LINK_COLOR,
+            cursor=LINK_CURSOR
+        )
+        self.update_download_label.pack(anchor="w", pady=(2, 0))
 
-                return settings
-            except Exception as e:
-                print(f"[ERROR] Failed to load settings, using defaults: {e}")
-                return DEFAULT_SETTINGS.copy()
+        self.update_notes_label = ctk.CTkLabel(
+            self.update_info_frame,
+            text="",
+            font=ctk.CTkFont(size=11),
+            justify="left"
+        )
+        self.update_notes_label.pack(anchor="w", pady=(2, 0))
 
-    def _save_settings(self):
-        """Save current settings to file, ensuring new defaults are included."""
+    def _translate_cached(self, text, dest):
+        """Translate through the pipeline's cache. Raises on translation failure."""
+        return self.pipeline.translate(text, dest)
+
+    # Safer wrapper around translator.translate [hardcoded messages only]
+    def _safe_translate(self, text, dest):
         try:
-            for key, value in DEFAULT_SETTINGS.items():
-                if key not in self.settings:
-                    self.settings[key] = value
+            if not text:
+                return text
+            return self._translate_cached(text, dest)
+        except Exception as e:
+            self.logger.warning(f"Translation failed: {e}")
+        return text
 
-            with open(self.settings_path, "w", encoding="utf-8") as f:
-                json.dump(self.settings, f, indent=4)
+
+    def _manual_translate(self):
+        text = self.manual_entry.get().strip()
+        if not text:
+            return
+
+        try:
+            translated = self._translate_cached(text, self.manual_translate_lang)
         except Exception as e:
-            print(f"[ERROR] Failed to save settings: {e}")
+            translated = f"[Translation error: {e}]"
+            self.logger.error(f"Manual translation error: {e}")
 
-    # ---- fetch/check helper ----
-    def _fetch_remote_json(self, url: str, timeout: float = 3.0):
-        """Return dict from URL or None on any error."""
-        if not url:
-            return None
+        # Copy to clipboard
         try:
-            req = Request(url, headers={"User-Agent": f"SC-Translator/{APP_VERSION}"})
-            with urlopen(req, timeout=timeout) as resp:
-                if resp.status != 200:
-                    return None
-                raw = resp.read().decode("utf-8", errors="replace")
-            return json.loads(raw)
-        except (HTTPError, URLError, TimeoutError, ValueError, json.JSONDecodeError) as e:
-            self.logger.warning(f"Remote welcome fetch failed: {e}")
-            return None
+            pyperclip.copy(translated)
+        except Exception as e:
+            self.logger.warning(f"Clipboard copy failed: {e}")
 
-    def _should_fetch_remote(self):
-        """Check if we should attempt remote fetch based on time interval."""
-        last_fetch = self.settings.get("last_remote_fetch", 0)
-        interval = self.settings.get("remote_fetch_interval", 3600)  # 1 hour default
-        current_time = time.time()
+        # Insert into chat area (but NOT DB)
+        header_line = f"[Manual Translation → {self.manual_translate_lang.upper()}]"
+        self._insert_message_tab1(header_line, "manual_header")
+        self._insert_message_tab1(">   '" + text + "'", "original")
+        self._insert_message_tab1("→ " + translated, f"translated_{self.manual_translate_lang}")
+        self._insert_message_tab1("")
 
-        if current_time - last_fetch > interval:
-            return True
-        return False
+        # Clear entry
+        self.manual_entry.delete(0, "end")
 
-    def _update_fetch_time(self):
-        """Update the last fetch timestamp."""
-        self.settings["last_remote_fetch"] = int(time.time())
-        self._save_settings()
 
-    def _check_remote_welcome(self):
+    def _check_remote_welcome(self, data):
         """
-        Check for remote welcome message and version updates.
+        Apply a fetched remote welcome message / version update to the settings.
         Handles backward compatibility with old JSON format.
-        Includes performance optimization with fetch interval checking.
+        Runs on the Tk loop with data fetched by the startup thread; the caller saves the settings.
         """
-        # TEMPORARILY DISABLE FETCH INTERVAL FOR DEBUGGING
-        # For welcome messages, use a shorter interval (5 minutes) to allow more frequent checks
-        # last_fetch = self.settings.get("last_remote_fetch", 0)
-        # current_time = time.time()
-        # welcome_interval = 300  # 5 minutes for welcome messages
-
-        # if current_time - last_fetch <= welcome_interval:
-        #     self.logger.info(f"Skipping remote fetch - last fetch was {current_time - last_fetch:.0f} seconds ago (interval: {welcome_interval}s)")
-        #     return False
-
-        url = DEFAULT_REMOTE_WELCOME_URL
-        data = self._fetch_remote_json(url)
-
-        # Always update fetch time, even if fetch failed
-        self._update_fetch_time()
-
+        # remote_fetch_interval is applied by the remote cache: within it, `data` is the cached copy
         if not data:
             self.logger.warning("No data received from remote welcome URL")
             return False
@@ -1318,14 +4100,12 @@ copies or substantial portions of the Software."""
             self.settings['last_notified_version'] = remote_version
             updates_applied = True
 
-        # If any updates were applied, reset counter and save
+        # If any updates were applied, reset counter
         if updates_applied:
             self.settings["welcome_counter"] = 0
-            self._save_settings()
 
-            # Show version update notification if version was updated
+            # The extended welcome block shows the new version's notes, download link and changes
             if version_update_needed:
-                self._insert_version_update_message(data)
                 self.logger.info(f"Version update notified: {remote_version}")
 
             self.logger.info(f"Settings updated - welcome: {welcome_update_needed}, version: {version_update_needed}")
@@ -1334,81 +4114,33 @@ copies or substantial portions of the Software."""
             self.logger.info(f"No updates needed - welcome: {welcome_update_needed}, version: {version_update_needed}")
             return False
 
-    def _load_dictionary(self):
-        # Load local dictionary first
-        if not os.path.exists(self.dictionary_path):
-            default_dict = DEFAULT_DICTIONARY.copy()
-            with open(self.dictionary_path, "w", encoding="utf-8") as f:
-                json.dump(default_dict, f, indent=4)
-            base_dict = default_dict
-        else:
-            with open(self.dictionary_path, "r", encoding="utf-8") as f:
-                base_dict = json.load(f)
-
-        # Optionally merge remote
-        remote_dict = self._fetch_remote_dictionary()
-        merged = self._merge_dictionaries(base_dict, remote_dict)
-        return merged
-
-    # ---------------- Logger ----------------
-    def _init_logger(self):
-        user_home = os.path.expanduser("~")
-        log_folder = os.path.join(user_home, "AppData", "Local", "ScTranslationApp", "logs")
-        os.makedirs(log_folder, exist_ok=True)
-        log_path = os.path.join(log_folder, "app.log")
+    # ---------------- Dictionary / language / logs path (owned by the pipeline) ----------------
+    @property
+    def game_dictionary(self):
+        return self.pipeline.game_dictionary
 
-        logger = logging.getLogger("ScTranslationApp")
-        logger.setLevel(logging.INFO)
+    @game_dictionary.setter
+    def game_dictionary(self, dictionary):
+        self.pipeline.game_dictionary = dictionary
 
-        handler = RotatingFileHandler(log_path, maxBytes=1_000_000, backupCount=5, encoding="utf-8")
-        formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
-        handler.setFormatter(formatter)
+    @property
+    def target_lang(self):
+        return self.pipeline.target_lang
 
-        if not logger.handlers:
-            logger.addHandler(handler)
-        return logger, log_path
+    @target_lang.setter
+    def target_lang(self, lang):
+        self.pipeline.target_lang = lang
 
-    # ---------------- Database ----------------
-    def _init_database(self):
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                category TEXT,
-                username TEXT,
-                message TEXT,
-                translated TEXT,
-                lang TEXT,
-                session_id TEXT
-            )
-        """)
-        conn.commit()
-        conn.close()
+    @property
+    def parent_folder(self):
+        return self.pipeline.parent_folder
 
-    def _db_insert_message(self, ts, category, username, message, translated, lang, session_id):
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cur = conn.cursor()
-            cur.execute("""
-                INSERT INTO messages (timestamp, category, username, message, translated, lang, session_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (ts, category, username, message, translated, lang, session_id))
-            conn.commit()
-        except Exception as e:
-            self.logger.error(f"DB insert error: {e}")
-        finally:
-            conn.close()
+    @parent_folder.setter
+    def parent_folder(self, folder):
+        self.pipeline.parent_folder = folder
 
-    # ---------------- Dictionary substitution ----------------
     def _apply_game_dictionary(self, text):
-        processed = text
-        for key, replacement in self.game_dictionary.items():
-            # Replace ignoring case
-            pattern = re.compile(re.escape(key), re.IGNORECASE)
-            processed = pattern.sub(replacement, processed)
-        return processed
+        return self.pipeline.apply_game_dictionary(text)
 
     # ---------------- Settings actions ----------------
     def _open_settings_file(self):
@@ -1518,28 +4250,59 @@ copies or substantial portions of the Software."""
 
     # ---------------- CSV Export ----------------
     def _export_history_to_csv(self):
+        # The button doubles as "Cancel Export" while an export is running
+        if self.csv_export is not None:
+            self.csv_export.cancel()
+            return
         try:
-            export_path = os.path.join(os.path.dirname(self.settings_path), "history_export.csv")
-            conn = sqlite3.connect(self.db_path)
-            cur = conn.cursor()
-            cur.execute("SELECT timestamp, category, username, message, translated, lang, session_id FROM messages ORDER BY timestamp ASC")
-            rows = cur.fetchall()
-            conn.close()
-
-            with open(export_path, "w", newline="", encoding="utf-8") as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(["timestamp", "category", "username", "message", "translated", "lang", "session_id"])
-                writer.writerows(rows)
-            self.logger.info(f"History exported to CSV: {export_path}")
-        except Exception as e:
-            self.logger.error(f"CSV export failed: {e}")
+            start = day_range(self.export_from_var.get().strip())[0] if self.export_from_var.get().strip() else None
+            end = day_range(self.export_to_var.get().strip())[1] if self.export_to_var.get().strip() else None
+        except ValueError:
+            self.status_label.configure(text="Export: dates must be YYYY-MM-DD")
+            return
+        category = self.export_category_var.get()
+        export_path = filedialog.asksaveasfilename(
+            title="Export History to CSV",
+            initialdir=os.path.dirname(self.settings_path),
+            initialfile="history_export.csv",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv")],
+        )
+        if not export_path:
+            return
+        self.csv_export = HistoryCsvExport(
+            self.db_path, export_path, start=start, end=end,
+            category=None if category == "All" else category,
+            session_id=self.export_session_var.get().strip() or None,
+        ).start()
+        self.btn_export_csv.configure(text="Cancel Export")
+        self.status_label.configure(text="Exporting history...")
+        self.after(200, self._poll_csv_export)
+
+    def _poll_csv_export(self):
+        export = self.csv_export
+        if export is None or self.stop_flag:
+            return
+        if not export.done.is_set():
+            total = export.total_rows
+            progress = f"{export.rows_written}/{total}" if total is not None else f"{export.rows_written}"
+            self.status_label.configure(text=f"Exporting history: {progress} rows")
+            self.after(200, self._poll_csv_export)
+            return
+        self.csv_export = None
+        self.btn_export_csv.configure(text="Export CSV")
+        if export.error is not None:
+            self.logger.error(f"CSV export failed: {export.error}")
+            self.status_label.configure(text="CSV export failed")
+        elif export.cancelled:
+            self.logger.info(f"CSV export cancelled after {export.rows_written} rows")
+            self.status_label.configure(text="CSV export cancelled")
+        else:
+            self.logger.info(f"History exported to CSV: {export.export_path} ({export.rows_written} rows)")
+            self.status_label.configure(text=f"Exported {export.rows_written} messages to {os.path.basename(export.export_path)}")
 
     def _categorize_line(self, line: str):
-        line_lower = line.lower()
-        for key, category in CHAT_CATEGORIES.items():
-            if key.lower() in line_lower:
-                return category
-        return None
+        return self.pipeline.line_classifier.classify(line)[0]
 
     def _extract_second_bracket(self, display_line: str):
         parts = display_line.split("[")
@@ -1548,102 +4311,38 @@ copies or substantial portions of the Software."""
         return None
 
     def _parse_line(self, line: str, category: str):
-        raw_upper = line.upper()
-        if any(pat.upper() in raw_upper for pat in SKIP_PATTERNS):
+        classifier = self.pipeline.line_classifier
+        _, skip, username, message_text = classifier.classify(line)
+        if skip:
             return None  # skip system/technical messages
+        if username is None:  # caller-supplied category the classifier did not see
+            username, message_text = classifier.split_message(line)
+        return format_parsed_line(category, username, message_text)
+
+    # ---------------- Chat messages ----------------
+    def _show_chat_message(self, chat_message):
+        """Pipeline callback (delivery thread, log order): queue the message for the Chat tab."""
+        tag_name = f"translated_{chat_message['lang']}"
+
+        if chat_message.get("repeat_id") is not None:
+            # Reposts collapse into a "×N" counter on the first copy
+            self.chat_queue.put(ChatRepeat(
+                chat_message["repeat_id"], chat_message["header_line"], chat_message["category"],
+                chat_message["repeat_count"],
+                ((">   '" + chat_message["message_line"] + "'\n", "original"),
+                 ("→ " + chat_message["translated"] + "\n\n", tag_name)),
+                chat_message["repeat_exact"] or chat_message["repeat_count"] == 1,
+            ))
+            return
 
-        # Extract username inside [ ]
-        username_match = re.search(r"\[(.*?)\]", line)
-        if username_match:
-            raw_username = username_match.group(1)
-            username = raw_username.lstrip()  
-            # removing trailing spaces
-            username = username.strip()
-        else:
-            username = "NotThePlayer"
-    
-        # Extract message text after the first ']'
-        parts = line.split("]", 1)
-        message_text = parts[1].strip() if len(parts) > 1 else line.strip()
-
-        # Current app timestamp (not game timestamp)
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Build separate lines
-        header_line = f"[{timestamp}] [{category}] [{username}]:"
-        message_line = message_text
-
-        return timestamp, username, message_text, header_line, message_line
-
-    # ---------------- Chat log watching ----------------
-    def _get_latest_logfile(self):
-        if not self.parent_folder.exists():
-            return None
-        subfolders = [f for f in self.parent_folder.iterdir() if f.is_dir()]
-        if not subfolders:
-            return None
-        latest_folder = max(subfolders, key=lambda f: f.stat().st_ctime)
-        log_file = latest_folder / "chat.log"
-        return log_file if log_file.exists() else None
-
-    def _watch_latest_chat(self):
-        file_handle = None
-        while not self.stop_flag:
-            logfile = self._get_latest_logfile()
-            if logfile and logfile != self.current_logfile:
-                self.current_logfile = logfile
-                if file_handle:
-                    file_handle.close()
-                try:
-                    file_handle = open(self.current_logfile, "r", encoding="utf-8", errors="replace")
-                    file_handle.seek(0, os.SEEK_END)
-                    self.session_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.path.basename(os.path.dirname(self.current_logfile))}"
-                    self.logger.info(f"Switched to logfile {self.current_logfile}")
-                except Exception as e:
-                    self.logger.error(f"Error opening logfile {logfile}: {e}")
-                    time.sleep(1)
-                    continue
-
-            if file_handle:
-                line = file_handle.readline()
-                if line:
-                    category = self._categorize_line(line)
-                    if category:
-                        parsed = self._parse_line(line, category)
-                        if not parsed:  # filtered system/noise line
-                           continue
-
-                        ts, username, message_text, header_line, message_line = parsed
-                        processed_message = self._apply_game_dictionary(message_text)
-
-                        try:
-                            translator = Translator()
-                            result = run_async_translation(translator.translate(processed_message, dest=self.target_lang))
-                            translated = result.text
-                        except Exception as e:
-                            translated = f"[Translation error: {e}]"
-                            self.logger.error(f"Translation error: {e}")
-
-                        tag_name = f"translated_{self.target_lang}"
-
-                        # Insert header with category-based color
-                        self._insert_message_tab1(header_line, category)
-
-                        # Insert the original message
-                        self._insert_message_tab1(">   '" +message_line +"'", "original" )
-
-                        # Insert the translated line
-                        self._insert_message_tab1("→ " + translated + "\n", tag_name)
+        # Insert header with category-based color
+        self._insert_message_tab1(chat_message["header_line"], chat_message["category"])
 
-                        # Save to DB
-                        self._db_insert_message(ts, category, username, message_text, translated, self.target_lang, self.session_id)
-                else:
-                    time.sleep(0.3)
-            else:
-                time.sleep(2)
+        # Insert the original message
+        self._insert_message_tab1(">   '" + chat_message["message_line"] + "'", "original")
 
-        if file_handle:
-            file_handle.close()
+        # Insert the translated line
+        self._insert_message_tab1("→ " + chat_message["translated"] + "\n", tag_name)
 
     # ---------------- App Log tail ----------------
     def _tail_app_log(self):
@@ -1665,52 +4364,160 @@ copies or substantial portions of the Software."""
             time.sleep(1)
 
     # ---------------- History Tab helpers ----------------
+    # Queries run on the pager's thread; the Tk loop polls the future and renders one page per insert.
     def _load_history_for_date(self):
         date_str = self.history_date_var.get().strip()
         try:
-            datetime.strptime(date_str, "%Y-%m-%d")
+            start, end = day_range(date_str)
         except ValueError:
             return
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        cur.execute("SELECT timestamp, category, username, message, translated FROM messages WHERE date(timestamp)=? ORDER BY timestamp ASC", (date_str,))
-        rows = cur.fetchall()
-        conn.close()
-
-        self.history_text.configure(state="normal")
-        self.history_text.delete("1.0", tk.END)
-        for r in rows:
-            ts, cat, user, msg, trans = r
-            self.history_text.insert(tk.END, f"[{ts}] [{cat}] [{user}]: {msg}\n→ {trans}\n\n")
-        self.history_text.configure(state="disabled")
+        self._start_history_listing(HISTORY_DATE_QUERY, (start, end))
 
     def _load_history_last_session(self):
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        cur.execute("SELECT session_id FROM messages ORDER BY id DESC LIMIT 1")
-        row = cur.fetchone()
-        if row:
-            last_sess = row[0]
-            cur.execute("SELECT timestamp, category, username, message, translated FROM messages WHERE session_id=? ORDER BY timestamp ASC", (last_sess,))
-            rows = cur.fetchall()
-        else:
-            rows = []
-        conn.close()
+        self._start_history_listing(HISTORY_SESSION_QUERY, None)
+
+    def _search_history(self):
+        # Words are ANDed; best matches (bm25 over message, translation and username) come first
+        if not self.pipeline.fulltext_search:
+            query, params = like_search_query(self.history_search_var.get())
+            if query:
+                self._start_history_listing(query, params)
+            return
+        query = fts_query(self.history_search_var.get())
+        if not query:
+            return
+        self._start_history_listing(HISTORY_SEARCH_QUERY, (query, HISTORY_SNAPSHOT), SEARCH_START, search_cursor)
 
+    def _start_history_listing(self, query, params, after=HISTORY_START, cursor_of=history_cursor):
         self.history_text.configure(state="normal")
         self.history_text.delete("1.0", tk.END)
-        for r in rows:
-            ts, cat, user, msg, trans = r
-            self.history_text.insert(tk.END, f"[{ts}] [{cat}] [{user}]: {msg}\n→ {trans}\n\n")
         self.history_text.configure(state="disabled")
+        self.history_rows_shown = 0
+        self.history_status_label.configure(text="Loading...")
+        self._poll_history_page(self.history_pager.start(query, params, after, cursor_of))
+
+    def _load_more_history(self):
+        future = self.history_pager.next_page()
+        if future is not None:
+            self.btn_history_more.configure(state="disabled")
+            self.history_status_label.configure(text=f"{self.history_rows_shown} messages, loading...")
+            self._poll_history_page(future)
+
+    def _on_history_scroll(self, event=None):
+        if self.history_pager.has_more and self.history_text.yview()[1] >= 0.9:
+            self._load_more_history()
+
+    def _poll_history_page(self, future):
+        if self.stop_flag:
+            return
+        if not future.done():
+            self.after(20, self._poll_history_page, future)
+            return
+        try:
+            rows = self.history_pager.accept(future.result())
+        except Exception as e:
+            self.logger.error(f"History query failed: {e}")
+            self.history_status_label.configure(text="History query failed")
+            return
+        if rows is None:  # superseded by a newer listing
+            return
+        self._append_history_rows(rows)
+
+    def _append_history_rows(self, rows):
+        if rows:
+            self.history_text.configure(state="normal")
+            self.history_text.insert(tk.END, format_history_rows(rows))
+            self.history_text.configure(state="disabled")
+        self.history_rows_shown += len(rows)
+        more = self.history_pager.has_more
+        self.btn_history_more.configure(state="normal" if more else "disabled")
+        suffix = " (more available)" if more else ""
+        self.history_status_label.configure(text=f"{self.history_rows_shown} messages{suffix}")
 
     # ---------------- Insert helpers ----------------
     def _insert_message_tab1(self, text, tag=None):
-        # Unlock → insert → scroll → lock
-        self.text_area_tab1.configure(state="normal")
-        self.text_area_tab1.insert("end", text + "\n", tag)
-        self.text_area_tab1.see("end")
-        self.text_area_tab1.configure(state="disabled")
+        # Thread-safe: queued here, inserted by _drain_chat_queue on the Tk main loop
+        self.chat_queue.put((text + "\n", tag))
+
+    def _drain_chat_queue(self):
+        """Tk main loop tick: insert pending chat lines in one unlock → insert → scroll → lock cycle."""
+        if self.stop_flag:
+            return
+        budget = self.settings.get("ui_frame_budget_ms", 12) / 1000
+        started = time.perf_counter()
+        deadline = started + budget
+        inserted = 0
+        more = False
+        try:
+            while True:
+                try:
+                    item = self.chat_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if not inserted:
+                    self.text_area_tab1.configure(state="normal")
+                inserted += 1
+                try:
+                    if isinstance(item, ChatRepeat):
+                        self._show_chat_repeat(item)
+                    else:
+                        text, tag = item
+                        self.text_area_tab1.insert("end", text, tag)
+                except Exception as e:
+                    # Drop this line only; the rest of the queue must still reach the Chat tab
+                    self.logger.error(f"Chat tab insert failed: {e}")
+                if time.perf_counter() >= deadline:
+                    more = not self.chat_queue.empty()
+                    break
+            if inserted:
+                # Keep long sessions bounded; older messages stay in the History tab
+                trim_chat_buffer(
+                    self.text_area_tab1,
+                    self.settings.get("chat_max_lines", 5000),
+                    self.settings.get("chat_trim_batch", 500),
+                )
+                self.text_area_tab1.see("end")
+                self.text_area_tab1.configure(state="disabled")
+                self.metrics.observe("ui_insert", time.perf_counter() - started)
+        except Exception as e:
+            self.logger.error(f"Chat tab update failed: {e}")
+        finally:
+            # Over budget: yield to Tk for one event pass, then continue with the backlog
+            delay = 1 if more else self.settings.get("ui_refresh_interval_ms", 50)
+            self.after(delay, self._drain_chat_queue)
+
+    def _update_backend_status(self):
+        """Tk main loop, once a second: show the rate limiter / circuit breaker state in the status bar."""
+        if self.stop_flag:
+            return
+        text = format_backend_status(self.pipeline.backend_guard.status())
+        if text != self.backend_status_label.cget("text"):
+            self.backend_status_label.configure(text=text)
+        self.after(1000, self._update_backend_status)
+
+    def _show_chat_repeat(self, repeat):
+        """Tk main loop: update the "×N" counter of a repost's first copy, or show the message (or its edit) in full."""
+        text_area = self.text_area_tab1
+        mark = f"repeat_{repeat.entry_id}"
+        header = self._repeat_marks.get(mark)
+        # The mark sits where the first copy's header ends; trimming or clearing the view removes the header
+        if (repeat.count > 1 and repeat.exact and header is not None
+                and text_area.get(f"{mark} linestart", mark) == header):
+            text_area.delete(mark, f"{mark} lineend")
+            text_area.insert(mark, f"  ×{repeat.count}", "repeat_count")
+            return
+        text_area.insert("end", repeat.header, repeat.tag)
+        text_area.mark_set(mark, "end-1c")
+        text_area.mark_gravity(mark, "left")  # the counter is inserted after the mark
+        self._repeat_marks[mark] = repeat.header
+        self._repeat_marks.move_to_end(mark)
+        if len(self._repeat_marks) > CHAT_REPEAT_MARKS:
+            text_area.mark_unset(self._repeat_marks.popitem(last=False)[0])
+        if repeat.count > 1:
+            text_area.insert("end", f"  ×{repeat.count}", "repeat_count")
+        text_area.insert("end", "\n")
+        for line, tag in repeat.lines:
+            text_area.insert("end", line, tag)
 
     # ------------- Remote dictionary helper --------------
     def _toggle_remote_dictionary(self):
@@ -1826,6 +4633,11 @@ copies or substantial portions of the Software."""
     def _close_app(self):
         """Properly close the application."""
         self.stop_flag = True
+        self.startup_executor.shutdown(wait=False)
+        self.pipeline.close()
+        self.history_pager.close()
+        if self.csv_export is not None:
+            self.csv_export.cancel()
         self.logger.info("Application closed")
         self.destroy()
 
@@ -1839,8 +4651,8 @@ copies or substantial portions of the Software."""
         self.check_updates_link.configure(text_color="gray")
 
         try:
-            # Force version check (bypass interval)
-            data = self._fetch_remote_json(DEFAULT_REMOTE_WELCOME_URL)
+            # Force version check (bypass interval; a conditional request, so usually a 304)
+            data = self._fetch_remote_json(DEFAULT_REMOTE_WELCOME_URL, max_age=0, background=False)
 
             if not data:
                 self._show_help_version_result("Unable to check for updates. Please try again later.")
@@ -1930,6 +4742,88 @@ def resource_path(rel_path: str) -> str:
     base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base, rel_path)
 
-if __name__ == "__main__":
+
+# ---------------- Headless mode ----------------
+HEADLESS_FIELDS = ("timestamp", "category", "username", "message", "translated", "lang", "session_id")
+
+
+class HeadlessTranslator(AppStorage):
+    """
+    Runs the chat pipeline without a window (`--headless`): uses the same settings,
+    dictionary and chat_history.db as the app and writes each translated message as
+    one JSON line to `output`.
+    """
+
+    def __init__(self, output=None, logs_path=None, lang=None, translation_backend=None):
+        self.settings_path = self._get_settings_path()
+        self.dictionary_path = self._get_dictionary_path()
+        self.settings = self._load_settings()
+        self.logger, self.app_log_path = self._init_logger()
+        self.remote_cache = RemoteJsonCache(self._get_remote_cache_dir(), logger=self.logger)
+        if logs_path:
+            self.settings["game_logs_path"] = logs_path  # this run only; settings.json is not changed
+        if translation_backend:
+            self.settings["translation_backend"] = translation_backend
+        self.output = output or sys.stdout
+        self.pipeline = ChatPipeline(
+            self.settings,
+            self._get_db_path(),
+            self._get_translation_cache_path(),
+            self._load_dictionary(),
+            self.logger,
+            on_message=self._write_message,
+        )
+        if lang:
+            self.pipeline.target_lang = lang
+
+    def _write_message(self, chat_message):
+        record = {field: chat_message[field] for field in HEADLESS_FIELDS}
+        self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.output.flush()
+
+    def run(self):
+        self.logger.info(f"Headless mode started (logs: {self.pipeline.parent_folder}, lang: {self.pipeline.target_lang})")
+        print(f"Watching {self.pipeline.parent_folder} -> {self.pipeline.target_lang} (Ctrl+C to stop)", file=sys.stderr)
+        signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)  # stop cleanly under a service manager
+        if hasattr(signal, "SIGUSR1"):  # `kill -USR1 <pid>` writes the pipeline stats to the App Log
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.pipeline.log_metrics(since_start=True))
+        self.pipeline.start()
+        try:
+            while self.pipeline.is_running():
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.pipeline.close()
+            self.logger.info("Headless mode stopped")
+        return 0
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sc-chat-translator", description="Star Conflict Chat Translator")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without a window: translate chat.log to the history DB and JSON lines")
+    parser.add_argument("--output", help="headless: append JSON lines to this file instead of stdout")
+    parser.add_argument("--logs-path", help="headless: StarConflict logs folder (default: game_logs_path setting)")
+    parser.add_argument("--lang", help="headless: target language code, e.g. en (default: last_language setting)")
+    parser.add_argument("--translation-backend", choices=["google", "fake", "fake-async"],
+                        help="headless: translation backend (default: translation_backend setting)")
+    args = parser.parse_args(argv)
+
+    if args.headless:
+        if args.output:
+            with open(args.output, "a", encoding="utf-8") as output:
+                return HeadlessTranslator(output, args.logs_path, args.lang, args.translation_backend).run()
+        return HeadlessTranslator(None, args.logs_path, args.lang, args.translation_backend).run()
+
     app = TranslatedFileWatcher()
     app.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the chat processing hot path of Star Conflict Chat Translator.
+
+Usage:
+    python scripts/benchmark.py dictionary
+    python scripts/benchmark.py search --rows 1000000
+    python scripts/benchmark.py chat-soak --messages 100000
+    python scripts/benchmark.py all
+"""
+import argparse
+import csv
+import os
+import random
+import re
+import string
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Import main.py from the project root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import (  # noqa: E402
+    CHAT_CATEGORIES, DEFAULT_DICTIONARY, DEFAULT_SETTINGS, SKIP_PATTERNS,
+    HISTORY_SEARCH_QUERY, SEARCH_START, ChatLineClassifier, GameDictionaryMatcher, HistoryCsvExport,
+    LanguageIdentifier, RepeatDetector,
+    SessionFolderIndex, fetch_history_page, fts_query, migrate_database, search_cursor, trim_chat_buffer,
+)
+
+SAMPLE_LINES = [
+    "WTS [link 2 d:Ship_Race3_M_T5_CraftUniq] cheap, pm me",
+    "cnc for the help guys, xpam was close",
+    "co+ anyone? need 2 more",
+    "Продам [link 11 d:Relics_craft_part] недорого",
+    "gg wp, see you next match",
+    "LF squad for со+ tonight, have [link 2 d:Ship_Race5_L_ENGINEER_Rank8]",
+]
+
+# Raw chat.log lines: kept channels, filtered system lines and channels we ignore
+SAMPLE_LOG_LINES = [
+    "19:42:17.411  CHAT| <  #trading>[ PlayerOne]WTS [link 2 d:Ship_Race3_M_T5_CraftUniq] cheap\n",
+    "19:42:18.002  CHAT| <  #general_RUSSIAN>[ Ivan]всем привет, кто в со+?\n",
+    "19:42:18.530  CHAT| <  ##general_POLISH>[ Kasia]siema, ktoś na co+?\n",
+    "19:42:19.120  CHAT| <  #battle_1234567>[ Wingman]focus the beacon\n",
+    "19:42:19.877  CHAT| Join channel <#general_ENGLISH>\n",
+    "19:42:20.301  CHAT| System message: server restart in 10 minutes\n",
+    "19:42:21.654  CHAT| <  #clan_ABC>[ Leader]gg everyone\n",
+    "19:42:22.015  CHAT| PRIVATE From [ Trader]still selling that tornado?\n",
+    "19:42:22.640  CHAT| <  #general_ENGLISH>[ Pilot]anyone for co+?\n",
+    "19:42:23.118  SYSTEM| Loading level 'map_042'\n",
+]
+
+
+def _time_per_call(fn, lines, min_seconds=0.2):
+    """Return average seconds per call of fn(line) over the sample lines."""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for line in lines:
+            fn(line)
+        calls += len(lines)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+
+def _synthetic_dictionary(size, seed=42):
+    rng = random.Random(seed)
+    dictionary = dict(DEFAULT_DICTIONARY)
+    while len(dictionary) < size:
+        kind = rng.choice(["ship", "item", "slang"])
+        if kind == "ship":
+            key = f"[link 2 d:Ship_Race{rng.randint(1, 6)}_{rng.choice('SML')}_T{rng.randint(1, 5)}_{rng.randint(0, 99999)}]"
+        elif kind == "item":
+            key = f"[link 11 d:Item_{''.join(rng.choices(string.ascii_letters, k=8))}]"
+        else:
+            key = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+        dictionary[key] = f"[{key[:6]}]"
+    return dictionary
+
+
+def _legacy_apply(dictionary, text):
+    """The pre-matcher implementation: one compile + scan per dictionary entry."""
+    processed = text
+    for key, replacement in dictionary.items():
+        pattern = re.compile(re.escape(key), re.IGNORECASE)
+        processed = pattern.sub(replacement, processed)
+    return processed
+
+
+def bench_dictionary(args):
+    """Per-line cost of game dictionary substitution vs. dictionary size."""
+    results = []
+    for size in (300, 3000, 30000):
+        dictionary = _synthetic_dictionary(size)
+        start = time.perf_counter()
+        matcher = GameDictionaryMatcher(dictionary)
+        build_ms = (time.perf_counter() - start) * 1000
+        matcher_us = _time_per_call(matcher.apply, SAMPLE_LINES) * 1e6
+        legacy_us = None
+        if size <= 3000:  # the legacy loop takes seconds per line beyond this
+            legacy_us = _time_per_call(lambda line: _legacy_apply(dictionary, line), SAMPLE_LINES[:2]) * 1e6
+        results.append({"entries": size, "build_ms": build_ms, "matcher_us": matcher_us, "legacy_us": legacy_us})
+
+    print(f"{'entries':>8} {'build ms':>10} {'matcher us/line':>16} {'legacy us/line':>15}")
+    for row in results:
+        legacy = f"{row['legacy_us']:.1f}" if row["legacy_us"] is not None else "-"
+        print(f"{row['entries']:>8} {row['build_ms']:>10.1f} {row['matcher_us']:>16.2f} {legacy:>15}")
+    return results
+
+
+def _legacy_latest_logfile(parent_folder):
+    """The pre-index implementation: list and stat every session folder on each call."""
+    subfolders = [f for f in parent_folder.iterdir() if f.is_dir()]
+    if not subfolders:
+        return None
+    latest_folder = max(subfolders, key=lambda f: f.stat().st_ctime)
+    log_file = latest_folder / "chat.log"
+    return log_file if log_file.exists() else None
+
+
+def bench_sessions(args):
+    """Latest session folder lookup with 10k synthetic session folders."""
+    with tempfile.TemporaryDirectory() as tmp:
+        logs = Path(tmp)
+        for i in range(10000):
+            (logs / f"2025.{i // 1000 + 1:02d}.{i % 28 + 1:02d} {i % 24:02d}.{i % 60:02d}.{i:05d}").mkdir()
+        time.sleep(0.05)  # keep ctimes distinct on coarse-grained filesystems
+        newest = logs / "2099.12.31 23.59.59.99999"
+        newest.mkdir()
+        (newest / "chat.log").write_text("", encoding="utf-8")
+
+        legacy_ms = _time_per_call(lambda _: _legacy_latest_logfile(logs), [None], min_seconds=1.0) * 1000
+
+        start = time.perf_counter()
+        index = SessionFolderIndex(logs, refresh_interval=2.0)
+        assert index.latest_logfile() == newest / "chat.log"
+        cold_ms = (time.perf_counter() - start) * 1000
+        warm_us = _time_per_call(lambda _: index.latest_logfile(), [None]) * 1e6
+
+        # A new session appears: only the new folder is stat()ed
+        index.refresh_interval = 0
+        time.sleep(0.05)
+        added = logs / "2100.01.01 00.00.00.00000"
+        added.mkdir()
+        (added / "chat.log").write_text("", encoding="utf-8")
+        start = time.perf_counter()
+        assert index.latest_logfile() == added / "chat.log"
+        rescan_ms = (time.perf_counter() - start) * 1000
+        index.close()
+
+    print(f"legacy scan per call:   {legacy_ms:10.2f} ms")
+    print(f"index cold build:       {cold_ms:10.2f} ms")
+    print(f"index warm call:        {warm_us:10.2f} us")
+    print(f"index new-folder update:{rescan_ms:10.2f} ms")
+    return {"legacy_ms": legacy_ms, "cold_ms": cold_ms, "warm_us": warm_us, "rescan_ms": rescan_ms}
+
+
+def _legacy_classify(line):
+    """The pre-classifier implementation of _categorize_line + _parse_line (minus formatting)."""
+    line_lower = line.lower()
+    category = None
+    for key, name in CHAT_CATEGORIES.items():
+        if key.lower() in line_lower:
+            category = name
+            break
+    if not category:
+        return None
+    raw_upper = line.upper()
+    if any(pat.upper() in raw_upper for pat in SKIP_PATTERNS):
+        return None
+    username_match = re.search(r"\[(.*?)\]", line)
+    username = username_match.group(1).strip() if username_match else "NotThePlayer"
+    parts = line.split("]", 1)
+    message = parts[1].strip() if len(parts) > 1 else line.strip()
+    return category, username, message
+
+
+def bench_classifier(args):
+    """Chat line categorize + skip + username/message extraction throughput."""
+    classifier = ChatLineClassifier()
+    legacy = 1 / _time_per_call(_legacy_classify, SAMPLE_LOG_LINES, min_seconds=1.0)
+    compiled = 1 / _time_per_call(classifier.classify, SAMPLE_LOG_LINES, min_seconds=1.0)
+    print(f"legacy:     {legacy:12,.0f} lines/s")
+    print(f"classifier: {compiled:12,.0f} lines/s  ({compiled / legacy:.1f}x)")
+    return {"legacy_lines_per_sec": legacy, "classifier_lines_per_sec": compiled}
+
+
+def bench_langid(args):
+    """Local language guess throughput on chat messages (runs before every translation)."""
+    identifier = LanguageIdentifier()
+    per_line = _time_per_call(identifier.identify, SAMPLE_LINES, min_seconds=1.0)
+    print(f"identify: {1 / per_line:12,.0f} lines/s  ({per_line * 1e6:.1f} µs/line)")
+    for text in SAMPLE_LINES:
+        lang, confidence = identifier.identify(text)
+        print(f"  {lang or '?':>3} {confidence:4.2f}  {text}")
+    return {"lines_per_sec": 1 / per_line}
+
+
+def bench_repeats(args):
+    """Near-duplicate check per kept chat line: 500 senders reposting slowly drifting ads."""
+    rng = random.Random(7)
+    messages = [
+        (f"Player{rng.randrange(500)}", f"{text} #{rng.randrange(100)}")
+        for text in SAMPLE_LINES for _ in range(200)
+    ]
+    rng.shuffle(messages)
+    detector = RepeatDetector()
+    per_line = _time_per_call(lambda message: detector.check(*message), messages, min_seconds=1.0)
+    detector = RepeatDetector()
+    repeats = sum(detector.check(*message)[0].count > 1 for message in messages)
+    print(f"check: {1 / per_line:12,.0f} lines/s  ({per_line * 1e6:.1f} µs/line)")
+    print(f"repeats: {repeats:,} of {len(messages):,} lines")
+    return {"lines_per_sec": 1 / per_line, "repeat_share": repeats / len(messages)}
+
+
+def _legacy_csv_export(db_path, export_path):
+    """The pre-streaming implementation: fetchall() the whole table, then write."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT timestamp, category, username, message, translated, lang, session_id FROM messages ORDER BY timestamp ASC"
+    ).fetchall()
+    conn.close()
+    with open(export_path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["timestamp", "category", "username", "message", "translated", "lang", "session_id"])
+        writer.writerows(rows)
+
+
+def bench_csv_export(args):
+    """Peak Python memory and time of a full history CSV export vs. table size."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "chat_history.db")
+        export_path = os.path.join(tmp, "export.csv")
+        conn = sqlite3.connect(db_path)
+        migrate_database(conn)
+        inserted = 0
+        for size in (10000, 100000, 300000):
+            conn.executemany(
+                "INSERT INTO messages (timestamp, category, username, message, translated, lang, session_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((f"2025-10-{i % 28 + 1:02d} 12:00:{i % 60:02d}", "Trading", f"Player{i % 500}",
+                  f"WTS [link 2 d:Ship_Race3_M_T5_CraftUniq] #{i}", f"WTS [Tornado] #{i}", "en", f"s{i // 1000}")
+                 for i in range(inserted, size)),
+            )
+            conn.commit()
+            inserted = size
+            row = {"rows": size}
+            for name, fn in (("legacy", lambda: _legacy_csv_export(db_path, export_path)),
+                             ("streaming", lambda: HistoryCsvExport(db_path, export_path).run())):
+                tracemalloc.start()
+                start = time.perf_counter()
+                fn()
+                row[f"{name}_s"] = time.perf_counter() - start
+                row[f"{name}_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+            results.append(row)
+        conn.close()
+
+    print(f"{'rows':>8} {'legacy s':>9} {'legacy peak MB':>15} {'stream s':>9} {'stream peak MB':>15}")
+    for row in results:
+        print(f"{row['rows']:>8} {row['legacy_s']:>9.2f} {row['legacy_peak_mb']:>15.1f} "
+              f"{row['streaming_s']:>9.2f} {row['streaming_peak_mb']:>15.1f}")
+    return results
+
+
+def bench_search(args):
+    """History full-text search latency (first ranked page) vs. a LIKE scan."""
+    rng = random.Random(7)
+    words = ["wts", "wtb", "cheap", "price", "pm", "me", "squad", "co+", "gg", "wp", "hello", "anyone",
+             "продам", "куплю", "дешево", "ship", "module", "monocrystal", "iridium", "credits"]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "chat_history.db")
+        conn = sqlite3.connect(db_path)
+        migrate_database(conn)
+        start = time.perf_counter()
+
+        def rows():
+            for i in range(args.rows):
+                text = " ".join(rng.choices(words, k=8))
+                if i % 10000 == 0:
+                    text += " Tornado"  # rare term: 1 row in 10k
+                yield (f"2025-10-{i % 28 + 1:02d} 12:00:{i % 60:02d}", "Trading", f"Player{i % 5000}", text, text, "en", "s")
+
+        conn.executemany(
+            "INSERT INTO messages (timestamp, category, username, message, translated, lang, session_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows(),
+        )
+        conn.commit()
+        build_s = time.perf_counter() - start
+
+        results = {"rows": args.rows, "build_s": build_s}
+        for label, text in (("rare", "tornado"), ("common", "monocrystal iridium"), ("prefix", "mono*")):
+            query = fts_query(text)
+            results[f"{label}_ms"] = _time_per_call(
+                lambda q: fetch_history_page(
+                    conn, HISTORY_SEARCH_QUERY, (q, args.rows), SEARCH_START, 500, search_cursor
+                ),
+                [query], min_seconds=0.5) * 1000
+        results["like_ms"] = _time_per_call(
+            lambda _: conn.execute("SELECT id FROM messages WHERE message LIKE '%tornado%' LIMIT 500").fetchall(),
+            [None], min_seconds=0.5) * 1000
+        conn.close()
+
+    print(f"rows: {args.rows:,} (insert + index {build_s:.1f} s)")
+    print(f"search rare term:       {results['rare_ms']:10.2f} ms")
+    print(f"search two common terms:{results['common_ms']:10.2f} ms")
+    print(f"search prefix:          {results['prefix_ms']:10.2f} ms")
+    print(f"LIKE scan rare term:    {results['like_ms']:10.2f} ms")
+    return results
+
+
+def _rss_mb():
+    """Current resident set size in MB (Linux), else peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def bench_chat_soak(args):
+    """Chat tab soak test: insert latency and memory over many messages (needs a display)."""
+    import tkinter as tk
+
+    max_lines = args.max_lines if args.max_lines is not None else DEFAULT_SETTINGS["chat_max_lines"]
+    batch = DEFAULT_SETTINGS["chat_trim_batch"]
+    root = tk.Tk()
+    root.withdraw()
+    text = tk.Text(root)
+    text.configure(state="disabled")
+
+    per_tick = 20  # messages inserted per Tk refresh, as during a busy burst
+    checkpoint = max(args.messages // 10, per_tick)
+    latencies = []
+    rows = []
+    for start in range(0, args.messages, per_tick):
+        t0 = time.perf_counter()
+        text.configure(state="normal")
+        for i in range(start, min(start + per_tick, args.messages)):
+            text.insert("end", f"[2025-10-12 20:00:00] [Trading] [Player{i % 500}]:\n", "Trading")
+            text.insert("end", f">   'WTS [link 2 d:Ship_Race3_M_T5_CraftUniq] #{i}'\n", "original")
+            text.insert("end", f"→ WTS [Tornado] #{i}\n\n", "translated_en")
+        trim_chat_buffer(text, max_lines, batch)
+        text.see("end")
+        text.configure(state="disabled")
+        root.update_idletasks()
+        latencies.append((time.perf_counter() - t0) * 1000 / per_tick)
+
+        done = start + per_tick
+        if done % checkpoint == 0 or done >= args.messages:
+            window = sorted(latencies)
+            rows.append({
+                "messages": min(done, args.messages),
+                "lines": int(text.index("end-1c").split(".")[0]),
+                "p50_ms": window[len(window) // 2],
+                "p99_ms": window[int(len(window) * 0.99)],
+                "rss_mb": _rss_mb(),
+            })
+            latencies = []
+    root.destroy()
+
+    print(f"chat_max_lines={max_lines or 'unlimited'}")
+    print(f"{'messages':>9} {'lines':>8} {'p50 ms/msg':>11} {'p99 ms/msg':>11} {'RSS MB':>8}")
+    for row in rows:
+        print(f"{row['messages']:>9} {row['lines']:>8} {row['p50_ms']:>11.3f} {row['p99_ms']:>11.3f} {row['rss_mb']:>8.1f}")
+    return rows
+
+
+BENCHMARKS = {
+    "chat-soak": bench_chat_soak,
+    "classifier": bench_classifier,
+    "csv-export": bench_csv_export,
+    "dictionary": bench_dictionary,
+    "langid": bench_langid,
+    "repeats": bench_repeats,
+    "search": bench_search,
+    "sessions": bench_sessions,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SC Chat Translator micro-benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS) + ["all"])
+    parser.add_argument("--messages", type=int, default=100000, help="messages for chat-soak")
+    parser.add_argument("--rows", type=int, default=1000000, help="history rows for search")
+    parser.add_argument("--max-lines", type=int, default=None, help="chat-soak line limit (0 = unlimited)")
+    args = parser.parse_args()
+
+    # chat-soak needs a display, so "all" runs only the headless benchmarks
+    names = [n for n in sorted(BENCHMARKS) if n != "chat-soak"] if args.benchmark == "all" else [args.benchmark]
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name](args)
+        print()
+
+
+if __name__ == "__main__":
+    main()
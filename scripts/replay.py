@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Replay a recorded chat.log through the chat pipeline (categorize -> parse -> dictionary ->
+translate -> DB) and report throughput plus p50/p95/p99 latency per stage.
+
+Usage:
+    python scripts/replay.py chat.log                      # max speed, offline fake translator (50 ms)
+    python scripts/replay.py chat.log --speed 1            # real time, paced by the log timestamps
+    python scripts/replay.py chat.log --speed 20 --fake-latency-ms 120 --fake-error-rate 0.02 --workers 8
+    python scripts/replay.py chat.log --translator google  # real Google Translate
+    python scripts/replay.py chat.log --translator mymodule:make_translator --json report.json
+"""
+import argparse
+import importlib
+import json
+import logging
+import math
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+# Import main.py from the project root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import (  # noqa: E402
+    DEFAULT_DICTIONARY, DEFAULT_SETTINGS, PIPELINE_STAGES, AsyncFakeTranslator, ChatPipeline, FakeTranslator,
+    TranslationService,
+)
+
+GAME_TIME_RE = re.compile(r"^(\d{2}):(\d{2}):(\d{2})\.(\d{3})")
+
+
+def load_translator_factory(args, created):
+    """
+    'fake', 'fake-async', 'google', or 'module:callable' returning a translator with
+    translate(text, dest) that also accepts src= (passed when the source language is hinted).
+    """
+    spec = args.translator
+    if spec in ("fake", "fake-async"):
+        cls = FakeTranslator if spec == "fake" else AsyncFakeTranslator
+
+        def factory():
+            translator = cls(
+                latency_ms=args.fake_latency_ms, latency_dist=args.fake_latency_dist,
+                error_rate=args.fake_error_rate, throttle_rate=args.fake_throttle_rate,
+                rate_limit=args.fake_rate_limit, seed=args.seed,
+            )
+            created.append(translator)
+            return translator
+        return factory
+    if spec == "google":
+        return None  # TranslationService default: googletrans.Translator
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise SystemExit(f"--translator must be 'fake', 'fake-async', 'google' or 'module:callable', got {spec!r}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class StageRecorder:
+    """Thread-safe per-stage duration samples (seconds)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {stage: [] for stage in PIPELINE_STAGES}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def count(self, stage):
+        with self._lock:
+            return len(self.samples.get(stage, ()))
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples):
+    values = sorted(samples)
+    if not values:
+        return {"count": 0}
+    ms = 1000.0
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * ms,
+        "p50_ms": percentile(values, 50) * ms,
+        "p95_ms": percentile(values, 95) * ms,
+        "p99_ms": percentile(values, 99) * ms,
+        "max_ms": values[-1] * ms,
+    }
+
+
+def game_seconds(line):
+    match = GAME_TIME_RE.match(line)
+    if not match:
+        return None
+    h, m, s, ms = (int(g) for g in match.groups())
+    return h * 3600 + m * 60 + s + ms / 1000
+
+
+def replay(args):
+    with open(args.logfile, "r", encoding="utf-8", errors="replace") as f:
+        lines = f.readlines()
+
+    dictionary = DEFAULT_DICTIONARY
+    if args.dictionary:
+        with open(args.dictionary, "r", encoding="utf-8") as f:
+            dictionary = json.load(f)
+
+    logger = logging.getLogger("ScTranslationApp.replay")
+    logger.addHandler(logging.StreamHandler(sys.stderr))
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = dict(
+            DEFAULT_SETTINGS,
+            game_logs_path=tmp,
+            translation_workers=args.workers,
+            translation_cache_max_entries=args.cache_entries,
+            translation_cache_memory_entries=args.cache_entries,
+            translation_batching=not args.no_batching,
+            translation_batch_window_ms=args.batch_window_ms,
+            translation_rate_limit=args.rate_limit,
+        )
+        settings["languages"] = {"Replay": args.lang}
+        settings["last_language"] = "Replay"
+
+        recorder = StageRecorder()
+        delivered = []
+        translators = []
+        pipeline = ChatPipeline(
+            settings,
+            args.db or os.path.join(tmp, "chat_history.db"),
+            os.path.join(tmp, "translation_cache.db"),
+            dictionary,
+            logger,
+            on_message=lambda message: delivered.append(1),
+            translation_service=TranslationService(
+                translator_factory=load_translator_factory(args, translators),
+                max_concurrency=args.workers,
+            ),
+            observer=recorder.observe,
+        )
+        pipeline.session_id = f"replay-{time.strftime('%Y%m%d-%H%M%S')}"
+
+        start = time.perf_counter()
+        first_game_time = previous = None
+        day_offset = 0
+        for line in lines:
+            if args.speed:
+                seconds = game_seconds(line)
+                if seconds is not None:
+                    if previous is not None and seconds < previous:
+                        day_offset += 86400  # log crossed midnight
+                    previous = seconds
+                    seconds += day_offset
+                    if first_game_time is None:
+                        first_game_time = seconds
+                    delay = start + (seconds - first_game_time) / args.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+            pipeline.process_chat_line(line)
+        fed = time.perf_counter()
+
+        # Let every kept line reach delivery before closing the pool and the DB writer
+        kept = recorder.count("parse")
+        deadline = time.monotonic() + args.drain_timeout
+        while len(delivered) < kept and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pipeline.close()
+        end = time.perf_counter()
+
+    wall = end - start
+    report = {
+        "logfile": os.path.abspath(args.logfile),
+        "speed": args.speed or "max",
+        "translator": args.translator,
+        "fake_translator": {
+            "latency_ms": args.fake_latency_ms, "latency_dist": args.fake_latency_dist,
+            "error_rate": args.fake_error_rate, "throttle_rate": args.fake_throttle_rate,
+            "rate_limit": args.fake_rate_limit, **translators[0].stats(),
+        } if translators else None,
+        "workers": args.workers,
+        "lines": len(lines),
+        "kept": kept,
+        "delivered": len(delivered),
+        "feed_seconds": fed - start,
+        "wall_seconds": wall,
+        "lines_per_sec": len(lines) / wall if wall else None,
+        "messages_per_sec": len(delivered) / wall if wall else None,
+        "counters": pipeline.metrics.snapshot()["counters"],
+        "circuit_opened": pipeline.backend_guard.breaker.opened,
+        "stages": {stage: summarize(samples) for stage, samples in recorder.samples.items()},
+    }
+    return report
+
+
+def print_report(report):
+    speed = "max speed" if report["speed"] == "max" else f"{report['speed']}x real time"
+    print(f"replayed {report['lines']:,} lines ({report['kept']:,} kept, {report['delivered']:,} delivered) "
+          f"in {report['wall_seconds']:.2f} s at {speed}")
+    print(f"input {report['lines_per_sec']:,.0f} lines/s, output {report['messages_per_sec']:,.0f} messages/s")
+    skipped = report["counters"].get("language_skipped", 0)
+    print(f"already in target language (not translated): {skipped:,} "
+          f"({skipped / max(report['delivered'], 1):.0%} of delivered)")
+    counters = report["counters"]
+    hinted = counters.get("hint_user", 0) + counters.get("hint_channel", 0)
+    print(f"source-language hints: {hinted:,} of {hinted + counters.get('hint_none', 0):,} lines sent for translation "
+          f"(user {counters.get('hint_user', 0):,}, channel {counters.get('hint_channel', 0):,})")
+    requests = counters.get("translation_requests", 0)
+    print(f"translation round trips: {requests:,} ({counters.get('batched', 0):,} lines in batched requests, "
+          f"{counters.get('batch_fallbacks', 0):,} split fallbacks)")
+    print(f"backend protection: {counters.get('throttled', 0):,} throttled, {report['circuit_opened']:,} pauses, "
+          f"{counters.get('untranslated', 0):,} lines shown untranslated")
+    print()
+    print(f"{'stage':<12} {'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for stage, row in report["stages"].items():
+        if not row["count"]:
+            print(f"{stage:<12} {0:>8}")
+            continue
+        print(f"{stage:<12} {row['count']:>8} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} "
+              f"{row['p99_ms']:>9.3f} {row['max_ms']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a chat.log through the translation pipeline")
+    parser.add_argument("logfile", help="recorded chat.log")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="1 = real time from the log timestamps, 10 = ten times faster, 0 = max speed (default)")
+    parser.add_argument("--translator", default="fake",
+                        help="fake (default), fake-async, google, or module:callable factory")
+    parser.add_argument("--fake-latency-ms", type=float, default=50.0, help="fake translator mean latency")
+    parser.add_argument("--fake-latency-dist", default="fixed", choices=FakeTranslator.LATENCY_DISTRIBUTIONS)
+    parser.add_argument("--fake-error-rate", type=float, default=0.0, help="share of fake requests that fail")
+    parser.add_argument("--fake-throttle-rate", type=float, default=0.0, help="share of fake requests throttled")
+    parser.add_argument("--fake-rate-limit", type=float, default=0.0,
+                        help="fake backend requests/s before throttling (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0, help="fake backend random seed")
+    parser.add_argument("--workers", type=int, default=DEFAULT_SETTINGS["translation_workers"])
+    parser.add_argument("--no-batching", action="store_true", help="one translation request per line")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="client-side requests/s to the translator (0 = unlimited, the default)")
+    parser.add_argument("--batch-window-ms", type=float, default=DEFAULT_SETTINGS["translation_batch_window_ms"],
+                        help="how long a line waits for others to share its request")
+    parser.add_argument("--lang", default="en", help="target language code")
+    parser.add_argument("--dictionary", help="game dictionary JSON (default: built-in dictionary)")
+    parser.add_argument("--cache-entries", type=int, default=0,
+                        help="translation cache size; 0 (default) disables the cache so every line is translated")
+    parser.add_argument("--db", help="history DB to write (default: a temporary file)")
+    parser.add_argument("--drain-timeout", type=float, default=300.0, help="seconds to wait for in-flight lines")
+    parser.add_argument("--json", help="write the report as JSON to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    report = replay(args)
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+"""
+Unit tests for chat history storage.
+"""
+import pytest
+import sqlite3
+import sys
+import os
+from unittest.mock import Mock, patch
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from main import (
+    CSV_EXPORT_COLUMNS, ChatHistoryWriter, HISTORY_DATE_QUERY, HISTORY_SEARCH_QUERY, HISTORY_SESSION_QUERY,
+    HISTORY_SNAPSHOT, HISTORY_START, SCHEMA_MIGRATIONS, SEARCH_START, HistoryCsvExport, HistoryPager, SourceLanguageHints,
+    build_export_query, day_range, fetch_history_page, format_history_rows, fts_query, get_schema_version,
+    has_fulltext_index, like_search_query, migrate_database, search_cursor,
+)
+
+
+def _create_messages_table(db_path):
+    conn = sqlite3.connect(db_path)
+    migrate_database(conn)
+    conn.close()
+
+
+def _row(i, session="s1", src_lang=None):
+    return (
+        f"2025-10-12 10:00:{i % 60:02d}", "Trading", f"Player{i}", f"msg {i}", f"translated {i}", "en", session, src_lang
+    )
+
+
+def _count(db_path):
+    conn = sqlite3.connect(db_path)
+    count = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    conn.close()
+    return count
+
+
+class TestChatHistoryWriter:
+    """Test the background batched DB writer."""
+
+    def test_flush_commits_queued_rows(self, tmp_path):
+        """Test that flush() makes every queued row visible to other connections."""
+        db_path = str(tmp_path / "chat_history.db")
+        _create_messages_table(db_path)
+        writer = ChatHistoryWriter(db_path, batch_size=1000, flush_interval=60)
+        for i in range(25):
+            writer.insert(_row(i))
+        assert writer.flush()
+        assert _count(db_path) == 25
+        writer.close()
+
+    def test_rows_are_group_committed(self, tmp_path):
+        """Test that rows are committed in batches rather than one by one."""
+        db_path = str(tmp_path / "chat_history.db")
+        _create_messages_table(db_path)
+        writer = ChatHistoryWriter(db_path, batch_size=50, flush_interval=60)
+        for i in range(200):
+            writer.insert(_row(i))
+        writer.close()
+        assert _count(db_path) == 200
+        assert writer.rows_written == 200
+        assert writer.commits <= 5
+
+    def test_time_window_commit(self, tmp_path):
+        """Test that a partial batch is committed once the flush window elapses."""
+        import time
+
+        db_path = str(tmp_path / "chat_history.db")
+        _create_messages_table(db_path)
+        writer = ChatHistoryWriter(db_path, batch_size=1000, flush_interval=0.05)
+        writer.insert(_row(1))
+        deadline = time.monotonic() + 2
+        while _count(db_path) == 0 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert _count(db_path) == 1
+        writer.close()
+
+    def test_wal_mode(self, tmp_path):
+        """Test that the writer switches the database to WAL journaling."""
+        db_path = str(tmp_path / "chat_history.db")
+        _create_messages_table(db_path)
+        writer = ChatHistoryWriter(db_path)
+        writer.flush()
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        conn.close()
+        writer.close()
+
+    def test_insert_error_is_logged(self, tmp_path):
+        """Test that a failing batch is logged instead of killing the writer."""
+        db_path = str(tmp_path / "chat_history.db")  # no messages table
+        logger = Mock()
+        writer = ChatHistoryWriter(db_path, logger=logger)
+        writer.insert(_row(1))
+        writer.flush()
+        logger.error.assert_called_once()
+        _create_messages_table(db_path)
+        writer.insert(_row(2))
+        writer.close()
+        assert _count(db_path) == 1
+
+    def test_bad_row_does_not_drop_its_batch(self, tmp_path):
+        """Test that a failed batch is retried row by row and only the bad row is lost."""
+        db_path = str(tmp_path / "chat_history.db")
+        _create_messages_table(db_path)
+        logger = Mock()
+        writer = ChatHistoryWriter(db_path, batch_size=1000, flush_interval=60, logger=logger)
+        for i in range(10):
+            writer.insert(_row(i) if i != 5 else _row(i)[:-1])  # one row with a missing column
+        writer.close()
+        assert _count(db_path) == 9
+        assert writer.rows_written == 9
+        assert "1 of 10 rows dropped" in logger.error.call_args[0][0]
+
+    def test_connect_failure_is_raised(self, tmp_path):
+        """Test that a database that cannot be opened fails the constructor instead of dropping rows."""
+        with pytest.raises(sqlite3.OperationalError):
+            ChatHistoryWriter(str(tmp_path / "missing" / "chat_history.db"))
+
+
+class TestSchemaMigrations:
+    """Test the versioned chat history schema."""
+
+    LEGACY_SCHEMA = """
+        CREATE TABLE messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            category TEXT,
+            username TEXT,
+            message TEXT,
+            translated TEXT,
+            lang TEXT,
+            session_id TEXT
+        )
+    """
+
+    def test_fresh_database_reaches_latest_version(self):
+        """Test that a new database is migrated to the latest version."""
+        conn = sqlite3.connect(":memory:")
+        assert migrate_database(conn) == len(SCHEMA_MIGRATIONS)
+        assert get_schema_version(conn) == len(SCHEMA_MIGRATIONS)
+
+    def test_migration_is_idempotent(self):
+        """Test that running migrations twice changes nothing."""
+        conn = sqlite3.connect(":memory:")
+        migrate_database(conn)
+        assert migrate_database(conn) == len(SCHEMA_MIGRATIONS)
+
+    def test_legacy_database_keeps_rows(self):
+        """Test that an unversioned database from older releases is upgraded in place."""
+        conn = sqlite3.connect(":memory:")
+        conn.execute(self.LEGACY_SCHEMA)
+        conn.execute("INSERT INTO messages (timestamp, message, session_id) VALUES ('2025-10-12 10:00:00', 'hi', 's1')")
+        conn.commit()
+
+        migrate_database(conn)
+
+        assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 1
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(messages)")}
+        assert {"idx_messages_timestamp", "idx_messages_session"} <= indexes
+        # Existing rows are backfilled into the search index
+        assert conn.execute("SELECT rowid FROM messages_fts WHERE messages_fts MATCH 'hi'").fetchall() == [(1,)]
+        # ... and have no identified source language yet
+        assert conn.execute("SELECT src_lang FROM messages").fetchall() == [(None,)]
+
+    def test_sender_profile_query_uses_username_index(self):
+        """Test that loading a sender's recent messages is an index lookup without a sort step."""
+        conn = sqlite3.connect(":memory:")
+        migrate_database(conn)
+        plan = self._query_plan(conn, SourceLanguageHints.PROFILE_QUERY, ("Ivan", 50))
+        assert "idx_messages_username" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_day_range(self):
+        """Test the half-open timestamp range used for date lookups."""
+        assert day_range("2025-10-12") == ("2025-10-12", "2025-10-13")
+        assert day_range("2024-12-31") == ("2024-12-31", "2025-01-01")
+        with pytest.raises(ValueError):
+            day_range("12.10.2025")
+
+    def test_date_query_matches_whole_day(self):
+        """Test that the range query returns exactly the rows of that day."""
+        conn = sqlite3.connect(":memory:")
+        migrate_database(conn)
+        conn.executemany(
+            "INSERT INTO messages (timestamp, message) VALUES (?, ?)",
+            [("2025-10-11 23:59:59", "before"), ("2025-10-12 00:00:00", "first"),
+             ("2025-10-12 23:59:59", "last"), ("2025-10-13 00:00:00", "after")],
+        )
+        rows, next_cursor = fetch_history_page(conn, HISTORY_DATE_QUERY, day_range("2025-10-12"))
+        assert [r[4] for r in rows] == ["first", "last"]
+        assert next_cursor is None
+
+    @staticmethod
+    def _query_plan(conn, sql, params):
+        return " | ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+    def test_date_query_uses_timestamp_index(self):
+        """Test that loading a date is an index range scan without a sort step."""
+        conn = sqlite3.connect(":memory:")
+        migrate_database(conn)
+        plan = self._query_plan(conn, HISTORY_DATE_QUERY, (*day_range("2025-10-12"), *HISTORY_START, 500))
+        assert "idx_messages_timestamp" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_session_query_uses_session_index(self):
+        """Test that loading a session is an index lookup without a sort step."""
+        conn = sqlite3.connect(":memory:")
+        migrate_database(conn)
+        plan = self._query_plan(conn, HISTORY_SESSION_QUERY, ("20251012-100000-session", *HISTORY_START, 500))
+        assert "idx_messages_session" in plan
+        assert "TEMP B-TREE" not in plan
+
+
+class TestHistoryPagination:
+    """Test keyset-paginated History queries."""
+
+    @staticmethod
+    def _fill(db_path, count, session="s1"):
+        conn = sqlite3.connect(db_path)
+        migrate_database(conn)
+        conn.executemany(
+            "INSERT INTO messages (timestamp, category, username, message, translated, lang, session_id, src_lang) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [_row(i, session) for i in range(count)],
+        )
+        conn.commit()
+        return conn
+
+    def test_pages_cover_every_row_once(self, tmp_path):
+        """Test that paging with the returned cursor visits all rows in (timestamp, id) order."""
+        conn = self._fill(str(tmp_path / "chat_history.db"), 250)  # timestamps repeat every 60 rows
+        seen, after = [], HISTORY_START
+        while after is not None:
+            rows, after = fetch_history_page(conn, HISTORY_DATE_QUERY, day_range("2025-10-12"), after, limit=40)
+            assert len(rows) <= 40
+            seen.extend(rows)
+        assert len({r[0] for r in seen}) == 250
+        assert seen == sorted(seen, key=lambda r: (r[1], r[0]))
+
+    def test_last_page_has_no_cursor(self, tmp_path):
+        """Test that an exactly full last page does not report more rows."""
+        conn = self._fill(str(tmp_path / "chat_history.db"), 40)
+        rows, after = fetch_history_page(conn, HISTORY_SESSION_QUERY, ("s1",), limit=40)
+        assert len(rows) == 40
+        assert after is None
+
+    def test_format_history_rows(self):
+        """Test the History tab rendering of a page."""
+        rows = [(1, "2025-10-12 10:00:00", "Trading", "Pilot", "привет", "hello")]
+        assert format_history_rows(rows) == "[2025-10-12 10:00:00] [Trading] [Pilot]: привет\n→ hello\n\n"
+        rows = [(2, "2025-10-12 10:00:01", "Trading", "Pilot", "пока", None)]
+        assert format_history_rows(rows).endswith("→ (not translated)\n\n")
+
+    def test_pager_loads_last_session_in_pages(self, tmp_path):
+        """Test that the pager resolves the last session and pages through it."""
+        db_path = str(tmp_path / "chat_history.db")
+        self._fill(db_path, 10, session="old").close()
+        self._fill(db_path, 25, session="new").close()
+        pager = HistoryPager(db_path, page_size=10)
+
+        rows = pager.accept(pager.start(HISTORY_SESSION_QUERY).result(timeout=5))
+        assert len(rows) == 10 and pager.has_more
+        total = len(rows)
+        while pager.has_more:
+            future = pager.next_page()
+            assert pager.next_page() is None  # one page in flight at a time
+            total += len(pager.accept(future.result(timeout=5)))
+        assert total == 25
+        pager.close()
+
+    def test_pager_drops_superseded_pages(self, tmp_path):
+        """Test that a page of an older listing is ignored once a new listing starts."""
+        db_path = str(tmp_path / "chat_history.db")
+        self._fill(db_path, 30).close()
+        pager = HistoryPager(db_path, page_size=10)
+        stale = pager.start(HISTORY_DATE_QUERY, day_range("2025-10-12"))
+        fresh = pager.start(HISTORY_DATE_QUERY, day_range("2025-10-13"))
+        assert pager.accept(stale.result(timeout=5)) is None
+        assert pager.accept(fresh.result(timeout=5)) == []
+        assert not pager.has_more
+        pager.close()
+
+
+class TestHistoryCsvExport:
+    """Test the streaming, filterable CSV export."""
+
+    @staticmethod
+    def _fill(db_path):
+        conn = sqlite3.connect(db_path)
+        migrate_database(conn)
+        rows = [_row(i, session="s1") for i in range(30)]
+        rows += [(f"2025-10-13 09:00:{i:02d}", "Battle", f"Wing{i}", f"go {i}", f"go {i}", "en", "s2", "en") for i in range(20)]
+        conn.executemany(
+            "INSERT INTO messages (timestamp, category, username, message, translated, lang, session_id, src_lang) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _read_csv(path):
+        import csv
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.reader(f))
+
+    def test_exports_all_rows_in_chunks(self, tmp_path):
+        """Test that every row is written, in timestamp order, across several chunks."""
+        db_path = str(tmp_path / "chat_history.db")
+        self._fill(db_path)
+        export_path = str(tmp_path / "export.csv")
+        export = HistoryCsvExport(db_path, export_path, chunk_size=7)
+        export.run()
+
+        rows = self._read_csv(export_path)
+        assert rows[0] == CSV_EXPORT_COLUMNS
+        assert len(rows) == 51
+        assert [r[0] for r in rows[1:]] == sorted(r[0] for r in rows[1:])
+        assert export.rows_written == export.total_rows == 50
+        assert export.error is None and export.done.is_set()
+
+    def test_filters(self, tmp_path):
+        """Test date range, category and session filters."""
+        db_path = str(tmp_path / "chat_history.db")
+        self._fill(db_path)
+        cases = [
+            ({"start": "2025-10-13", "end": None}, 20),
+            ({"start": None, "end": day_range("2025-10-12")[1]}, 30),
+            ({"category": "Battle"}, 20),
+            ({"session_id": "s1", "category": "Battle"}, 0),
+        ]
+        for filters, expected in cases:
+            export_path = str(tmp_path / "export.csv")
+            export = HistoryCsvExport(db_path, export_path, **filters)
+            export.run()
+            assert len(self._read_csv(export_path)) - 1 == expected, filters
+
+    def test_filter_query_is_parameterized(self):
+        """Test that filter values are bound as parameters, not formatted into SQL."""
+        select_sql, count_sql, params = build_export_query(category="Trading' OR 1=1 --")
+        assert "Trading" not in select_sql and "Trading" not in count_sql
+        assert params == ("Trading' OR 1=1 --",)
+
+    def test_cancel_removes_partial_file(self, tmp_path):
+        """Test that a cancelled export leaves neither the target nor a partial file."""
+        db_path = str(tmp_path / "chat_history.db")
+        self._fill(db_path)
+        export_path = str(tmp_path / "export.csv")
+        export = HistoryCsvExport(db_path, export_path, chunk_size=5)
+        export.cancel()
+        export.start()
+        assert export.done.wait(5)
+        assert export.cancelled
+        assert not os.path.exists(export_path)
+        assert not os.path.exists(export_path + ".part")
+
+    def test_error_is_reported(self, tmp_path):
+        """Test that a failing export records the error and cleans up."""
+        db_path = str(tmp_path / "empty.db")  # no messages table
+        export_path = str(tmp_path / "export.csv")
+        export = HistoryCsvExport(db_path, export_path)
+        export.run()
+        assert isinstance(export.error, sqlite3.Error)
+        assert not os.path.exists(export_path)
+        assert not os.path.exists(export_path + ".part")
+
+
+class TestHistorySearch:
+    """Test full-text search over chat history."""
+
+    MESSAGES = [
+        ("Trader", "Продам Торнадо недорого", "Selling Tornado cheap"),
+        ("Pilot", "WTS tornado tornado tornado", "WTS tornado tornado tornado"),
+        ("Wing", "gg wp", "gg wp"),
+        ("TornadoFan", "hello", "hello"),
+    ]
+
+    def _conn(self):
+        conn = sqlite3.connect(":memory:")
+        migrate_database(conn)
+        conn.executemany(
+            "INSERT INTO messages (timestamp, category, username, message, translated) VALUES (?, 'Trading', ?, ?, ?)",
+            [(f"2025-10-12 10:00:0{i}", user, msg, trans) for i, (user, msg, trans) in enumerate(self.MESSAGES)],
+        )
+        return conn
+
+    def _search(self, conn, text, limit=10):
+        params = (fts_query(text), 1_000_000)
+        return fetch_history_page(conn, HISTORY_SEARCH_QUERY, params, SEARCH_START, limit, search_cursor)
+
+    def test_triggers_keep_index_in_sync(self):
+        """Test that inserts, updates and deletes on messages reach the search index."""
+        conn = self._conn()
+        assert [r[3] for r in self._search(conn, "gg")[0]] == ["Wing"]
+        conn.execute("UPDATE messages SET message = 'glhf', translated = 'glhf' WHERE username = 'Wing'")
+        assert self._search(conn, "gg")[0] == []
+        assert len(self._search(conn, "glhf")[0]) == 1
+        conn.execute("DELETE FROM messages WHERE username = 'Wing'")
+        assert self._search(conn, "glhf")[0] == []
+
+    def test_search_covers_translation_and_username(self):
+        """Test that message, translation and username columns are all searchable, case-insensitively."""
+        conn = self._conn()
+        assert {r[3] for r in self._search(conn, "tornado")[0]} == {"Trader", "Pilot"}
+        assert [r[3] for r in self._search(conn, "торнадо")[0]] == ["Trader"]
+        assert [r[3] for r in self._search(conn, "tornadofan")[0]] == ["TornadoFan"]
+        assert {r[3] for r in self._search(conn, "tornado*")[0]} == {"Trader", "Pilot", "TornadoFan"}
+
+    def test_hits_are_ranked_and_paginated(self):
+        """Test that the best match comes first and pages continue after the cursor."""
+        conn = self._conn()
+        first, after = self._search(conn, "tornado", limit=1)
+        assert first[0][3] == "Pilot"
+        params = (fts_query("tornado"), 1_000_000)
+        rows, after = fetch_history_page(conn, HISTORY_SEARCH_QUERY, params, after, 1, search_cursor)
+        assert rows[0][3] == "Trader"
+        assert after is None
+        assert format_history_rows(rows).startswith("[2025-10-12 10:00:00] [Trading] [Trader]")
+
+    def test_paging_is_pinned_to_the_rows_at_start(self, tmp_path):
+        """Test that rows written while a search is paged through neither shift nor join the listing."""
+        db_path = str(tmp_path / "chat_history.db")
+        conn = sqlite3.connect(db_path)
+        migrate_database(conn)
+        insert = "INSERT INTO messages (timestamp, category, username, message, translated) VALUES (?, 'Trading', ?, ?, '')"
+        conn.executemany(insert, [(f"2025-10-12 10:{i:02d}:00", f"P{i}", "wts tornado " + "x " * i) for i in range(12)])
+        conn.commit()
+
+        pager = HistoryPager(db_path, page_size=5)
+        try:
+            seen = pager.accept(pager.start(HISTORY_SEARCH_QUERY, (fts_query("tornado"), HISTORY_SNAPSHOT),
+                                            SEARCH_START, search_cursor).result())
+            while pager.has_more:
+                # Short new hits would rank first and change every bm25 score
+                conn.executemany(insert, [("2025-10-12 11:00:00", "New", "tornado")] * 5)
+                conn.commit()
+                seen += pager.accept(pager.next_page().result())
+        finally:
+            pager.close()
+        assert sorted(row[3] for row in seen) == sorted(f"P{i}" for i in range(12))
+
+    def test_fts_query_escapes_operators(self):
+        """Test that search box input cannot inject FTS5 syntax."""
+        assert fts_query('  WTS  "cheap" ') == '"WTS" """cheap"""'
+        assert fts_query("a OR b -c") == '"a" "OR" "b" "-c"'
+        assert fts_query("torn* *") == '"torn"*'
+        conn = self._conn()
+        assert self._search(conn, 'NEAR( "gg')[0] == []
+
+    def test_without_fts5_search_falls_back_to_like(self):
+        """Test that a sqlite3 build without FTS5 still migrates to the latest schema and can search."""
+        with patch("main.fts5_available", return_value=False):
+            conn = self._conn()
+            assert get_schema_version(conn) == len(SCHEMA_MIGRATIONS)
+            assert not has_fulltext_index(conn)
+
+        def search(text):
+            query, params = like_search_query(text)
+            return [r[3] for r in fetch_history_page(conn, query, params, limit=10)[0]]
+
+        assert search("tornado") == ["Trader", "Pilot", "TornadoFan"]  # time order, substring match
+        assert search("WTS tornado*") == ["Pilot"]
+        assert search("100%") == []
+        assert like_search_query("  * ") == (None, ())
+
+    def test_index_is_built_once_fts5_is_available(self):
+        """Test that a database migrated without FTS5 gets its search index on the next start."""
+        with patch("main.fts5_available", return_value=False):
+            conn = self._conn()
+        conn.commit()
+        migrate_database(conn)
+        assert has_fulltext_index(conn)
+        assert {r[3] for r in self._search(conn, "tornado")[0]} == {"Trader", "Pilot"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
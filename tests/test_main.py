@@ -95,5 +95,964 @@ class TestChatCategories:
         assert CHAT_CATEGORIES["#squad_"] == "Squad"
 
 
+@pytest.fixture(params=[True, False], ids=["inotify", "polling"])
+def follower_factory(request, tmp_path):
+    """Create FileFollower instances with and without inotify."""
+    from main import FileFollower
+
+    followers = []
+
+    def make(path, **kwargs):
+        follower = FileFollower(path, use_inotify=request.param, **kwargs)
+        followers.append(follower)
+        return follower
+
+    yield make
+    for follower in followers:
+        follower.close()
+
+
+class TestFileFollower:
+    """Test chat.log following."""
+
+    def test_only_new_lines_are_returned(self, tmp_path, follower_factory):
+        """Test that existing content is skipped and appended lines are delivered."""
+        log = tmp_path / "chat.log"
+        log.write_text("old line\n", encoding="utf-8")
+        follower = follower_factory(log)
+
+        with open(log, "a", encoding="utf-8") as f:
+            f.write("[Player1] #trading>[ hello\n")
+        assert follower.read_lines(timeout=1.0) == ["[Player1] #trading>[ hello\n"]
+
+    def test_idle_wait_times_out(self, tmp_path, follower_factory):
+        """Test that an unchanged file yields no lines after the timeout."""
+        log = tmp_path / "chat.log"
+        log.write_text("", encoding="utf-8")
+        follower = follower_factory(log)
+        assert follower.read_lines(timeout=0.1) == []
+
+    def test_wakes_up_on_write(self, tmp_path, follower_factory):
+        """Test that a blocked reader returns promptly once a line is written."""
+        import threading
+        import time
+
+        log = tmp_path / "chat.log"
+        log.write_text("", encoding="utf-8")
+        follower = follower_factory(log)
+
+        def writer():
+            time.sleep(0.1)
+            with open(log, "a", encoding="utf-8") as f:
+                f.write("line\n")
+
+        threading.Thread(target=writer).start()
+        start = time.monotonic()
+        lines = follower.read_lines(timeout=5.0)
+        assert lines == ["line\n"]
+        assert time.monotonic() - start < 1.0
+
+    def test_partial_line_is_held_back(self, tmp_path, follower_factory):
+        """Test that a line is only delivered once its newline is written."""
+        log = tmp_path / "chat.log"
+        log.write_text("", encoding="utf-8")
+        follower = follower_factory(log)
+
+        with open(log, "a", encoding="utf-8") as f:
+            f.write("Привет, ")
+        assert follower.read_available() == []
+        with open(log, "a", encoding="utf-8") as f:
+            f.write("мир\n")
+        assert follower.read_available() == ["Привет, мир\n"]
+
+    def test_truncated_file_is_reread(self, tmp_path, follower_factory):
+        """Test that following restarts from the top after truncation."""
+        log = tmp_path / "chat.log"
+        log.write_text("a long first line\n", encoding="utf-8")
+        follower = follower_factory(log)
+        log.write_text("new\n", encoding="utf-8")
+        assert follower.read_lines(timeout=1.0) == ["new\n"]
+
+
+class TestSessionFolderIndex:
+    """Test cached discovery of the newest session folder."""
+
+    @staticmethod
+    def _make_session(logs, name, with_log=True):
+        import time
+
+        time.sleep(0.02)  # distinct ctimes on coarse-grained filesystems
+        folder = logs / name
+        folder.mkdir()
+        if with_log:
+            (folder / "chat.log").write_text("", encoding="utf-8")
+        return folder
+
+    @pytest.mark.parametrize("use_inotify", [True, False], ids=["inotify", "polling"])
+    def test_newest_folder_is_tracked(self, tmp_path, use_inotify):
+        """Test that a new session folder is picked up after a refresh."""
+        from main import SessionFolderIndex
+
+        self._make_session(tmp_path, "2025.10.11 20.00.00")
+        second = self._make_session(tmp_path, "2025.10.12 20.00.00")
+        index = SessionFolderIndex(tmp_path, refresh_interval=0, use_inotify=use_inotify)
+        assert index.latest_logfile() == second / "chat.log"
+
+        third = self._make_session(tmp_path, "2025.10.13 20.00.00")
+        assert index.latest_logfile() == third / "chat.log"
+        index.close()
+
+    def test_unchanged_directory_is_not_rescanned(self, tmp_path):
+        """Test that repeated lookups reuse the index."""
+        from main import SessionFolderIndex
+
+        self._make_session(tmp_path, "2025.10.12 20.00.00")
+        index = SessionFolderIndex(tmp_path, refresh_interval=0, use_inotify=False)
+        for _ in range(50):
+            index.latest_logfile()
+        assert index.scans == 1
+        index.close()
+
+    def test_refresh_interval_limits_checks(self, tmp_path):
+        """Test that the slow cadence hides changes until the interval elapses."""
+        from main import SessionFolderIndex
+
+        first = self._make_session(tmp_path, "2025.10.12 20.00.00")
+        index = SessionFolderIndex(tmp_path, refresh_interval=3600, use_inotify=False)
+        assert index.latest_logfile() == first / "chat.log"
+        self._make_session(tmp_path, "2025.10.13 20.00.00")
+        assert index.latest_logfile() == first / "chat.log"
+        index.close()
+
+    def test_chat_log_created_later(self, tmp_path):
+        """Test that a session folder without chat.log yet returns None until it appears."""
+        from main import SessionFolderIndex
+
+        folder = self._make_session(tmp_path, "2025.10.12 20.00.00", with_log=False)
+        index = SessionFolderIndex(tmp_path, refresh_interval=0, use_inotify=False)
+        assert index.latest_logfile() is None
+        (folder / "chat.log").write_text("", encoding="utf-8")
+        assert index.latest_logfile() == folder / "chat.log"
+        index.close()
+
+    def test_missing_logs_directory(self, tmp_path):
+        """Test that a missing logs folder yields None."""
+        from main import SessionFolderIndex
+
+        index = SessionFolderIndex(tmp_path / "missing", refresh_interval=0)
+        assert index.latest_logfile() is None
+        index.close()
+
+
+def _headless_watcher(**attributes):
+    """Create a TranslatedFileWatcher without running its Tk constructor."""
+    app = TranslatedFileWatcher.__new__(TranslatedFileWatcher)
+    app.__dict__.update(attributes)
+    return app
+
+
+class TestChatQueue:
+    """Test batched chat view updates on the Tk main loop."""
+
+    def _make_app(self, **settings):
+        import queue
+        from collections import OrderedDict
+        from main import PipelineMetrics
+
+        text_area = Mock()
+        text_area.index.return_value = "10.0"
+        return _headless_watcher(
+            chat_queue=queue.SimpleQueue(),
+            _repeat_marks=OrderedDict(),
+            text_area_tab1=text_area,
+            metrics=PipelineMetrics(),
+            settings=settings,
+            stop_flag=False,
+            after=Mock(),
+            logger=Mock(),
+        )
+
+    def test_insert_only_queues(self):
+        """Test that worker threads never touch the text widget directly."""
+        app = self._make_app()
+        app._insert_message_tab1("hello", "original")
+        app.text_area_tab1.insert.assert_not_called()
+        assert app.chat_queue.get_nowait() == ("hello\n", "original")
+
+    def test_drain_uses_one_unlock_cycle(self):
+        """Test that all pending lines are inserted with a single unlock/scroll/lock."""
+        app = self._make_app()
+        for i in range(30):
+            app._insert_message_tab1(f"line {i}", "original")
+        app._drain_chat_queue()
+
+        text_area = app.text_area_tab1
+        assert text_area.insert.call_count == 30
+        assert text_area.see.call_count == 1
+        assert text_area.configure.call_count == 2
+        app.after.assert_called_once_with(50, app._drain_chat_queue)
+
+    def test_frame_budget_defers_backlog(self):
+        """Test that an exhausted frame budget leaves the rest for the next tick."""
+        app = self._make_app(ui_frame_budget_ms=0)
+        for i in range(5):
+            app._insert_message_tab1(f"line {i}")
+        app._drain_chat_queue()
+
+        assert app.text_area_tab1.insert.call_count == 1
+        assert not app.chat_queue.empty()
+        app.after.assert_called_once_with(1, app._drain_chat_queue)
+
+    def test_repost_updates_counter_of_first_copy(self):
+        """Test that a repost only rewrites the "×N" counter while its first copy is still shown."""
+        from unittest.mock import call
+        from main import ChatRepeat
+
+        app = self._make_app()
+        lines = ((">   'WTS'\n", "original"), ("→ WTS\n\n", "translated_en"))
+        header = "[2025-10-12 20:00:00] [Trading] [Trader]:"
+        app.chat_queue.put(ChatRepeat(7, header, "Trading", 1, lines))
+        app._drain_chat_queue()
+        text_area = app.text_area_tab1
+        assert text_area.insert.call_args_list == [
+            call("end", header, "Trading"), call("end", "\n"), call("end", *lines[0]), call("end", *lines[1]),
+        ]
+        text_area.mark_set.assert_called_once_with("repeat_7", "end-1c")
+
+        text_area.reset_mock()
+        text_area.get.return_value = header
+        app.chat_queue.put(ChatRepeat(7, "[2025-10-12 20:01:00] [Trading] [Trader]:", "Trading", 3, lines))
+        app._drain_chat_queue()
+        text_area.get.assert_called_once_with("repeat_7 linestart", "repeat_7")
+        text_area.delete.assert_called_once_with("repeat_7", "repeat_7 lineend")
+        text_area.insert.assert_called_once_with("repeat_7", "  ×3", "repeat_count")
+
+    def test_edited_repost_is_shown_in_full(self):
+        """Test that a near-duplicate with new wording is not hidden behind the counter."""
+        from main import ChatRepeat
+
+        app = self._make_app()
+        header = "[2025-10-12 20:00:00] [Trading] [Trader]:"
+        app._repeat_marks["repeat_7"] = header
+        app.text_area_tab1.get.return_value = header
+        edited = "[2025-10-12 20:01:00] [Trading] [Trader]:"
+        app.chat_queue.put(ChatRepeat(7, edited, "Trading", 2, ((">   'WTS 500000'\n", "original"),), exact=False))
+        app._drain_chat_queue()
+
+        inserted = [c.args for c in app.text_area_tab1.insert.call_args_list]
+        assert inserted[:2] == [("end", edited, "Trading"), ("end", "  ×2", "repeat_count")]
+        assert app._repeat_marks["repeat_7"] == edited  # later exact copies count on the edit
+
+    def test_repost_of_trimmed_message_is_shown_again(self):
+        """Test that a repost whose first copy left the view is inserted in full with its count."""
+        from main import ChatRepeat
+
+        app = self._make_app()
+        app._repeat_marks["repeat_7"] = "[2025-10-12 20:00:00] [Trading] [Trader]:"
+        app.text_area_tab1.get.return_value = "> Older messages were removed"
+        header = "[2025-10-12 20:30:00] [Trading] [Trader]:"
+        app.chat_queue.put(ChatRepeat(7, header, "Trading", 4, ((">   'WTS'\n", "original"),)))
+        app._drain_chat_queue()
+
+        inserted = [c.args for c in app.text_area_tab1.insert.call_args_list]
+        assert inserted[:3] == [("end", header, "Trading"), ("end", "  ×4", "repeat_count"), ("end", "\n")]
+        assert app._repeat_marks["repeat_7"] == header
+
+    def test_failing_insert_does_not_stop_the_drain(self):
+        """Test that a widget error skips one line, keeps the rest and reschedules the next tick."""
+        import tkinter as tk
+
+        app = self._make_app()
+        app.text_area_tab1.insert.side_effect = [tk.TclError("bad index"), None, None]
+        for i in range(3):
+            app._insert_message_tab1(f"line {i}")
+        app._drain_chat_queue()
+
+        assert app.text_area_tab1.insert.call_count == 3
+        app.logger.error.assert_called_once()
+        app.after.assert_called_once_with(50, app._drain_chat_queue)
+
+    def test_widget_error_still_reschedules(self):
+        """Test that an error outside the per-line inserts cannot end the drain loop."""
+        import tkinter as tk
+
+        app = self._make_app()
+        app.text_area_tab1.see.side_effect = tk.TclError("invalid command name")
+        app._insert_message_tab1("line")
+        app._drain_chat_queue()
+
+        app.logger.error.assert_called_once()
+        app.after.assert_called_once_with(50, app._drain_chat_queue)
+
+    def test_idle_tick_does_not_touch_widget(self):
+        """Test that an empty queue causes no widget work."""
+        app = self._make_app()
+        app._drain_chat_queue()
+        app.text_area_tab1.configure.assert_not_called()
+
+
+class TestStartup:
+    """Test that startup network work is applied without blocking the window."""
+
+    def _make_app(self, **settings):
+        import concurrent.futures
+        from main import DEFAULT_SETTINGS
+
+        pipeline = Mock()
+        pipeline.game_dictionary = {"tornado": "Tornado ship"}
+        pipeline.target_lang = "de"
+        return _headless_watcher(
+            settings=dict(DEFAULT_SETTINGS, **{"welcome_counter": 0, **settings}),
+            logger=Mock(),
+            pipeline=pipeline,
+            stop_flag=False,
+            after=Mock(),
+            _save_settings=Mock(),
+            _safe_translate=Mock(side_effect=lambda text, dest: f"{dest}:{text}" if text else text),
+            startup_executor=concurrent.futures.ThreadPoolExecutor(max_workers=1),
+            text_area_tab1=Mock(),
+            manual_entry=Mock(),
+        )
+
+    def test_remote_welcome_applied_without_fetch_or_save(self):
+        """Test that fetched welcome data updates settings; saving is left to the caller."""
+        app = self._make_app(remote_welcome_id="1", welcome_counter=7)
+        data = [{"id": "2", "welcome_message": "Hello pilots", "version": "99.0.0"}]
+
+        assert app._check_remote_welcome(data) is True
+        assert app.settings["remote_welcome_message"] == "Hello pilots"
+        assert app.settings["welcome_counter"] == 0
+        assert app.settings["show_extended_welcome"] is True
+        assert app.settings["last_notified_version"] == "99.0.0"
+        app._save_settings.assert_not_called()
+
+    def test_version_update_costs_no_extra_translation(self):
+        """Test that a new version is announced by the extended welcome only, without a separate translate call."""
+        app = self._make_app(remote_welcome_id="1")
+        app._check_remote_welcome([{"id": "2", "welcome_message": "Hello pilots", "version": "99.0.0",
+                                    "whats_new": {"changes": ["Faster chat"]}}])
+        lines, _ = app._build_startup_messages("extended", "de")
+
+        translated = [c.args[0] for c in app._safe_translate.call_args_list]
+        assert not any("A new version" in text for text in translated)
+        assert any("Faster chat" in text for text, _ in lines)
+
+    def test_offline_start_saves_once(self):
+        """Test that a failed fetch still counts the welcome with a single save and records no fetch time."""
+        app = self._make_app()
+        app._apply_startup_data({"welcome": None, "dictionary": {}})
+
+        assert app.settings["welcome_counter"] == 1
+        assert "last_remote_fetch" not in app.settings  # the remote cache tracks fetch times
+        app._save_settings.assert_called_once()
+        app.startup_executor.shutdown()
+
+    def test_remote_dictionary_merged_into_pipeline(self):
+        """Test that remote entries are added without overriding local ones."""
+        app = self._make_app()
+        app._apply_startup_data({"welcome": None, "dictionary": {"TORNADO": "x", "jericho": "Jericho"}})
+
+        assert app.pipeline.game_dictionary == {"tornado": "Tornado ship", "jericho": "Jericho"}
+        app.startup_executor.shutdown()
+
+    def test_startup_messages_are_translated_in_order(self):
+        """Test the welcome block built on the startup thread."""
+        from main import MANUAL_TRANSLATE_PROMPT
+
+        app = self._make_app(remote_welcome_message="Hello pilots")
+        lines, hint = app._build_startup_messages("normal", "de")
+
+        assert [tag for _, tag in lines] == ["hardcoded_welcome", "welcome_tag", "hardcoded_tip", "hardcoded_tip"]
+        assert lines[1][0] == "> de:Hello pilots\n"
+        assert hint == f"de:{MANUAL_TRANSLATE_PROMPT}"
+        app.startup_executor.shutdown()
+
+    def test_welcome_block_goes_above_chat(self):
+        """Test that late welcome lines are inserted at the top, in order."""
+        app = self._make_app()
+        app._show_startup_messages(([("first\n", "a"), ("second\n", "b")], "hint"))
+
+        inserts = app.text_area_tab1.insert.call_args_list
+        assert [c.args for c in inserts] == [("1.0", "second\n", "b"), ("1.0", "first\n", "a")]
+        app.manual_entry.configure.assert_called_once_with(placeholder_text="hint")
+        app.startup_executor.shutdown()
+
+
+class TestRemoteJsonCache:
+    """Test conditional, gzip-aware caching of the remote JSON documents."""
+
+    @pytest.fixture
+    def server(self):
+        import gzip
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        state = {"doc": {"id": "1"}, "etag": '"v1"', "requests": [], "fail": False}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                state["requests"].append(dict(self.headers))
+                if state["fail"]:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                if self.headers.get("If-None-Match") == state["etag"]:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = json.dumps(state["doc"]).encode("utf-8")
+                gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+                if gzipped:
+                    body = gzip.compress(body)
+                self.send_response(200)
+                self.send_header("ETag", state["etag"])
+                if gzipped:
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        state["url"] = f"http://127.0.0.1:{httpd.server_address[1]}/welcome.json"
+        yield state
+        httpd.shutdown()
+        httpd.server_close()
+
+    def test_fresh_copy_served_without_request(self, server, tmp_path):
+        """Test that a second get within max_age does not touch the network."""
+        from main import RemoteJsonCache
+
+        cache = RemoteJsonCache(str(tmp_path))
+        assert cache.get(server["url"], max_age=3600) == {"id": "1"}
+        assert cache.get(server["url"], max_age=3600) == {"id": "1"}
+        assert len(server["requests"]) == 1
+        assert "gzip" in server["requests"][0]["Accept-Encoding"]
+
+    def test_conditional_request_and_304(self, server, tmp_path):
+        """Test that revalidation sends the ETag and keeps the copy on 304."""
+        from main import RemoteJsonCache
+
+        RemoteJsonCache(str(tmp_path)).get(server["url"])
+        cache = RemoteJsonCache(str(tmp_path))  # new instance: entry comes from disk
+        assert cache.get(server["url"], max_age=0, background=False) == {"id": "1"}
+        assert server["requests"][-1]["If-None-Match"] == '"v1"'
+        assert cache.not_modified == 1
+
+        server["doc"], server["etag"] = {"id": "2"}, '"v2"'
+        assert cache.get(server["url"], max_age=0, background=False) == {"id": "2"}
+
+    def test_stale_copy_served_while_revalidating(self, server, tmp_path):
+        """Test stale-while-revalidate: the old copy returns at once, the refresh lands later."""
+        import time
+        from main import RemoteJsonCache
+
+        cache = RemoteJsonCache(str(tmp_path))
+        cache.get(server["url"])
+        server["doc"], server["etag"] = {"id": "2"}, '"v2"'
+
+        assert cache.get(server["url"], max_age=0) == {"id": "1"}
+        deadline = time.monotonic() + 5
+        while cache.get(server["url"], max_age=3600) != {"id": "2"} and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert cache.get(server["url"], max_age=3600) == {"id": "2"}
+
+    def test_error_keeps_last_copy(self, server, tmp_path):
+        """Test that a failing server falls back to the cached document."""
+        from main import RemoteJsonCache
+
+        cache = RemoteJsonCache(str(tmp_path), logger=Mock())
+        cache.get(server["url"])
+        server["fail"] = True
+        assert cache.get(server["url"], max_age=0, background=False) == {"id": "1"}
+        assert cache.errors == 1
+        assert RemoteJsonCache(str(tmp_path / "empty")).get("http://127.0.0.1:9/none.json", timeout=0.5) is None
+
+
+class TestChatBufferTrimming:
+    """Test the bounded live chat buffer."""
+
+    def test_lines_to_trim(self):
+        """Test the trim hysteresis."""
+        from main import chat_lines_to_trim
+
+        assert chat_lines_to_trim(100, 5000, 500) == 0
+        assert chat_lines_to_trim(5000, 5000, 500) == 0
+        assert chat_lines_to_trim(5001, 5000, 500) == 501
+        assert chat_lines_to_trim(10**6, 0, 500) == 0
+
+    def test_trim_cuts_at_block_boundary(self):
+        """Test that the cut is extended to the next blank line and a notice is added."""
+        from main import CHAT_TRIM_NOTICE, trim_chat_buffer
+
+        text = Mock()
+        text.index.return_value = "5001.0"
+        text.search.return_value = "503.0"
+        assert trim_chat_buffer(text, 5000, 500) == 503
+        text.search.assert_called_once_with(r"^$", "501.0", stopindex="end-1c", regexp=True)
+        text.delete.assert_called_once_with("1.0", "504.0")
+        text.insert.assert_called_once_with("1.0", CHAT_TRIM_NOTICE, "trim_notice")
+
+    def test_no_trim_below_limit(self):
+        """Test that nothing is deleted under the limit."""
+        from main import trim_chat_buffer
+
+        text = Mock()
+        text.index.return_value = "42.0"
+        assert trim_chat_buffer(text, 5000, 500) == 0
+        text.delete.assert_not_called()
+
+
+class TestPipelineMetrics:
+    """Test the latency histograms and metric windows."""
+
+    def test_histogram_percentiles_are_bucket_bounds(self):
+        """Test that percentiles stay within one bucket of the true value and below the max."""
+        from main import LatencyHistogram
+
+        histogram = LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.record(ms / 1000)
+
+        assert histogram.count == 100
+        assert 0.050 <= histogram.percentile(50) <= 0.050 * 2 ** 0.5
+        assert 0.095 <= histogram.percentile(95) <= 0.100
+        assert histogram.percentile(100) == histogram.max == 0.1
+        assert LatencyHistogram().percentile(50) is None
+
+    def test_histogram_overflow_bucket(self):
+        """Test that durations beyond the last bound report the maximum seen."""
+        from main import LatencyHistogram
+
+        histogram = LatencyHistogram()
+        histogram.record(1000.0)
+        assert histogram.percentile(99) == 1000.0
+
+    def test_roll_closes_window_and_keeps_totals(self):
+        """Test that roll() reports only the window while snapshot() keeps totals."""
+        from main import PipelineMetrics
+
+        metrics = PipelineMetrics()
+        metrics.observe("translate", 0.2)
+        metrics.count("lines", 5)
+        first = metrics.roll()
+        metrics.observe("translate", 0.4)
+        metrics.count("lines")
+
+        assert first["stages"]["translate"]["count"] == 1
+        assert first["counters"]["lines"] == 5
+        second = metrics.roll()
+        assert second["stages"]["translate"]["count"] == 1
+        assert second["counters"]["lines"] == 1
+        totals = metrics.snapshot()
+        assert totals["stages"]["translate"]["count"] == 2
+        assert totals["stages"]["translate"]["max_ms"] == 400.0
+        assert totals["counters"]["lines"] == 6
+        assert totals["stages"]["parse"] == {"count": 0}
+
+    def test_report_line(self):
+        """Test the App Log summary lists counters and only stages with samples."""
+        from main import PipelineMetrics, format_metrics_report
+
+        metrics = PipelineMetrics()
+        metrics.observe("db_commit", 0.004)
+        metrics.count("translation_errors", 2)
+        line = format_metrics_report(metrics.snapshot(), "since start")
+
+        assert line.startswith("Pipeline stats (since start, ")
+        assert "errors 2" in line
+        assert "db_commit p50" in line
+        assert "translate p50" not in line
+
+
+class TestChatPipeline:
+    """Test the GUI-free chat pipeline."""
+
+    TRADING_LINE = "19:42:17.411  CHAT| <  #trading>[ PlayerOne]WTS tornado cheap\n"
+    SYSTEM_LINE = "19:42:19.877  CHAT| Join channel <#general_ENGLISH>\n"
+    ENGLISH_LINE = "19:42:20.114  CHAT| <  #general_ENGLISH>[ Pilot]where can i buy the best modules for my interceptor\n"
+    RUSSIAN_LINE = "19:42:21.500  CHAT| <  #general_RUSSIAN>[ Ivan]продам торнадо дешево\n"
+    GERMAN_LINE = "19:42:22.300  CHAT| <  #general_GERMAN>[ Hans]ich brauche hilfe mit dem schiff\n"
+
+    def _make_pipeline(self, tmp_path):
+        from unittest.mock import MagicMock
+        from main import ChatPipeline, DEFAULT_SETTINGS, TranslationService
+
+        def factory():
+            translator = MagicMock()
+            translator.translate.side_effect = lambda text, dest: MagicMock(text=f"{dest}:{text}")
+            return translator
+
+        settings = dict(DEFAULT_SETTINGS, game_logs_path=str(tmp_path / "logs"), translation_cache_max_entries=0)
+        delivered = []
+        pipeline = ChatPipeline(
+            settings,
+            str(tmp_path / "chat_history.db"),
+            str(tmp_path / "translation_cache.db"),
+            {"tornado": "Tornado ship"},
+            Mock(),
+            on_message=delivered.append,
+            translation_service=TranslationService(translator_factory=factory),
+        )
+        return pipeline, delivered
+
+    @staticmethod
+    def _stored_rows(tmp_path):
+        import sqlite3
+
+        conn = sqlite3.connect(str(tmp_path / "chat_history.db"))
+        rows = conn.execute("SELECT category, username, message, translated, lang FROM messages").fetchall()
+        conn.close()
+        return rows
+
+    @staticmethod
+    def _stored_src_langs(tmp_path):
+        import sqlite3
+
+        conn = sqlite3.connect(str(tmp_path / "chat_history.db"))
+        rows = conn.execute("SELECT src_lang FROM messages ORDER BY id").fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def test_line_is_translated_stored_and_delivered(self, tmp_path):
+        """Test that a kept line reaches on_message and the DB; system lines are dropped."""
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        pipeline.process_chat_line(self.TRADING_LINE)
+        pipeline.process_chat_line(self.SYSTEM_LINE)
+        pipeline.close()
+
+        assert [m["translated"] for m in delivered] == ["en:WTS Tornado ship cheap"]
+        assert delivered[0]["header_line"].endswith("[Trading] [PlayerOne]:")
+        assert self._stored_rows(tmp_path) == [
+            ("Trading", "PlayerOne", "WTS tornado cheap", "en:WTS Tornado ship cheap", "en")
+        ]
+
+    def test_target_language_line_skips_translator(self, tmp_path):
+        """Test that a line already in the target language is not sent to the translator."""
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        pipeline.process_chat_line(self.ENGLISH_LINE)
+        pipeline.close()
+
+        assert delivered[0]["translated"] == "where can i buy the best modules for my interceptor"
+        assert delivered[0]["detected_lang"] == "en"
+        counters = pipeline.metrics.snapshot()["counters"]
+        assert counters["language_skipped"] == 1
+        assert counters["translated"] == 0
+
+    def test_language_skip_can_be_disabled(self, tmp_path):
+        """Test the skip_target_language setting."""
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        pipeline.skip_target_language = False
+        pipeline.process_chat_line(self.ENGLISH_LINE)
+        pipeline.close()
+
+        assert delivered[0]["translated"] == "en:where can i buy the best modules for my interceptor"
+
+    def test_channel_and_sender_hint_source_language(self, tmp_path):
+        """Test that translate calls carry the channel's, then the sender's learned, language."""
+        import time
+        from unittest.mock import MagicMock
+
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        translator = pipeline.translation_service._get_translator()
+        translator.translate.side_effect = lambda text, dest, src="auto": MagicMock(text=f"{src}>{dest}:{text}")
+        pipeline.repeat_detector = None  # the same German line is sent on purpose
+        pipeline.process_chat_line(self.RUSSIAN_LINE)
+        for _ in range(3):
+            pipeline.process_chat_line(self.GERMAN_LINE.replace("#general_GERMAN", "#general_ENGLISH"))
+        deadline = time.monotonic() + 5
+        while len(delivered) < 4 and time.monotonic() < deadline:  # let the profile learn all three
+            time.sleep(0.01)
+        pipeline.process_chat_line(self.GERMAN_LINE.replace("#general_GERMAN", "#trading"))
+        pipeline.close()
+
+        assert [m["src"] for m in delivered] == ["ru", "auto", "auto", "auto", "de"]
+        assert delivered[0]["translated"].startswith("ru>en:")
+        counters = pipeline.metrics.snapshot()["counters"]
+        assert (counters["hint_channel"], counters["hint_user"], counters["hint_none"]) == (1, 1, 3)
+        assert self._stored_src_langs(tmp_path) == ["ru", "de", "de", "de", "de"]
+
+    def test_only_confident_lines_share_auto_detected_requests(self, tmp_path):
+        """Test that unhinted lines are batched by a confident local guess and sent alone without one."""
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        batcher = pipeline.translation_batcher
+        batcher.translate = Mock(side_effect=lambda text, dest, src="auto", key=None: f"batched:{text}")
+        pipeline.process_chat_line(self.GERMAN_LINE.replace("#general_GERMAN", "#trading"))  # confident "de"
+        pipeline.process_chat_line(self.TRADING_LINE)  # weak guess
+        pipeline.process_chat_line(self.RUSSIAN_LINE)  # channel hint
+        pipeline.close()
+
+        assert [c.kwargs["key"] for c in batcher.translate.call_args_list] == ["de", ""]
+        assert delivered[1]["translated"] == "en:WTS Tornado ship cheap"  # its own request
+        assert pipeline.metrics.snapshot()["counters"]["translation_requests"] == 1
+
+    def test_unbatched_lines_use_at_most_translation_workers_backend_calls(self, tmp_path):
+        """Test that lines sent on their own do not use the extra batch-wait pool threads."""
+        import threading
+        import time
+
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        pipeline.repeat_detector = None
+        lock, active, peak = threading.Lock(), [0], [0]
+
+        def backend(text, dest, src="auto"):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return f"{dest}:{text}"
+
+        pipeline._backend_translate = backend
+        for i in range(12):
+            pipeline.process_chat_line(self.TRADING_LINE.replace("cheap", f"cheap {i}"))
+        pipeline.close()
+
+        assert len(delivered) == 12
+        assert pipeline.metrics.snapshot()["counters"]["translation_requests"] == 12
+        assert peak[0] == 4  # translation_workers, not the whole pool
+
+    def test_translations_are_cached_per_source_language(self, tmp_path):
+        """Test that hinted repeats hit the cache but a hinted result never answers an auto-detected lookup."""
+        from unittest.mock import MagicMock
+        from main import TranslationCache
+
+        pipeline, _ = self._make_pipeline(tmp_path)
+        pipeline.translation_cache.close()
+        pipeline.translation_cache = TranslationCache(str(tmp_path / "cache.db"))
+        translator = pipeline.translation_service._get_translator()
+        translator.translate.side_effect = lambda text, dest, src="auto": MagicMock(text=f"{src}>{dest}:{text}")
+
+        assert pipeline.translate("gift", "en", src="de") == "de>en:gift"
+        assert pipeline.translate("gift", "en") == "auto>en:gift"  # not answered by the hinted entry
+        assert pipeline.translate("gift", "en", src="de") == "de>en:gift"  # hinted repeat: cache hit
+        assert pipeline.translate("gift", "en", src="sv") == "sv>en:gift"
+        assert translator.translate.call_count == 3
+        assert pipeline.metrics.snapshot()["counters"]["cache_hits"] == 1
+        pipeline.close()
+
+    def test_source_hints_can_be_disabled(self, tmp_path):
+        """Test the source_language_hints setting."""
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        pipeline.source_language_hints = False
+        pipeline.process_chat_line(self.RUSSIAN_LINE)
+        pipeline.close()
+
+        assert delivered[0]["src"] == "auto"
+        assert pipeline.metrics.snapshot()["counters"]["hint_none"] == 0
+
+    def test_reposts_reuse_translation(self, tmp_path):
+        """Test that a repost is counted, stored and translated with the first copy's translation."""
+        import time
+
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        translator = pipeline.translation_service._get_translator()
+        pipeline.process_chat_line(self.TRADING_LINE)
+        deadline = time.monotonic() + 5
+        while not delivered and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pipeline.process_chat_line(self.TRADING_LINE.replace("cheap", "cheap!!"))
+        pipeline.close()
+
+        assert [m["repeat_count"] for m in delivered] == [1, 2]
+        assert delivered[0]["repeat_id"] == delivered[1]["repeat_id"]
+        assert delivered[1]["translated"] == delivered[0]["translated"]
+        assert translator.translate.call_count == 1
+        assert len(self._stored_rows(tmp_path)) == 2
+        counters = pipeline.metrics.snapshot()["counters"]
+        assert (counters["repeats"], counters["repeat_translations_reused"]) == (1, 1)
+
+    def test_edited_repost_is_translated_again(self, tmp_path):
+        """Test that a near-duplicate with new wording gets its own translation, stored with its own text."""
+        import time
+
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        translator = pipeline.translation_service._get_translator()
+        first = self.TRADING_LINE.replace("cheap", "cheap 900000 credits, pm me now")
+        for i, line in enumerate((first, first.replace("900000", "500000"), first.replace("900000", "500000"))):
+            pipeline.process_chat_line(line)
+            deadline = time.monotonic() + 5
+            while len(delivered) <= i and time.monotonic() < deadline:
+                time.sleep(0.01)
+        pipeline.close()
+
+        assert [(m["repeat_count"], m["repeat_exact"]) for m in delivered] == [(1, False), (2, False), (3, True)]
+        assert "500000" in delivered[1]["translated"]
+        assert delivered[2]["translated"] == delivered[1]["translated"]  # same wording: reused
+        assert translator.translate.call_count == 2
+        assert [row[3] for row in self._stored_rows(tmp_path)][1].count("500000") == 1
+
+    def test_repost_after_target_language_switch_is_translated_again(self, tmp_path):
+        """Test that a translation (or language skip) is reused only for the target language it was made for."""
+        import time
+
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        translator = pipeline.translation_service._get_translator()
+        english = self.ENGLISH_LINE.replace("#general_ENGLISH", "#trading")
+        for i, target in enumerate(("en", "de", "de")):
+            pipeline.target_lang = target
+            pipeline.process_chat_line(english)
+            deadline = time.monotonic() + 5
+            while len(delivered) <= i and time.monotonic() < deadline:
+                time.sleep(0.01)
+        pipeline.close()
+
+        assert [m["repeat_count"] for m in delivered] == [1, 2, 3]
+        assert delivered[0]["translated"] == "where can i buy the best modules for my interceptor"  # skipped
+        assert delivered[1]["translated"] == "de:where can i buy the best modules for my interceptor"
+        assert delivered[2]["translated"] == delivered[1]["translated"]  # reused
+        assert translator.translate.call_count == 1
+        assert [row[4] for row in self._stored_rows(tmp_path)] == ["en", "de", "de"]
+
+    def test_reused_repost_keeps_source_language(self, tmp_path):
+        """Test that a repost stored with a reused translation carries the first copy's src_lang."""
+        import time
+
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        german = self.GERMAN_LINE.replace("#general_GERMAN", "#trading")
+        pipeline.process_chat_line(german)
+        deadline = time.monotonic() + 5
+        while not delivered and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pipeline.process_chat_line(german)
+        pipeline.close()
+
+        assert pipeline.metrics.snapshot()["counters"]["repeat_translations_reused"] == 1
+        assert self._stored_src_langs(tmp_path) == ["de", "de"]
+
+    def test_exact_reposts_can_be_left_out_of_history(self, tmp_path):
+        """Test the store_exact_repeats setting."""
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        pipeline.store_exact_repeats = False
+        for _ in range(3):
+            pipeline.process_chat_line(self.TRADING_LINE)
+        pipeline.process_chat_line(self.TRADING_LINE.replace("cheap", "cheap!!"))  # same once normalized
+        pipeline.process_chat_line(self.TRADING_LINE.replace("cheap", "cheap 2"))
+        pipeline.close()
+
+        assert [m["repeat_count"] for m in delivered] == [1, 2, 3, 4, 5]
+        assert len(self._stored_rows(tmp_path)) == 2
+        assert pipeline.metrics.snapshot()["counters"]["repeats_not_stored"] == 3
+
+    def test_private_messages_are_not_collapsed(self, tmp_path):
+        """Test that only trading and public language channels are checked for reposts."""
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        line = "19:42:23.000  CHAT| <  PRIVATE From>[ Friend]are you online\n"
+        pipeline.process_chat_line(line)
+        pipeline.process_chat_line(line)
+        pipeline.close()
+
+        assert [m.get("repeat_count") for m in delivered] == [None, None]
+
+    def test_throttled_backend_shows_original_text(self, tmp_path):
+        """Test that once a 429 pauses translation, lines are delivered untranslated without calling the backend."""
+        import time
+
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        translator = pipeline.translation_service._get_translator()
+        translator.translate.side_effect = RuntimeError("429 Too Many Requests")
+        pipeline.process_chat_line(self.RUSSIAN_LINE)
+        deadline = time.monotonic() + 5
+        while not delivered and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pipeline.process_chat_line(self.GERMAN_LINE)
+        pipeline.process_chat_line(self.TRADING_LINE)
+        pipeline.close()
+
+        assert delivered[0]["translated"].startswith("[Translation error")
+        assert [m["translated"] for m in delivered[1:]] == ["ich brauche hilfe mit dem schiff", "WTS Tornado ship cheap"]
+        assert all(m["untranslated"] for m in delivered[1:])
+        assert translator.translate.call_count == 1
+        counters = pipeline.metrics.snapshot()["counters"]
+        assert (counters["throttled"], counters["untranslated"]) == (1, 2)
+        assert pipeline.backend_guard.status()["state"] == "open"
+        # History and CSV export can tell these rows from real translations
+        assert [row[3] for row in self._stored_rows(tmp_path)][1:] == [None, None]
+
+    def test_observer_receives_every_stage(self, tmp_path):
+        """Test that the stage observer is called for each pipeline stage of a kept line."""
+        from main import PIPELINE_STAGES
+
+        stages = []
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        pipeline.observer = lambda stage, seconds: stages.append((stage, seconds))
+        pipeline.db_writer.observer = pipeline.observer
+        pipeline.process_chat_line(self.TRADING_LINE)
+        pipeline.close()
+
+        # "read" is timed by the watcher thread, not by process_chat_line
+        assert {stage for stage, _ in stages} == set(PIPELINE_STAGES) - {"read"}
+        assert all(seconds >= 0 for _, seconds in stages)
+
+    def test_metrics_count_lines_and_time_stages(self, tmp_path):
+        """Test the built-in counters and histograms, and the App Log summary."""
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        pipeline.process_chat_line(self.TRADING_LINE)
+        pipeline.process_chat_line(self.TRADING_LINE)
+        pipeline.process_chat_line(self.SYSTEM_LINE)
+        pipeline.close()
+
+        report = pipeline.metrics.snapshot()
+        assert report["counters"]["lines"] == 3
+        assert report["counters"]["skipped"] == 1
+        assert report["counters"]["messages"] == 2
+        assert report["counters"]["translated"] == 2
+        assert report["stages"]["translate"]["count"] == 2
+        assert report["stages"]["db_commit"]["count"] >= 1
+        summary = pipeline.logger.info.call_args_list[-2].args[0]
+        assert summary.startswith("Pipeline stats (since start")
+        assert "lines 3 (skipped 1)" in summary
+
+    def test_follows_newest_chat_log(self, tmp_path):
+        """Test that the watcher thread picks up lines appended to the newest session's chat.log."""
+        import time
+
+        session = tmp_path / "logs" / "2025.10.12 20.00.00"
+        session.mkdir(parents=True)
+        chat_log = session / "chat.log"
+        chat_log.write_text(self.TRADING_LINE, encoding="utf-8")  # written before start: not replayed
+
+        pipeline, delivered = self._make_pipeline(tmp_path)
+        pipeline.start()
+        deadline = time.monotonic() + 5
+        while pipeline.current_logfile is None and time.monotonic() < deadline:
+            time.sleep(0.02)
+        with open(chat_log, "a", encoding="utf-8") as f:
+            f.write(self.TRADING_LINE.replace("PlayerOne", "PlayerTwo"))
+        while not delivered and time.monotonic() < deadline:
+            time.sleep(0.02)
+        pipeline.close()
+
+        assert [m["username"] for m in delivered] == ["PlayerTwo"]
+        assert delivered[0]["session_id"].endswith("2025.10.12 20.00.00")
+        assert pipeline.metrics.snapshot()["stages"]["read"]["count"] >= 1
+
+    def test_headless_output_is_json_lines(self):
+        """Test the JSON line written per message in headless mode."""
+        import io
+        import json
+        from main import HeadlessTranslator
+
+        headless = HeadlessTranslator.__new__(HeadlessTranslator)
+        headless.output = io.StringIO()
+        headless._write_message({
+            "timestamp": "2025-10-12 20:00:00", "category": "Russian", "username": "Ivan",
+            "message": "привет", "translated": "hello", "lang": "en", "session_id": "s1",
+            "header_line": "[2025-10-12 20:00:00] [Russian] [Ivan]:", "message_line": "привет",
+        })
+        record = json.loads(headless.output.getvalue())
+        assert record == {
+            "timestamp": "2025-10-12 20:00:00", "category": "Russian", "username": "Ivan",
+            "message": "привет", "translated": "hello", "lang": "en", "session_id": "s1",
+        }
+        assert "привет" in headless.output.getvalue()  # not \u-escaped
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
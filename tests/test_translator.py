@@ -4,6 +4,7 @@ Unit tests for translation functionality.
 import pytest
 import sys
 import os
+import time
 from unittest.mock import Mock, patch, MagicMock
 
 # Add src to path for testing
@@ -131,6 +132,312 @@ class TestTranslationFunctionality:
         assert result == "EN"  # fallback
 
 
+class TestGameDictionaryMatcher:
+    """Test the precompiled game dictionary matcher."""
+
+    def test_case_insensitive_replacement(self):
+        """Test that keys match regardless of case."""
+        from main import GameDictionaryMatcher
+
+        matcher = GameDictionaryMatcher({"xpam": "temple", "[Link 2 D: Ship_race3_m_t5_craftuniq]": "[Tornado]"})
+        assert matcher.apply("XPAM and [link 2 d: SHIP_RACE3_M_T5_CRAFTUNIQ]") == "temple and [Tornado]"
+
+    def test_longest_match_first(self):
+        """Test that the longest key wins when keys share a prefix."""
+        from main import GameDictionaryMatcher
+
+        matcher = GameDictionaryMatcher({"co": "C", "co+": "spec ops +", "cow": "W"})
+        assert matcher.apply("co+ co cow") == "spec ops + C W"
+
+    def test_single_pass(self):
+        """Test that replacement values are not substituted again."""
+        from main import GameDictionaryMatcher
+
+        matcher = GameDictionaryMatcher({"a": "b", "b": "c"})
+        assert matcher.apply("ab") == "bc"
+
+    def test_first_spelling_wins(self):
+        """Test that duplicate keys differing only by case keep the first value."""
+        from main import GameDictionaryMatcher
+
+        matcher = GameDictionaryMatcher({"co+": "first", "Co+": "second"})
+        assert len(matcher) == 1
+        assert matcher.apply("CO+") == "first"
+
+    def test_empty_dictionary(self):
+        """Test that an empty dictionary leaves text unchanged."""
+        from main import GameDictionaryMatcher
+
+        assert GameDictionaryMatcher({}).apply("hello") == "hello"
+
+
+class TestChatLineClassifier:
+    """Test the compiled chat line classifier."""
+
+    def test_trading_line(self):
+        """Test category, username and message extraction."""
+        from main import ChatLineClassifier
+
+        classifier = ChatLineClassifier()
+        line = "19:42:17.411  CHAT| <  #trading>[ PlayerOne]WTS Tornado\n"
+        assert classifier.classify(line) == ("Trading", False, "PlayerOne", "WTS Tornado")
+
+    def test_double_hash_polish_channel(self):
+        """Test that the '##general_POLISH>[' key is matched as-is."""
+        from main import ChatLineClassifier
+
+        classifier = ChatLineClassifier()
+        assert classifier.classify("<  ##general_POLISH>[ Kasia]siema\n")[0] == "Polish"
+        assert classifier.classify("<  #general_POLISH>[ Kasia]siema\n")[0] is None
+
+    def test_case_insensitive(self):
+        """Test that keys match regardless of case, like the old lowercase comparison."""
+        from main import ChatLineClassifier
+
+        classifier = ChatLineClassifier()
+        assert classifier.classify("#GENERAL_english>[x]hi")[0] == "English"
+        assert classifier.classify("private FROM [x] hi")[0] == "Priv_from"
+
+    def test_dictionary_order_priority(self):
+        """Test that the first CHAT_CATEGORIES key wins regardless of position."""
+        from main import ChatLineClassifier
+
+        classifier = ChatLineClassifier()
+        line = "#battle_123>[ Someone] check #trading>[ offer"
+        assert classifier.classify(line)[0] == "Trading"
+
+    def test_skip_patterns(self):
+        """Test that system lines are flagged for skipping."""
+        from main import ChatLineClassifier
+
+        classifier = ChatLineClassifier()
+        category, skip, username, message = classifier.classify("CHAT| Join channel <#trading>[x]")
+        assert category == "Trading"
+        assert skip is True
+        assert username is None and message is None
+
+    def test_substring_keys_keep_priority(self):
+        """Test that a key containing a higher-priority key reports that category."""
+        from main import ChatLineClassifier
+
+        classifier = ChatLineClassifier({"#clan_": "Clan", "#clan_war_": "ClanWar"}, [])
+        assert classifier.classify("#clan_war_1>[x]hi")[0] == "Clan"
+
+    def test_matches_legacy_implementation(self):
+        """Test equivalence with the previous categorize/parse code on sample lines."""
+        import re
+        from main import CHAT_CATEGORIES, SKIP_PATTERNS, ChatLineClassifier
+
+        def legacy(line):
+            category = next((c for k, c in CHAT_CATEGORIES.items() if k.lower() in line.lower()), None)
+            if not category or any(p.upper() in line.upper() for p in SKIP_PATTERNS):
+                return category, None, None
+            match = re.search(r"\[(.*?)\]", line)
+            parts = line.split("]", 1)
+            return (category, match.group(1).strip() if match else "NotThePlayer",
+                    parts[1].strip() if len(parts) > 1 else line.strip())
+
+        lines = [
+            "19:42:18.002  CHAT| <  #general_RUSSIAN>[ Ivan]всем привет\n",
+            "19:42:19.120  CHAT| <  #battle_1234567>[ Wingman]focus the beacon\n",
+            "19:42:19.877  CHAT| Join channel <#general_ENGLISH>\n",
+            "19:42:22.015  CHAT| PRIVATE From [ Trader]still selling?\n",
+            "19:42:22.015  CHAT| PRIVATE To Trader: yes\n",
+            "19:42:23.118  SYSTEM| Loading level 'map_042'\n",
+            "#squad_ no brackets at all",
+        ]
+        classifier = ChatLineClassifier()
+        for line in lines:
+            category, skip, username, message = classifier.classify(line)
+            assert (category, username, message) == legacy(line), line
+
+
+class TestLanguageIdentifier:
+    """Test the offline language guess used to skip same-language lines."""
+
+    @pytest.mark.parametrize("text, lang", [
+        ("where can i buy the best modules for my interceptor", "en"),
+        ("ich brauche hilfe mit dem schiff", "de"),
+        ("je ne sais pas comment faire", "fr"),
+        ("hola a todos", "es"),
+        ("non so come fare questa missione", "it"),
+        ("você tem uma nave boa", "pt"),
+        ("nie wiem jak to zrobić", "pl"),
+        ("çok güzel bir oyun", "tr"),
+        ("продам торнадо дешево", "ru"),
+        ("Продам [link 11 d:Relics_craft_part] недорого", "ru"),
+        ("有人想一起玩吗", "zh"),
+        ("誰か一緒に遊びませんか", "ja"),
+    ])
+    def test_identifies_chat_languages(self, text, lang):
+        """Test script detection and Latin trigram scoring on typical chat lines."""
+        from main import LanguageIdentifier
+
+        detected, confidence = LanguageIdentifier().identify(text)
+        assert detected == lang
+        assert confidence >= 0.5
+
+    def test_ambiguous_lines_have_low_confidence(self):
+        """Test that short or slang lines are not confidently assigned a language."""
+        from main import LanguageIdentifier
+
+        identifier = LanguageIdentifier()
+        assert identifier.identify("gg")[1] < 0.5
+        assert identifier.identify("WTS tornado cheap")[1] < 0.5
+        assert identifier.identify("12345 !!!") == (None, 0.0)
+
+    def test_mixed_script_uses_majority(self):
+        """Test that a few Latin letters in a Cyrillic line still count as Russian."""
+        from main import LanguageIdentifier
+
+        detected, confidence = LanguageIdentifier().identify("ok кто в пвп")
+        assert detected == "ru"
+        assert 0.5 < confidence < 1.0
+
+    def test_same_language_ignores_region(self):
+        """Test base-language comparison of language codes."""
+        from main import same_language
+
+        assert same_language("zh", "zh-cn")
+        assert same_language("en", "EN")
+        assert not same_language("es", "pt")
+        assert not same_language(None, "en")
+
+
+class TestSourceLanguageHints:
+    """Test channel- and sender-derived source languages for translate calls."""
+
+    def test_channel_supplies_default(self):
+        """Test that a language channel hints its own language and other channels give none."""
+        from main import SourceLanguageHints
+
+        hints = SourceLanguageHints()
+        assert hints.hint("Russian", "Ivan", "en") == ("ru", "channel")
+        assert hints.hint("Chinese", "Li", "en") == ("zh-cn", "channel")
+        assert hints.hint("Trading", "Ivan", "en") == ("auto", None)
+
+    def test_user_profile_overrides_channel(self):
+        """Test that a sender with a consistent history is hinted with their own language."""
+        from main import SourceLanguageHints
+
+        hints = SourceLanguageHints()
+        for _ in range(2):
+            hints.learn("Hans", "de")
+        assert hints.hint("English", "Hans", "ru") == ("en", "channel")  # too few messages yet
+        hints.learn("Hans", "de")
+        assert hints.profile("Hans") == "de"
+        assert hints.hint("English", "Hans", "ru") == ("de", "user")
+        assert hints.hint("Trading", "Hans", "ru") == ("de", "user")
+
+    def test_mixed_history_gives_no_profile(self):
+        """Test that a sender writing in several languages has no profile."""
+        from main import SourceLanguageHints
+
+        hints = SourceLanguageHints()
+        for lang in ("de", "en", "de", "en"):
+            hints.learn("Mix", lang)
+        assert hints.profile("Mix") is None
+
+    def test_no_hint_for_target_or_contradicted_language(self):
+        """Test that hints naming the target language or contradicting the line itself are dropped."""
+        from main import SourceLanguageHints
+
+        hints = SourceLanguageHints()
+        assert hints.hint("English", "Pilot", "en") == ("auto", None)
+        assert hints.hint("English", "Pilot", "de", detected="ru") == ("auto", None)
+        assert hints.hint("English", "Pilot", "de", detected="en") == ("en", "channel")
+        # Ukrainian is not identifiable locally, so a Cyrillic guess does not veto it
+        assert hints.hint("Ukrainian", "Taras", "en", detected="ru") == ("uk", "channel")
+
+    def test_profile_loaded_from_history(self, tmp_path):
+        """Test that profiles are built from stored src_lang, identifying rows stored without one."""
+        import sqlite3
+        from main import SourceLanguageHints, migrate_database
+
+        db_path = str(tmp_path / "chat_history.db")
+        conn = sqlite3.connect(db_path)
+        migrate_database(conn)
+        conn.executemany(
+            "INSERT INTO messages (timestamp, username, message, src_lang) VALUES (?, ?, ?, ?)",
+            [
+                ("2025-10-12 10:00:00", "Ivan", "продам торнадо дешево", None),
+                ("2025-10-12 10:00:01", "Ivan", "ok", ""),
+                ("2025-10-12 10:00:02", "Ivan", "кто в пвп", "ru"),
+                ("2025-10-12 10:00:03", "Ivan", "го в бой", "ru"),
+                ("2025-10-12 10:00:04", "Li", "你好", "zh"),
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+        hints = SourceLanguageHints(db_path)
+        try:
+            assert hints.profile("Ivan") == "ru"
+            assert hints.hint("English", "Ivan", "de") == ("ru", "user")
+            assert hints.profile("Li") is None  # one message is not a profile
+            assert hints.profile("Nobody") is None
+        finally:
+            hints.close()
+
+    def test_profiles_are_bounded(self):
+        """Test that the least recently seen senders are forgotten."""
+        from main import SourceLanguageHints
+
+        hints = SourceLanguageHints(max_users=2)
+        for name in ("a", "b", "c"):
+            hints.learn(name, "de")
+        assert list(hints._profiles) == ["b", "c"]
+
+
+class TestRepeatDetector:
+    """Test per-sender near-duplicate detection of reposted messages."""
+
+    def test_exact_and_near_repeats(self):
+        """Test that reposts with small changes are matched to the first copy."""
+        from main import RepeatDetector
+
+        detector = RepeatDetector()
+        first, exact = detector.check("Trader", "WTS [link 2 d:Ship_Race3_M_T5_CraftUniq] cheap, pm me #1", now=0)
+        assert (first.count, exact) == (1, False)
+        entry, exact = detector.check("Trader", "wts [link 2 d:Ship_Race3_M_T5_CraftUniq]  cheap pm me #1", now=60)
+        assert (entry, entry.count, exact) == (first, 2, True)
+        entry, exact = detector.check("Trader", "WTS [link 2 d:Ship_Race3_M_T5_CraftUniq] cheap, pm me #2", now=120)
+        assert (entry, entry.count, exact) == (first, 3, False)
+
+    def test_different_text_or_sender_is_new(self):
+        """Test that other messages, and the same text from another sender, are not repeats."""
+        from main import RepeatDetector
+
+        detector = RepeatDetector()
+        first, _ = detector.check("Trader", "WTS tornado cheap pm me", now=0)
+        other, _ = detector.check("Trader", "anyone for co+ tonight?", now=1)
+        copy, _ = detector.check("Buyer", "WTS tornado cheap pm me", now=2)
+        assert other is not first and copy is not first
+        assert (first.count, other.count, copy.count) == (1, 1, 1)
+
+    def test_window_expires(self):
+        """Test that a repost after the rolling window starts a new entry."""
+        from main import RepeatDetector
+
+        detector = RepeatDetector(window=600)
+        first, _ = detector.check("Trader", "WTS tornado cheap pm me", now=0)
+        again, _ = detector.check("Trader", "WTS tornado cheap pm me", now=500)
+        later, _ = detector.check("Trader", "WTS tornado cheap pm me", now=1200)
+        assert again is first
+        assert later is not first and later.count == 1
+
+    def test_drifting_ad_keeps_matching(self):
+        """Test that the entry follows the newest wording of a slowly changing ad."""
+        from main import RepeatDetector
+
+        detector = RepeatDetector()
+        first, _ = detector.check("Trader", "selling tornado and jericho ships cheap price 100", now=0)
+        for now, price in enumerate((110, 120, 130, 140), start=1):
+            entry, _ = detector.check("Trader", f"selling tornado and jericho ships cheap price {price}", now=now)
+            assert entry is first
+        assert first.count == 5
+
+
 class TestMessageProcessing:
     """Test message parsing and processing."""
 
@@ -190,5 +497,708 @@ class TestMessageProcessing:
         assert result is None
 
 
+class TestTranslationCache:
+    """Test the two-tier translation cache."""
+
+    def test_miss_then_hit(self, tmp_path):
+        """Test that a stored translation is served from memory."""
+        from main import TranslationCache
+
+        cache = TranslationCache(str(tmp_path / "cache.db"))
+        assert cache.get("Hello", "es") is None
+        cache.put("Hello", "es", "Hola")
+        assert cache.get("Hello", "es") == "Hola"
+        assert cache.get("Hello", "de") is None
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+        cache.close()
+
+    def test_normalized_key(self, tmp_path):
+        """Test that whitespace differences share one entry."""
+        from main import TranslationCache
+
+        cache = TranslationCache(str(tmp_path / "cache.db"))
+        cache.put("WTS  Tornado   cheap ", "en", "Selling Tornado cheap")
+        assert cache.get(" WTS Tornado cheap", "en") == "Selling Tornado cheap"
+        cache.close()
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """Test that translations persist in the SQLite tier."""
+        from main import TranslationCache
+
+        path = str(tmp_path / "cache.db")
+        cache = TranslationCache(path)
+        cache.put("Привет", "en", "Hello")
+        cache.close()
+
+        cache = TranslationCache(path)
+        assert cache.get("Привет", "en") == "Hello"
+        assert cache.stats()["disk_hits"] == 1
+        cache.close()
+
+    def test_memory_lru_eviction(self, tmp_path):
+        """Test that the memory tier keeps only the most recently used entries."""
+        from main import TranslationCache
+
+        cache = TranslationCache(str(tmp_path / "cache.db"), memory_entries=2, max_entries=0)
+        cache.put("a", "en", "A")
+        cache.put("b", "en", "B")
+        cache.get("a", "en")
+        cache.put("c", "en", "C")
+        assert cache.get("b", "en") is None
+        assert cache.get("a", "en") == "A"
+        assert cache.get("c", "en") == "C"
+        cache.close()
+
+    def test_ttl_expiry(self, tmp_path):
+        """Test that expired entries are treated as misses."""
+        from main import TranslationCache
+
+        cache = TranslationCache(str(tmp_path / "cache.db"), ttl=60)
+        with patch("main.time.time", return_value=1000.0):
+            cache.put("Hello", "es", "Hola")
+        with patch("main.time.time", return_value=1100.0):
+            assert cache.get("Hello", "es") is None
+        cache.close()
+
+    def test_entries_are_separate_per_source_language(self, tmp_path):
+        """Test that a hinted translation answers only lookups with the same hint."""
+        from main import TranslationCache
+
+        path = str(tmp_path / "cache.db")
+        cache = TranslationCache(path)
+        cache.put("gift", "en", "gift", src="en")
+        cache.put("gift", "en", "poison", src="de")
+        assert cache.get("gift", "en") is None
+        assert cache.get("gift", "en", src="de") == "poison"
+        cache.close()
+
+        cache = TranslationCache(path)
+        assert cache.get("gift", "en", src="en") == "gift"  # also from the disk tier
+        cache.close()
+
+    def test_old_cache_file_is_upgraded(self, tmp_path):
+        """Test that entries of a cache file without the src column are kept as auto-detected."""
+        import sqlite3
+        from main import TranslationCache
+
+        path = str(tmp_path / "cache.db")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE translation_cache (source TEXT NOT NULL, dest TEXT NOT NULL, translated TEXT NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (source, dest))"
+        )
+        now = time.time()
+        conn.execute("INSERT INTO translation_cache VALUES ('Привет', 'en', 'Hello', ?, ?)", (now, now))
+        conn.commit()
+        conn.close()
+
+        cache = TranslationCache(path)
+        assert cache.get("Привет", "en") == "Hello"
+        assert cache.get("Привет", "en", src="ru") is None
+        cache.close()
+
+    def test_disk_size_limit(self, tmp_path):
+        """Test that pruning keeps the disk tier under max_entries."""
+        from main import TranslationCache
+
+        cache = TranslationCache(str(tmp_path / "cache.db"), max_entries=3)
+        for i in range(10):
+            cache.put(f"text {i}", "en", f"TEXT {i}")
+        cache._prune()
+        assert cache.stats()["disk_entries"] == 3
+        cache.close()
+
+
+class TestTranslationService:
+    """Test the long-lived translation event loop."""
+
+    def test_sync_translator_reused(self):
+        """Test that one translator instance serves every request."""
+        from main import TranslationService
+
+        created = []
+
+        def factory():
+            translator = MagicMock()
+            translator.translate.side_effect = lambda text, dest: MagicMock(text=f"{dest}:{text}")
+            created.append(translator)
+            return translator
+
+        service = TranslationService(translator_factory=factory)
+        try:
+            assert service.translate("one", "es").text == "es:one"
+            assert service.translate("two", "de").text == "de:two"
+            assert len(created) == 1
+        finally:
+            service.close()
+
+    def test_async_translator_runs_on_service_loop(self):
+        """Test that coroutine-based translators run on the persistent loop thread."""
+        import threading
+        from main import TranslationService
+
+        loop_threads = set()
+
+        class AsyncTranslator:
+            async def translate(self, text, dest):
+                loop_threads.add(threading.current_thread().name)
+                return MagicMock(text=text.upper())
+
+        service = TranslationService(translator_factory=AsyncTranslator)
+        try:
+            for word in ("a", "b", "c"):
+                assert service.translate(word, "en").text == word.upper()
+            assert loop_threads == {"translation-loop"}
+        finally:
+            service.close()
+
+    def test_source_language_is_passed_when_known(self):
+        """Test that a src hint reaches the translator and auto-detection passes no src."""
+        from main import FakeTranslator, TranslationService
+
+        service = TranslationService(translator_factory=lambda: FakeTranslator(latency_ms=0))
+        try:
+            assert service.translate("привет", "en", src="ru").src == "ru"
+            assert service.translate("привет", "en").src == "auto"
+        finally:
+            service.close()
+
+    def test_translation_error_propagates(self):
+        """Test that translator failures reach the caller."""
+        from main import TranslationService
+
+        translator = MagicMock()
+        translator.translate.side_effect = Exception("Translation failed")
+        service = TranslationService(translator_factory=lambda: translator)
+        try:
+            with pytest.raises(Exception, match="Translation failed"):
+                service.translate("Hello", "es")
+        finally:
+            service.close()
+
+
+class TestFakeTranslator:
+    """Test the offline fake translation backend."""
+
+    def test_deterministic_output(self):
+        """Test that the translation is a pure function of text and target language."""
+        from main import FakeTranslator
+
+        translator = FakeTranslator(latency_ms=0)
+        result = translator.translate("привет", dest="de")
+        assert result.text == "[de] привет"
+        assert result.dest == "de"
+        assert translator.stats()["requests"] == 1
+
+    def test_error_and_throttle_rates(self):
+        """Test that a seeded backend fails and throttles the configured share of requests."""
+        from main import FakeTranslator, FakeTranslatorError, FakeTranslatorThrottled
+
+        translator = FakeTranslator(latency_ms=0, error_rate=0.2, throttle_rate=0.1, seed=7)
+        outcomes = {"ok": 0, "error": 0, "throttled": 0}
+        for index in range(2000):
+            try:
+                translator.translate(f"line {index}")
+                outcomes["ok"] += 1
+            except FakeTranslatorThrottled:
+                outcomes["throttled"] += 1
+            except FakeTranslatorError:
+                outcomes["error"] += 1
+
+        stats = translator.stats()
+        assert stats["errors"] == outcomes["error"]
+        assert stats["throttled"] == outcomes["throttled"]
+        assert 300 < outcomes["error"] < 500
+        assert 130 < outcomes["throttled"] < 270
+
+    def test_same_seed_same_failures(self):
+        """Test that two backends with the same seed fail on the same requests."""
+        from main import FakeTranslator, FakeTranslatorError
+
+        def failures(seed):
+            translator = FakeTranslator(latency_ms=0, error_rate=0.3, seed=seed)
+            failed = []
+            for index in range(100):
+                try:
+                    translator.translate("x")
+                except FakeTranslatorError:
+                    failed.append(index)
+            return failed
+
+        assert failures(3) == failures(3)
+        assert failures(3) != failures(4)
+
+    def test_rate_limit(self):
+        """Test that requests beyond rate_limit per second are throttled."""
+        from main import FakeTranslator, FakeTranslatorThrottled
+
+        translator = FakeTranslator(latency_ms=0, rate_limit=5)
+        for _ in range(5):
+            translator.translate("ok")
+        with pytest.raises(FakeTranslatorThrottled):
+            translator.translate("one too many")
+
+    def test_unknown_distribution(self):
+        """Test that a misspelled latency distribution is rejected."""
+        from main import FakeTranslator
+
+        with pytest.raises(ValueError):
+            FakeTranslator(latency_dist="gaussian")
+
+    def test_service_runs_workers_concurrently(self):
+        """Test that TranslationService overlaps up to max_concurrency blocking calls."""
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from main import FakeTranslator, TranslationService
+
+        translator = FakeTranslator(latency_ms=100, latency_dist="fixed")
+        service = TranslationService(translator_factory=lambda: translator, max_concurrency=8)
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda i: service.translate(f"m{i}", "en").text, range(8)))
+            elapsed = time.perf_counter() - start
+        finally:
+            service.close()
+
+        assert results == [f"[en] m{i}" for i in range(8)]
+        assert translator.stats()["max_in_flight"] == 8
+        assert elapsed < 0.5
+
+    def test_async_variant_through_service(self):
+        """Test that the coroutine variant runs on the service loop."""
+        from main import AsyncFakeTranslator, TranslationService
+
+        service = TranslationService(translator_factory=lambda: AsyncFakeTranslator(latency_ms=1))
+        try:
+            assert service.translate("hola", "en").text == "[en] hola"
+        finally:
+            service.close()
+
+    def test_factory_from_settings(self):
+        """Test translation_backend selection."""
+        from main import AsyncFakeTranslator, FakeTranslator, translator_factory_from_settings
+
+        assert translator_factory_from_settings({}) is None
+        assert translator_factory_from_settings({"translation_backend": "google"}) is None
+
+        factory = translator_factory_from_settings(
+            {"translation_backend": "fake", "fake_translator": {"latency_ms": 5, "error_rate": 0.5}}
+        )
+        translator = factory()
+        assert type(translator) is FakeTranslator
+        assert translator.latency == 0.005
+        assert translator.error_rate == 0.5
+
+        factory = translator_factory_from_settings({"translation_backend": "fake-async"})
+        assert type(factory()) is AsyncFakeTranslator
+
+        with pytest.raises(ValueError):
+            translator_factory_from_settings({"translation_backend": "deepl"})
+
+
+class TestTranslationBatcher:
+    """Test micro-batching of concurrent translate calls."""
+
+    @staticmethod
+    def _burst_behind_request(batcher, gate, texts):
+        """Translate `texts` concurrently while a first request ("hold") is kept in flight."""
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=len(texts) + 1) as pool:
+            held = pool.submit(batcher.translate, "hold", "en")
+            while batcher._in_flight == 0:
+                time.sleep(0.005)
+            results = [pool.submit(batcher.translate, text, "en") for text in texts]
+            threading.Timer(0.1, gate.set).start()
+            held.result()
+            return [future.result() for future in results]
+
+    def test_burst_is_coalesced(self):
+        """Test that lines arriving while a request is in flight share the next request."""
+        import threading
+        from main import TranslationBatcher
+
+        calls = []
+        gate = threading.Event()
+
+        def translate(text, dest, src):
+            calls.append(text)
+            if text == "hold":
+                gate.wait(2)
+            return "\n".join(f"{dest}:{line}" for line in text.split("\n"))
+
+        batcher = TranslationBatcher(translate, window=1.0, max_in_flight=1)
+        try:
+            results = self._burst_behind_request(batcher, gate, [f"m{i}" for i in range(10)])
+        finally:
+            batcher.close()
+
+        assert results == [f"en:m{i}" for i in range(10)]
+        assert len(calls) == 2
+        assert sorted(calls[1].split("\n")) == sorted(f"m{i}" for i in range(10))
+
+    def test_lone_line_is_sent_immediately(self):
+        """Test that an idle batcher does not hold a line for the batch window."""
+        import time
+        from main import TranslationBatcher
+
+        batcher = TranslationBatcher(lambda text, dest, src: text.upper(), window=5.0)
+        try:
+            started = time.monotonic()
+            assert batcher.translate("hello", "en") == "HELLO"
+            assert time.monotonic() - started < 1.0
+        finally:
+            batcher.close()
+
+    def test_mismatched_split_falls_back_to_single_requests(self):
+        """Test that a batch whose result has the wrong line count is re-sent line by line."""
+        import threading
+        from main import TranslationBatcher
+
+        counters = {}
+        gate = threading.Event()
+
+        def translate(text, dest, src):
+            if text == "hold":
+                gate.wait(2)
+            return text.replace("\n", " ").upper()  # a backend that merges lines
+
+        def count(name, n=1):
+            counters[name] = counters.get(name, 0) + n
+
+        batcher = TranslationBatcher(translate, window=1.0, max_in_flight=1, count=count)
+        try:
+            results = self._burst_behind_request(batcher, gate, ["a", "b", "c"])
+        finally:
+            batcher.close()
+
+        assert results == ["A", "B", "C"]
+        assert counters["batch_fallbacks"] == 1
+        assert counters["translation_requests"] == 5  # hold + the batch + three single retries
+        assert "batched" not in counters
+
+    def test_errors_reach_every_caller(self):
+        """Test that a failed batch request raises in each waiting caller."""
+        from main import TranslationBatcher
+
+        def translate(text, dest, src):
+            raise RuntimeError("backend down")
+
+        batcher = TranslationBatcher(translate)
+        try:
+            with pytest.raises(RuntimeError, match="backend down"):
+                batcher.translate("hello", "en")
+        finally:
+            batcher.close()
+
+    def test_keys_are_not_mixed(self):
+        """Test that lines for different target or source languages never share a request."""
+        from main import TranslationBatcher
+
+        calls = []
+        batcher = TranslationBatcher(lambda text, dest, src: calls.append((text, dest, src)) or text)
+        try:
+            batcher.translate("hola", "en", src="es")
+            batcher.translate("hallo", "en", src="de")
+            batcher.translate("hola", "fr", src="es")
+        finally:
+            batcher.close()
+        assert sorted(calls) == [("hallo", "en", "de"), ("hola", "en", "es"), ("hola", "fr", "es")]
+
+    def test_multiline_text_bypasses_batching(self):
+        """Test that text containing line breaks is always sent on its own."""
+        from main import TranslationBatcher
+
+        calls = []
+        batcher = TranslationBatcher(lambda text, dest, src: calls.append(text) or text)
+        try:
+            assert batcher.translate("one\ntwo", "en") == "one\ntwo"
+        finally:
+            batcher.close()
+        assert calls == ["one\ntwo"]
+
+
+class FakeClock:
+    """Manually advanced stand-in for time.monotonic."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """Test the adaptive client-side rate limiter."""
+
+    def test_burst_then_refuses(self):
+        """Test that a full bucket allows `burst` calls and then runs dry."""
+        from main import TokenBucket
+
+        bucket = TokenBucket(rate=0.5, burst=3)
+        assert [bucket.acquire() for _ in range(4)] == [True, True, True, False]
+
+    def test_zero_rate_is_unlimited(self):
+        """Test that rate=0 never limits and ignores throttling."""
+        from main import TokenBucket
+
+        bucket = TokenBucket(rate=0, burst=1)
+        bucket.throttled()
+        assert all(bucket.acquire() for _ in range(100))
+
+    def test_throttling_halves_rate_and_success_recovers(self):
+        """Test additive increase / multiplicative decrease of the rate."""
+        from main import TokenBucket
+
+        bucket = TokenBucket(rate=8.0, burst=4, min_rate=1.0, recovery=0.5)
+        bucket.throttled()
+        assert bucket.rate == 4.0
+        for _ in range(3):
+            bucket.throttled()
+        assert bucket.rate == 1.0  # floored at min_rate
+        bucket._rate_changed -= 4  # four seconds without throttling
+        bucket.success()
+        assert bucket.rate == pytest.approx(3.0, abs=0.01)
+        bucket._rate_changed -= 100
+        bucket.success()
+        assert bucket.rate == 8.0  # never above the configured rate
+
+    def test_throttling_drops_the_burst(self):
+        """Test that no request goes out right after a 429."""
+        from main import TokenBucket
+
+        bucket = TokenBucket(rate=0.5, burst=10)
+        bucket.throttled()
+        assert not bucket.acquire()
+
+    def test_waits_for_a_token(self):
+        """Test that acquire() waits up to its timeout for the next token."""
+        from main import TokenBucket
+
+        bucket = TokenBucket(rate=50.0, burst=1)
+        assert bucket.acquire()
+        assert bucket.acquire(timeout=1.0)
+
+
+class TestCircuitBreaker:
+    """Test the closed / open / half-open translation circuit."""
+
+    def _breaker(self, **kwargs):
+        from main import CircuitBreaker
+
+        clock = FakeClock()
+        return CircuitBreaker(clock=clock, **kwargs), clock
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that only `failure_threshold` failures in a row open the circuit."""
+        breaker, _ = self._breaker(failure_threshold=3)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+        assert breaker.opened == 1
+
+    def test_throttling_opens_at_once(self):
+        """Test that a single 429-like failure pauses translation."""
+        breaker, _ = self._breaker(failure_threshold=5)
+        breaker.record_failure(throttled=True)
+        assert breaker.state == "open"
+
+    def test_half_open_probe_closes_on_success(self):
+        """Test that one probe goes out after the timeout and success closes the circuit."""
+        breaker, clock = self._breaker(failure_threshold=1, reset_timeout=5)
+        breaker.record_failure()
+        assert breaker.is_open()
+        assert breaker.retry_in() == 5
+        clock.now += 5
+        assert not breaker.is_open()
+        assert breaker.allow()
+        assert breaker.state == "half-open"
+        assert not breaker.allow()  # only one probe at a time
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.allow()
+
+    def test_failed_probe_doubles_timeout(self):
+        """Test the exponential backoff between probes and its cap."""
+        breaker, clock = self._breaker(failure_threshold=1, reset_timeout=5, max_reset_timeout=12)
+        breaker.record_failure()
+        timeouts = []
+        for _ in range(3):
+            clock.now += breaker.retry_in()
+            assert breaker.allow()
+            breaker.record_failure()
+            timeouts.append(breaker.retry_in())
+        assert timeouts == [10, 12, 12]
+        clock.now += 12
+        breaker.allow()
+        breaker.record_success()
+        assert breaker.reset_timeout == 5
+
+    def test_failures_while_open_do_not_extend_pause(self):
+        """Test that late failures from requests already in flight leave the retry time alone."""
+        breaker, clock = self._breaker(failure_threshold=1, reset_timeout=5)
+        breaker.record_failure()
+        clock.now += 3
+        breaker.record_failure()
+        assert breaker.retry_in() == 2
+        assert breaker.opened == 1
+
+
+class TestTranslationBackendGuard:
+    """Test the rate limiter + circuit breaker wrapper around translator calls."""
+
+    def _guard(self, rate=0, **breaker_kwargs):
+        from main import CircuitBreaker, TokenBucket, TranslationBackendGuard
+
+        counters = {}
+
+        def count(name, n=1):
+            counters[name] = counters.get(name, 0) + n
+
+        clock = FakeClock()
+        guard = TranslationBackendGuard(
+            TokenBucket(rate=rate, burst=20), CircuitBreaker(clock=clock, **breaker_kwargs),
+            max_wait=0, count=count, logger=Mock(),
+        )
+        return guard, clock, counters
+
+    def test_passes_results_and_errors_through(self):
+        """Test that a closed circuit calls the backend and re-raises its errors."""
+        guard, _, _ = self._guard()
+        assert guard.call(lambda: "ok") == "ok"
+        with pytest.raises(RuntimeError, match="boom"):
+            guard.call(Mock(side_effect=RuntimeError("boom")))
+
+    def test_open_circuit_skips_backend(self):
+        """Test that repeated failures stop the calls until the probe is due."""
+        from main import TranslationUnavailable
+
+        guard, clock, counters = self._guard(failure_threshold=2, reset_timeout=5)
+        backend = Mock(side_effect=RuntimeError("down"))
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                guard.call(backend)
+        with pytest.raises(TranslationUnavailable):
+            guard.call(backend)
+        assert backend.call_count == 2
+        assert counters["unavailable"] == 1
+        guard._logger.warning.assert_called_once()
+
+        clock.now += 5
+        assert guard.call(lambda: "back") == "back"
+        assert guard.status()["state"] == "closed"
+        guard._logger.info.assert_called_once()
+
+    def test_throttling_slows_the_bucket(self):
+        """Test that a 429 is counted, lowers the rate and opens the circuit."""
+        guard, _, counters = self._guard(rate=10)
+        with pytest.raises(RuntimeError):
+            guard.call(Mock(side_effect=RuntimeError("429 Too Many Requests")))
+        status = guard.status()
+        assert counters["throttled"] == 1
+        assert status["state"] == "open"
+        assert status["rate"] == 5.0
+
+    def test_empty_bucket_is_unavailable(self):
+        """Test that no token within max_wait raises instead of calling the backend."""
+        from main import CircuitBreaker, TokenBucket, TranslationBackendGuard, TranslationUnavailable
+
+        guard = TranslationBackendGuard(TokenBucket(rate=0.1, burst=1), CircuitBreaker(), max_wait=0, logger=Mock())
+        backend = Mock(return_value="ok")
+        guard.call(backend)
+        with pytest.raises(TranslationUnavailable):
+            guard.call(backend)
+        assert backend.call_count == 1
+
+    def test_throttling_errors_are_recognized(self):
+        """Test is_throttling_error on the fake backend and on HTTP-style messages."""
+        from main import FakeTranslatorThrottled, is_throttling_error
+
+        assert is_throttling_error(FakeTranslatorThrottled("slow down"))
+        assert is_throttling_error(RuntimeError("HTTP Error 429"))
+        assert is_throttling_error(RuntimeError("Rate limit exceeded"))
+        assert not is_throttling_error(RuntimeError("connection reset"))
+
+    def test_status_text(self):
+        """Test the status bar text for each breaker state."""
+        from main import format_backend_status
+
+        normal = {"state": "closed", "retry_in": 0, "rate": 10.0, "max_rate": 10.0, "opened": 0}
+        assert format_backend_status(normal) == ""
+        assert format_backend_status(dict(normal, max_rate=0, rate=0)) == ""
+        assert "2.5 requests/s" in format_backend_status(dict(normal, rate=2.5))
+        assert "retrying in 42 s" in format_backend_status(dict(normal, state="open", retry_in=42))
+        assert "checking" in format_backend_status(dict(normal, state="half-open"))
+
+
+class TestOrderedWorkerPool:
+    """Test concurrent translation with in-order delivery."""
+
+    def test_results_delivered_in_submission_order(self):
+        """Test that a slow job does not reorder the output."""
+        import time
+        from main import OrderedWorkerPool
+
+        delivered = []
+
+        def job(index, delay):
+            time.sleep(delay)
+            return index
+
+        pool = OrderedWorkerPool(delivered.append, workers=4)
+        delays = [0.2, 0.01, 0.05, 0.0, 0.1, 0.0]
+        for index, delay in enumerate(delays):
+            pool.submit(job, index, delay)
+        pool.close()
+
+        assert delivered == list(range(len(delays)))
+
+    def test_jobs_run_concurrently(self):
+        """Test that jobs overlap instead of running strictly in series."""
+        import time
+        from main import OrderedWorkerPool
+
+        delivered = []
+        pool = OrderedWorkerPool(delivered.append, workers=8)
+        start = time.perf_counter()
+        for index in range(8):
+            pool.submit(lambda i: (time.sleep(0.1), i)[1], index)
+        pool.close()
+        elapsed = time.perf_counter() - start
+
+        assert delivered == list(range(8))
+        assert elapsed < 0.5
+
+    def test_failed_job_does_not_stop_delivery(self):
+        """Test that an exception in one job is logged and skipped."""
+        from main import OrderedWorkerPool
+
+        def job(index):
+            if index == 1:
+                raise ValueError("boom")
+            return index
+
+        delivered = []
+        logger = Mock()
+        pool = OrderedWorkerPool(delivered.append, workers=2, logger=logger)
+        for index in range(3):
+            pool.submit(job, index)
+        pool.close()
+
+        assert delivered == [0, 2]
+        logger.error.assert_called_once()
+
+
 if __name__ == "__main__":
     pytest.main([__file__])